@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import argparse
+
+# Add the project root to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from stepmania_difficulty_predictor.data.sm_data_loader import iter_sm_files
+from stepmania_difficulty_predictor.features.FeatureExtractor import FeatureExtractor
+from stepmania_difficulty_predictor.data.dataset_pipeline import (
+    iter_preprocessed_charts, iter_deduplicated_charts, iter_feature_rows, write_dataset
+)
+
+def main(input_filepath, output_path, chunk_size=1000, keep_duplicates=False, pattern_buckets=0, workers=1):
+    """ Streams raw simfiles straight into the feature dataset, without
+        writing intermediate .chart files.
+
+        Simfiles are parsed, preprocessed and featurized one at a time and
+        rows are written in chunks of `chunk_size`, so memory use does not
+        grow with the size of the corpus. Duplicate charts are skipped before
+        featurization unless `keep_duplicates` is set. `pattern_buckets`
+        adds hashed pattern n-gram features. `input_filepath` may be a song
+        folder, whose zip packs are read too, or a single zip pack, parsed
+        by `workers` processes.
+    """
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    simfiles = iter_sm_files(input_filepath, workers)
+    charts = iter_deduplicated_charts(iter_preprocessed_charts(simfiles), keep_duplicates=keep_duplicates)
+    rows = iter_feature_rows(charts, FeatureExtractor(pattern_buckets=pattern_buckets))
+    rows_written = write_dataset(rows, output_path, chunk_size=chunk_size)
+
+    print(f"Successfully built feature dataset with {rows_written} charts at {output_path}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the feature dataset directly from .sm/.ssc files.")
+    parser.add_argument('input_folder', type=str, help='Input folder containing .sm files or zip packs, or a single zip pack')
+    parser.add_argument('output_path', type=str, help='Path to save the output dataset.csv file.')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Number of rows written per chunk.')
+    parser.add_argument('--keep-duplicates', action='store_true',
+                        help='Keep duplicate charts, tagged with their duplicate group, instead of skipping them.')
+    parser.add_argument('--pattern-buckets', type=int, default=0,
+                        help='Number of hashed pattern n-gram features to add (0 to leave them out).')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes parsing simfiles from zip packs.')
+    args = parser.parse_args()
+
+    main(args.input_folder, args.output_path, args.chunk_size, args.keep_duplicates, args.pattern_buckets,
+         args.workers)
@@ -1,6 +1,8 @@
 import os
 import json
-import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
 from tqdm import tqdm
 import sys
 import argparse
@@ -8,73 +10,182 @@ import argparse
 # Add the project root to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from stepmania_difficulty_predictor.features.HorizontalDensity import HorizontalDensity
-from stepmania_difficulty_predictor.features.VerticalDensity import VerticalDensity
-from stepmania_difficulty_predictor.features.StreamDetector import StreamDetector
-from stepmania_difficulty_predictor.features.PatternDetector import PatternDetector
+from stepmania_difficulty_predictor.features.FeatureExtractor import FeatureExtractor
+from stepmania_difficulty_predictor.data.dataset_pipeline import DatasetWriter
+from stepmania_difficulty_predictor.data.sharding import (
+    MANIFEST_NAME, dataset_manifest_path, parse_shard, read_manifest, shard_of, write_manifest
+)
 
-def build_features(processed_dir, output_path):
+_worker_extractor = None
+
+def _init_worker(pattern_buckets):
     """
-    Builds a feature set from the processed chart files and saves it to a CSV.
+    Creates the feature extractor once per worker process.
     """
-    chart_files = [os.path.join(processed_dir, f) for f in os.listdir(processed_dir) if f.endswith('.chart')]
-
-    if not chart_files:
-        print(f"No .chart files found in {processed_dir}. Did you run make_dataset_from_sm.py first?")
-        return
+    global _worker_extractor
+    _worker_extractor = FeatureExtractor(alpha=3, pattern_buckets=pattern_buckets)
 
-    # Initialize feature extractors
-    horizontal_density = HorizontalDensity(alpha=3)
-    vertical_density = VerticalDensity(alpha=3)
-    stream_detector = StreamDetector()
-    pattern_detector = PatternDetector()
+def _read_batch(chart_files):
+    """
+    Reads the raw contents of a batch of chart files.
+    """
+    contents = []
+    for chart_file in chart_files:
+        with open(chart_file, 'rb') as f:
+            contents.append((chart_file, f.read()))
+    return contents
 
-    all_features = []
+def _feature_rows(contents, feature_extractor, shard=None):
+    """
+    Parses a batch of chart files and computes their dataset rows, keeping
+    only the charts of `shard` when one is given.
 
-    print("Building features from processed chart files...")
-    for chart_file in tqdm(chart_files):
+    Returns:
+        The rows, in the order of `contents`, and a message for every
+        corrupt chart file that was skipped.
+    """
+    batch, skipped = [], []
+    for chart_file, raw in contents:
         try:
-            with open(chart_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = json.loads(raw.decode('utf-8'))
         except (json.JSONDecodeError, UnicodeDecodeError) as e:
-            print(f"Skipping corrupt chart file: {chart_file} ({e})")
+            skipped.append(f"Skipping corrupt chart file: {chart_file} ({e})")
             continue
 
+        if shard is not None and shard_of(_shard_key(chart_file, data), shard[1]) != shard[0]:
+            continue
         chart = data.get('chart', {})
         if chart:
-            chart = {float(k): v for k, v in chart.items()}
+            data['chart'] = {float(k): v for k, v in chart.items()}
+            batch.append((chart_file, data))
 
-        mode = data.get('mode', 'unknown')
-        meter = data.get('meter', 0)
+    # Compute the features of the whole batch with the mode-agnostic extractors
+    batch_features = feature_extractor.compute_batch([data['chart'] for _, data in batch])
+    rows = []
+    for (chart_file, data), chart_features in zip(batch, batch_features):
+        features = {
+            'id': data.get('id', os.path.splitext(os.path.basename(chart_file))[0]),
+            'meter': data.get('meter', 0),
+            'mode': data.get('mode', 'unknown'),
+            **chart_features
+        }
+        # Keep the duplicate group so training can split by it
+        if 'group' in data:
+            features['group'] = data['group']
+        rows.append(features)
+    return rows, skipped
 
-        if not chart:
-            continue
+def _feature_rows_worker(contents, shard):
+    return _feature_rows(contents, _worker_extractor, shard)
+
+def _shard_key(chart_file, data):
+    """
+    The key a chart is sharded by: the simfile source `make_dataset_from_sm.py`
+    shards by, so both stages split the corpus the same way. Chart files
+    written before sources were recorded fall back to their file name.
+    """
+    return data.get('source', os.path.basename(chart_file))
 
-        # Compute features using the mode-agnostic extractors
-        h_density_features = horizontal_density.compute(chart)
-        v_density_features = vertical_density.compute(chart)
-        stream_features = stream_detector.compute(chart)
-        pattern_features = pattern_detector.compute(chart)
+def iter_feature_batches(batches, pattern_buckets=0, workers=1, shard=None):
+    """
+    Computes the dataset rows of batches of chart files.
 
-        # Combine all features into a single dictionary
-        features = {
-            'meter': meter,
-            'mode': mode,
-            **h_density_features,
-            **v_density_features,
-            **stream_features,
-            **pattern_features
-        }
-        all_features.append(features)
+    A thread pool reads the files of the next batches ahead while earlier
+    ones are parsed and computed. With more than one worker, batches are
+    parsed and computed in worker processes, at most `2 * workers` of them
+    in flight at a time.
+
+    Yields:
+        `(rows, skipped)` for every batch, in batch order, as returned by
+        `_feature_rows` for `shard`.
+    """
+    depth = 2 * max(workers, 1)
+    with ThreadPoolExecutor(min(depth, 8)) as reader:
+        batches = iter(batches)
+        reads = deque(reader.submit(_read_batch, batch) for batch in islice(batches, depth))
+
+        def read_batches():
+            while reads:
+                contents = reads.popleft().result()
+                batch = next(batches, None)
+                if batch is not None:
+                    reads.append(reader.submit(_read_batch, batch))
+                yield contents
+
+        if workers <= 1:
+            feature_extractor = FeatureExtractor(alpha=3, pattern_buckets=pattern_buckets)
+            for contents in read_batches():
+                yield _feature_rows(contents, feature_extractor, shard)
+            return
+
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(pattern_buckets,)) as executor:
+            pending = deque()
+            for contents in read_batches():
+                pending.append(executor.submit(_feature_rows_worker, contents, shard))
+                if len(pending) > depth:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+def build_features(processed_dir, output_path, pattern_buckets=0, shard=None, batch_size=256, workers=1):
+    """
+    Builds a feature set from the processed chart files and saves it to a CSV.
+
+    `pattern_buckets` adds that many hashed pattern n-gram features. Rows
+    are written in chart id order, each with its chart's `id`. Features are
+    computed `batch_size` charts at a time with `FeatureExtractor.compute_batch`,
+    in `workers` processes while the next files are read ahead. The output
+    does not depend on the number of workers.
+
+    With a `shard` `(i, K)`, only the charts whose simfile source hashes to
+    shard i of K are kept, the same split `make_dataset_from_sm.py --shard`
+    makes, so charts of one song always land in the same shard. The shard
+    of the dataset, given here or inherited from a sharded
+    `make_dataset_from_sm.py` output, is recorded in a manifest next to it
+    for `merge_shards.py`.
+    """
+    chart_files = sorted(f for f in os.listdir(processed_dir) if f.endswith('.chart'))
+
+    if not chart_files:
+        print(f"No .chart files found in {processed_dir}. Did you run make_dataset_from_sm.py first?")
+        return
+
+    processed_manifest = read_manifest(os.path.join(processed_dir, MANIFEST_NAME)) or {}
+    if shard is not None and processed_manifest.get('shard'):
+        print(f"Error: {processed_dir} already holds a single shard; build it without --shard.", file=sys.stderr)
+        return
+    dataset_shard = shard or processed_manifest.get('shard')
+    chart_files = [os.path.join(processed_dir, f) for f in chart_files]
+    batches = [chart_files[start:start + batch_size] for start in range(0, len(chart_files), batch_size)]
+
+    writer = DatasetWriter(output_path)
+
+    print("Building features from processed chart files...")
+    with tqdm(total=len(chart_files)) as progress:
+        for batch, (rows, skipped) in zip(batches, iter_feature_batches(batches, pattern_buckets, workers, shard)):
+            for message in skipped:
+                print(message)
+            for row in rows:
+                writer.write(row)
+            progress.update(len(batch))
 
-    # Create a DataFrame and save to CSV
-    df = pd.DataFrame(all_features)
-    df.to_csv(output_path, index=False)
-    print(f"Successfully built feature dataset with {len(df)} charts at {output_path}")
+    # Flush the remaining rows to the CSV
+    writer.close()
+    write_manifest(dataset_manifest_path(output_path), dataset_shard, rows=writer.rows_written)
+    print(f"Successfully built feature dataset with {writer.rows_written} charts at {output_path}")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Build features from processed chart files.")
     parser.add_argument("processed_dir", type=str, help="Directory containing the processed .chart files.")
     parser.add_argument("output_path", type=str, help="Path to save the output dataset.csv file.")
+    parser.add_argument("--pattern-buckets", type=int, default=0,
+                        help="Number of hashed pattern n-gram features to add (0 to leave them out).")
+    parser.add_argument("--shard", type=parse_shard, default=None, metavar="i/K",
+                        help="Only process shard i of K, split by simfile source hash as in make_dataset_from_sm.py.")
+    parser.add_argument("--batch-size", type=int, default=256,
+                        help="Number of charts whose features are computed together.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes computing features.")
     args = parser.parse_args()
-    build_features(args.processed_dir, args.output_path)
+    build_features(args.processed_dir, args.output_path, args.pattern_buckets, args.shard, args.batch_size,
+                   args.workers)
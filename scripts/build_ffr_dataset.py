@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import argparse
+
+# Add the project root to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from stepmania_difficulty_predictor.data.ffr_ingest import iter_ffr_charts
+from stepmania_difficulty_predictor.data.dataset_pipeline import iter_feature_rows, write_dataset
+
+def main(dump_path, output_path, batch_size=512, chunk_size=1000):
+    """ Streams an FFR API dump (a JSON list of charts) into the feature dataset.
+
+        The dump is parsed incrementally and converted `batch_size` charts at a
+        time, so the whole catalogue is never held in memory.
+    """
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    charts = iter_ffr_charts(dump_path, batch_size=batch_size)
+    rows_written = write_dataset(iter_feature_rows(charts), output_path, chunk_size=chunk_size)
+
+    print(f"Successfully built feature dataset with {rows_written} charts at {output_path}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the feature dataset from an FFR API chart dump.")
+    parser.add_argument('dump_path', type=str, help='Path to the JSON dump holding a list of FFR charts.')
+    parser.add_argument('output_path', type=str, help='Path to save the output dataset.csv file.')
+    parser.add_argument('--batch-size', type=int, default=512, help='Number of charts converted together.')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Number of rows written per chunk.')
+    args = parser.parse_args()
+
+    main(args.dump_path, args.output_path, args.batch_size, args.chunk_size)
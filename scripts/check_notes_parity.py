@@ -0,0 +1,63 @@
+import os
+import sys
+import argparse
+from collections import Counter
+from fractions import Fraction
+from simfile.notes import NoteData
+from tqdm import tqdm
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stepmania_difficulty_predictor.data.notes import tokenize_notes
+from stepmania_difficulty_predictor.data.sm_data_loader import (
+    iter_simfile_sources, open_simfile_source, simfile_source_key
+)
+
+def check_notes_parity(path):
+    """
+    Checks `tokenize_notes` against `NoteData` on every chart of a songs
+    folder or zip pack, printing the charts whose notes differ.
+
+    Returns:
+        A Counter of the charts that `matched`, that `differed`, that the
+        tokenizer left to `NoteData` (`fallback`), and of the simfiles that
+        could not be opened (`unreadable`).
+    """
+    counts = Counter()
+    for source in tqdm(list(iter_simfile_sources(path))):
+        try:
+            sm = open_simfile_source(source)
+        except Exception:
+            counts['unreadable'] += 1
+            continue
+
+        for index, chart in enumerate(sm.charts):
+            if not chart.notes:
+                continue
+            tokens = tokenize_notes(chart.notes)
+            if tokens is None:
+                counts['fallback'] += 1
+                continue
+
+            tokenized = [(Fraction(int(numerator), int(denominator)), int(column), chr(note_type))
+                         for numerator, denominator, column, note_type in zip(*tokens)]
+            try:
+                expected = [(Fraction(note.beat), note.column, note.note_type.value) for note in NoteData(chart)]
+            except Exception as e:
+                expected = e
+            if tokenized == expected:
+                counts['matched'] += 1
+            else:
+                counts['differed'] += 1
+                print(f"Notes differ: {simfile_source_key(source)} chart {index}", file=sys.stderr)
+    return counts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check the fast note data tokenizer against NoteData.")
+    parser.add_argument("path", type=str, help="A songs directory or a .zip pack.")
+    args = parser.parse_args()
+    counts = check_notes_parity(args.path)
+    print(f"Matched {counts['matched']}, differed {counts['differed']}, fallback {counts['fallback']}, "
+          f"unreadable {counts['unreadable']}")
+    sys.exit(1 if counts['differed'] else 0)
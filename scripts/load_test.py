@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+
+# Add the project root to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from stepmania_difficulty_predictor.data.sm_data_loader import find_simfile_paths
+
+CLI_SCRIPT = os.path.join(project_root, 'scripts', 'predict_difficulty.py')
+
+_worker_predictor = None
+
+def write_synthetic_corpus(directory, n_files, measures=64, charts_per_file=2, seed=0):
+    """
+    Writes random dance-single simfiles, one per song folder.
+
+    Args:
+        directory: Folder to write the songs to.
+        n_files: Number of simfiles.
+        measures: Number of 16th-note measures per chart.
+        charts_per_file: Number of charts per simfile.
+        seed: Seed of the random notes.
+
+    Returns:
+        The sorted list of written simfile paths.
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.array(['0000', '1000', '0100', '0010', '0001', '1001', '0110'])
+    weights = np.array([0.45, 0.12, 0.12, 0.12, 0.12, 0.035, 0.035])
+    for i in range(n_files):
+        song_dir = os.path.join(directory, f'song{i:05d}')
+        os.makedirs(song_dir, exist_ok=True)
+        lines = [f'#TITLE:Synthetic {i};', '#ARTIST:Load Test;', f'#BPMS:0={rng.integers(90, 200)};']
+        for level in range(charts_per_file):
+            notes = rng.choice(rows, size=(measures, 16), p=weights)
+            lines += ['#NOTES:', '     dance-single:', '     :', '     Edit:', f'     {level + 5}:',
+                      '     0,0,0,0,0:', '\n,\n'.join('\n'.join(measure) for measure in notes) + ';']
+        with open(os.path.join(song_dir, 'song.sm'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+    return find_simfile_paths(directory)
+
+def _init_library_worker(model_dir):
+    """
+    Loads the predictor once per worker process, outside the measured requests.
+
+    The predictor's messages go to stderr, to keep stdout for the results.
+
+    Raises:
+        RuntimeError: If no model could be loaded.
+    """
+    global _worker_predictor
+    from stepmania_difficulty_predictor.models.prediction_pipeline import ModeAgnosticDifficultyPredictor
+    sys.stdout = sys.stderr
+    _worker_predictor = ModeAgnosticDifficultyPredictor(model_dir) if model_dir else ModeAgnosticDifficultyPredictor()
+    if not _worker_predictor.models:
+        raise RuntimeError(f"No models could be loaded from '{model_dir or 'the packaged model directory'}'.")
+
+def _library_request(paths):
+    """
+    Scores one batch of simfiles with `predict_batch`.
+
+    Returns:
+        A tuple `(latency_seconds, charts, error, cpu_seconds)`; a file that
+        produced no predictions is an error.
+    """
+    start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        results = _worker_predictor.predict_batch(paths)
+        charts = sum(len(predictions) for predictions in results)
+        unscored = [path for path, predictions in zip(paths, results) if not predictions]
+        error = f"No predictions for '{unscored[0]}'." if unscored else None
+    except Exception as e:
+        charts, error = 0, str(e)
+    return time.perf_counter() - start, charts, error, time.process_time() - cpu_start
+
+def _cli_request(paths, model_dir):
+    """
+    Scores one batch of simfiles with one run of the command-line tool per file.
+
+    Returns:
+        A tuple `(latency_seconds, charts, error, cpu_seconds)`; a file that
+        produced no predictions is an error. The CPU time of the runs is
+        accounted by the caller, as that of waited-for children.
+    """
+    start = time.perf_counter()
+    charts, error = 0, None
+    for path in paths:
+        command = [sys.executable, CLI_SCRIPT, path, '--json']
+        if model_dir:
+            command += ['--model_dir', model_dir]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        # The predictor prints which models it loaded before the JSON
+        output = '\n' + completed.stdout
+        try:
+            file_charts = len(json.loads(output[output.index('\n[') + 1:]))
+        except ValueError:
+            error = (completed.stderr.strip().splitlines() or [f'exit status {completed.returncode}'])[-1]
+            continue
+        charts += file_charts
+        if not file_charts:
+            error = f"No predictions for '{path}'."
+    return time.perf_counter() - start, charts, error, 0.0
+
+def _cpu_seconds(who):
+    """
+    CPU time used by this process or by its waited-for children.
+    """
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+def run_load_test(paths, target='library', concurrency=1, batch_size=1, model_dir=None,
+                  warmup=None, repeat=1):
+    """
+    Replays a corpus through a prediction target and measures it.
+
+    Requests are batches of `batch_size` simfiles, sent by `concurrency`
+    closed-loop clients: worker processes with their own predictor for the
+    `library` target, threads each launching the CLI for the `cli` target.
+    Latency is the time a client waits for one request. The first `warmup`
+    requests (by default one per client) are excluded from every statistic.
+    Peak RSS is the high-water mark of this process and of its largest
+    worker or CLI run so far.
+
+    Args:
+        paths: The simfile paths to replay.
+        target: `'library'` (`predict_batch`) or `'cli'` (scripts/predict_difficulty.py).
+        concurrency: Number of concurrent clients.
+        batch_size: Number of simfiles per request.
+        model_dir: Model directory; defaults to the packaged models.
+        warmup: Number of unmeasured warm-up requests.
+        repeat: Number of passes over the corpus.
+
+    Returns:
+        A dictionary of results.
+    """
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)] * repeat
+    warmup = concurrency if warmup is None else warmup
+    warmup_batches = [batches[i % len(batches)] for i in range(warmup)] if batches else []
+
+    if target == 'library':
+        executor = ProcessPoolExecutor(concurrency, initializer=_init_library_worker, initargs=(model_dir,))
+        request, request_args = _library_request, lambda batches: (batches,)
+    elif target == 'cli':
+        executor = ThreadPoolExecutor(concurrency)
+        request, request_args = _cli_request, lambda batches: (batches, [model_dir] * len(batches))
+    else:
+        raise ValueError(f"Unknown target '{target}'.")
+
+    with executor:
+        list(executor.map(request, *request_args(warmup_batches)))
+        cpu_start = [_cpu_seconds(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+        wall_start = time.perf_counter()
+        results = list(executor.map(request, *request_args(batches)))
+        wall = time.perf_counter() - wall_start
+        # Library workers report their own request CPU time, since they are
+        # only accounted as children once they exit; CLI runs are waited for
+        cpu = sum(_cpu_seconds(who) - before
+                  for who, before in zip((resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN), cpu_start))
+        cpu += sum(request_cpu for _, _, _, request_cpu in results)
+
+    latencies = np.array([latency for latency, _, _, _ in results]) * 1000
+    charts = sum(n for _, n, _, _ in results)
+    errors = [error for _, _, error, _ in results if error]
+    percentiles = np.percentile(latencies, [50, 95, 99]) if len(latencies) else [np.nan] * 3
+    to_mb = 1 / 1024 if sys.platform != 'darwin' else 1 / 1024 ** 2
+
+    return {
+        'target': target,
+        'concurrency': concurrency,
+        'batch_size': batch_size,
+        'requests': len(results),
+        'files': sum(len(batch) for batch in batches),
+        'charts': charts,
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'wall_seconds': wall,
+        'charts_per_sec': charts / wall if wall else 0.0,
+        'files_per_sec': sum(len(batch) for batch in batches) / wall if wall else 0.0,
+        'latency_ms': {
+            'p50': float(percentiles[0]),
+            'p95': float(percentiles[1]),
+            'p99': float(percentiles[2]),
+            'mean': float(latencies.mean()) if len(latencies) else float('nan'),
+            'max': float(latencies.max()) if len(latencies) else float('nan'),
+        },
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * to_mb,
+        'peak_worker_rss_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * to_mb,
+        'cpu_seconds': cpu,
+        'cpu_utilization': cpu / (wall * os.cpu_count()) if wall else 0.0,
+    }
+
+def _environment():
+    """
+    Identifies the code and machine a run was measured on.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=project_root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure prediction throughput and latency under load.")
+    corpus = parser.add_mutually_exclusive_group(required=True)
+    corpus.add_argument('--corpus', type=str, help='Songs folder or single simfile to replay.')
+    corpus.add_argument('--synthetic', type=int, metavar='N', help='Replay N generated simfiles instead.')
+    parser.add_argument('--measures', type=int, default=64, help='Measures per synthetic chart.')
+    parser.add_argument('--target', choices=['library', 'cli'], default='library',
+                        help='Entry point to load: predict_batch in-process, or the command-line tool.')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1],
+                        help='Numbers of concurrent clients; one run per value.')
+    parser.add_argument('--batch-size', type=int, default=1, help='Simfiles per request.')
+    parser.add_argument('--repeat', type=int, default=1, help='Passes over the corpus.')
+    parser.add_argument('--warmup', type=int, default=None, help='Unmeasured requests (default: one per client).')
+    parser.add_argument('--model-dir', type=str, default=None, help='Directory containing trained models.')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Append results as JSON lines to this file, to compare between commits.')
+    args = parser.parse_args()
+
+    synthetic_dir = None
+    if args.synthetic is not None:
+        synthetic_dir = tempfile.mkdtemp(prefix='smdp-load-')
+        paths = write_synthetic_corpus(synthetic_dir, args.synthetic, measures=args.measures)
+    elif os.path.isfile(args.corpus):
+        paths = [args.corpus]
+    else:
+        paths = find_simfile_paths(args.corpus)
+
+    if not paths:
+        print("Error: No simfiles to replay.", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        environment = _environment()
+        for concurrency in args.concurrency:
+            results = run_load_test(paths, args.target, concurrency, args.batch_size, args.model_dir,
+                                    args.warmup, args.repeat)
+            results.update(environment, corpus=args.corpus or f'synthetic:{args.synthetic}x{args.measures}')
+            line = json.dumps(results)
+            print(line)
+            if args.output:
+                with open(args.output, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+    finally:
+        if synthetic_dir:
+            shutil.rmtree(synthetic_dir)
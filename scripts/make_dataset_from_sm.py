@@ -7,38 +7,93 @@ import argparse
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, project_root)
 
-from stepmania_difficulty_predictor.data.sm_data_loader import load_sm_files_from_directory
-from stepmania_difficulty_predictor.data.SMChartPreprocessor import SMChartPreprocessor
+from stepmania_difficulty_predictor.data.sm_data_loader import iter_simfile_sources
+from stepmania_difficulty_predictor.data.dataset_pipeline import iter_source_charts
+from stepmania_difficulty_predictor.data.supervisor import FileBudget
+from stepmania_difficulty_predictor.data.dedup import ChartDeduplicator
+from stepmania_difficulty_predictor.data.sharding import (
+    MANIFEST_NAME, chart_id, parse_shard, select_shard, write_manifest
+)
 from stepmania_difficulty_predictor.DataSerializer import DataSerializer
 
-def main(input_filepath, output_filepath):
+def main(input_filepath, output_filepath, keep_duplicates=False, workers=1, timeout=None, max_rss_mb=None,
+         quarantine_path=None, shard=None):
     """ Runs data processing scripts to turn raw data from (../raw) into
         cleaned data ready to be analyzed (saved in ../processed).
+
+        Exact and near-duplicate charts are skipped, or kept and tagged with
+        their duplicate `group` when `keep_duplicates` is set. Zip packs,
+        given directly or found in the input folder, are read without
+        extracting them. With several `workers`, simfiles are preprocessed
+        in parallel worker processes.
+
+        With a `timeout` or `max_rss_mb`, every simfile is preprocessed in a
+        supervised worker under that budget. Offenders are killed, recorded
+        in the quarantine report and skipped on later runs.
+
+        Every chart is saved as `<id>.chart`, where the id is derived from
+        the simfile's path relative to the input and the chart's position in
+        it. With a `shard` `(i, K)`, only the simfiles whose path hashes to
+        shard i of K are processed, so that K nodes can each build one shard
+        of the corpus; `merge_shards.py` combines their feature datasets.
     """
     os.makedirs(output_filepath, exist_ok=True)
 
-    simfiles = load_sm_files_from_directory(input_filepath)
-    preprocessor = SMChartPreprocessor()
+    budget = None
+    if timeout is not None or max_rss_mb is not None:
+        quarantine_path = quarantine_path or os.path.join(output_filepath, 'quarantine.json')
+        budget = FileBudget(timeout, max_rss_mb, quarantine_path, workers)
+    elif workers > 1:
+        budget = FileBudget(workers=workers)
+
+    sources = select_shard(iter_simfile_sources(input_filepath), input_filepath, shard)
+    keys = {source: key for key, source in sources}
+
     serializer = DataSerializer(folder=output_filepath)
+    deduplicator = ChartDeduplicator()
+
+    charts_written = 0
+    for source, charts in iter_source_charts((source for _, source in sources), budget):
+        key = keys[source]
+        for index, chart_data in enumerate(charts):
+            group, duplicate = deduplicator.add(chart_data['chart'], chart_data['mode'])
+            if duplicate and not keep_duplicates:
+                continue
+            # Label groups by content so that labels agree across shards
+            chart_data['group'] = deduplicator.group_hashes[group]
+            chart_data['id'] = chart_id(key, index)
+            chart_data['source'] = key
+            serializer.download(chart_data, chart_data['id'])
+            charts_written += 1
 
-    chart_id = 0
-    processed_files = 0
-    for sm_file in simfiles:
-        try:
-            preprocessed_charts = preprocessor.preprocess(sm_file)
-            for chart_data in preprocessed_charts:
-                serializer.download(chart_data, chart_id)
-                chart_id += 1
-            processed_files += 1
-        except Exception as e:
-            print(f"Error processing {sm_file.title}: {e}", file=sys.stderr)
+    write_manifest(os.path.join(output_filepath, MANIFEST_NAME), shard,
+                   sources=len(sources), charts=charts_written)
 
-    print(f"Processed and serialized {chart_id} charts from {processed_files} files.")
+    shard_note = f" from shard {shard[0]}/{shard[1]}" if shard else ""
+    print(f"Processed and serialized {charts_written} charts{shard_note}.")
+    action = "tagged" if keep_duplicates else "skipped"
+    print(f"Duplicates {action}: {deduplicator.duplicates['exact']} exact, "
+          f"{deduplicator.duplicates['near']} near.")
+    if budget is not None and budget.quarantine_path and os.path.exists(budget.quarantine_path):
+        print(f"Quarantine report: {budget.quarantine_path}")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
-    parser.add_argument('input_folder', type=str, help='Input folder containing .sm files')
+    parser.add_argument('input_folder', type=str, help='Input folder containing .sm files or zip packs, or a single zip pack')
     parser.add_argument('output_folder', type=str, help='Output folder for .chart files')
+    parser.add_argument('--keep-duplicates', action='store_true',
+                        help='Keep duplicate charts, tagged with their duplicate group, instead of skipping them.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes preprocessing simfiles.')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='Maximum seconds per simfile; enables supervised workers.')
+    parser.add_argument('--max-rss-mb', type=float, default=None,
+                        help='Maximum worker memory per simfile in MiB; enables supervised workers.')
+    parser.add_argument('--quarantine', type=str, default=None,
+                        help='Quarantine report of offending simfiles (default: <output_folder>/quarantine.json).')
+    parser.add_argument('--shard', type=parse_shard, default=None, metavar='i/K',
+                        help='Only process shard i of K, split by simfile path hash.')
     args = parser.parse_args()
 
-    main(args.input_folder, args.output_folder)
+    main(args.input_folder, args.output_folder, args.keep_duplicates, args.workers, args.timeout,
+         args.max_rss_mb, args.quarantine, args.shard)
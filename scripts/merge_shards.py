@@ -0,0 +1,52 @@
+import os
+import sys
+import argparse
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stepmania_difficulty_predictor.data.sharding import check_shards, merge_datasets
+
+def merge_shards(dataset_paths, output_path, keep_duplicates=False, allow_partial=False):
+    """
+    Merges the feature datasets built for each shard of the corpus into one
+    dataset, in chart id order.
+
+    Unless `allow_partial` is set, the shard manifests next to the datasets
+    must show every shard of one split exactly once.
+    """
+    try:
+        num_shards = check_shards(dataset_paths)
+    except ValueError as e:
+        if not allow_partial:
+            print(f"Error: {e}", file=sys.stderr)
+            return
+        print(f"Warning: {e}", file=sys.stderr)
+        num_shards = None
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    try:
+        rows, skipped = merge_datasets(dataset_paths, output_path, keep_duplicates)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return
+
+    source = f"{num_shards} shards" if num_shards else f"{len(dataset_paths)} datasets"
+    print(f"Merged {rows} charts from {source} into {output_path}")
+    if skipped:
+        print(f"Skipped {skipped} charts duplicated across shards.")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Merge the shard datasets of a multi-node build.")
+    parser.add_argument("dataset_paths", type=str, nargs='+',
+                        help="The feature datasets built by build_features.py for each shard.")
+    parser.add_argument("--output", type=str, required=True, help="Path to save the merged dataset.csv file.")
+    parser.add_argument("--keep-duplicates", action='store_true',
+                        help="Keep charts duplicated across shards, tagged with their duplicate group.")
+    parser.add_argument("--allow-partial", action='store_true',
+                        help="Merge even if shards are missing or repeated.")
+    args = parser.parse_args()
+    merge_shards(args.dataset_paths, args.output, args.keep_duplicates, args.allow_partial)
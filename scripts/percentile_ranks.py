@@ -0,0 +1,83 @@
+import os
+import sys
+import argparse
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stepmania_difficulty_predictor.models.percentile_index import FIELDS, PercentileIndex
+from stepmania_difficulty_predictor.models.prediction_pipeline import DEFAULT_MODEL_DIR, ModeAgnosticDifficultyPredictor
+
+def build(scores_path, index_dir):
+    """
+    Builds a percentile index from the predictions CSV of predict_model.py.
+    """
+    index = PercentileIndex.build(scores_path, index_dir)
+    for mode, mode_ranks in index.modes.items():
+        print(f"  - {mode}: {mode_ranks.size()} charts")
+    print(f"Percentile index saved to {index_dir}")
+
+def add(scores_path, index_dir):
+    """
+    Adds the predictions of another predictions CSV to a percentile index.
+    """
+    inserted = PercentileIndex(index_dir).add_scores(scores_path)
+    for mode, count in inserted.items():
+        print(f"  - {mode}: {count} charts added")
+    print(f"Added {sum(inserted.values())} charts to {index_dir}")
+
+def query(index_dir, mode=None, values=None, simfile_path=None, field='predicted_difficulty',
+          model_dir=DEFAULT_MODEL_DIR):
+    """
+    Prints the percentile and rank of values within a mode, or of every
+    chart of a simfile within its mode.
+    """
+    index = PercentileIndex(index_dir)
+    if simfile_path is not None:
+        predictions = ModeAgnosticDifficultyPredictor(model_dir=model_dir).predict(simfile_path)
+        queries = [(p['mode'], p[field], f"{p['mode']} {p.get('difficulty')}") for p in predictions
+                   if p.get(field) is not None]
+    else:
+        queries = [(mode, value, f"{mode} {value:g}") for value in values]
+
+    for query_mode, value, label in queries:
+        if query_mode not in index.modes:
+            print(f"Error: mode {query_mode} is not in the index", file=sys.stderr)
+            continue
+        percentile = index.percentile(query_mode, value, field)
+        rank = index.rank(query_mode, value, field)
+        print(f"{label}: {field} {value:.2f}, percentile {percentile:.1f}, "
+              f"rank {rank} of {index.modes[query_mode].size(field)}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rank predicted difficulties within a catalogue.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="Build an index from a predictions CSV.")
+    build_parser.add_argument("scores_path", type=str, help="Predictions CSV written by predict_model.py.")
+    build_parser.add_argument("index_dir", type=str, help="Directory to save the index to.")
+
+    add_parser = subparsers.add_parser('add', help="Add the charts of another predictions CSV.")
+    add_parser.add_argument("scores_path", type=str, help="Predictions CSV written by predict_model.py.")
+    add_parser.add_argument("index_dir", type=str, help="Directory holding the index.")
+
+    query_parser = subparsers.add_parser('query', help="Rank values or the charts of a simfile.")
+    query_parser.add_argument("index_dir", type=str, help="Directory holding the index.")
+    query_parser.add_argument("--field", choices=FIELDS, default='predicted_difficulty',
+                              help="Rank predicted difficulties or meters.")
+    target = query_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--values", type=float, nargs='+', help="Values to rank; requires --mode.")
+    target.add_argument("--simfile", type=str, help="Path to a simfile whose charts to predict and rank.")
+    query_parser.add_argument("--mode", type=str, help="Game mode to rank --values in.")
+    query_parser.add_argument("--model-dir", type=str, default=DEFAULT_MODEL_DIR,
+                              help="Directory containing one trained model per mode, for --simfile.")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build(args.scores_path, args.index_dir)
+    elif args.command == 'add':
+        add(args.scores_path, args.index_dir)
+    else:
+        if args.values is not None and args.mode is None:
+            query_parser.error("--values requires --mode")
+        query(args.index_dir, args.mode, args.values, args.simfile, args.field, args.model_dir)
@@ -1,47 +1,157 @@
 import argparse
+import contextlib
+import csv
 import sys
 import os
 import json
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 # Add the project root to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from stepmania_difficulty_predictor.models.prediction_pipeline import ModeAgnosticDifficultyPredictor
+from stepmania_difficulty_predictor.data.sm_data_loader import expand_simfile_paths
+from stepmania_difficulty_predictor.models.prediction_pipeline import DEFAULT_MODEL_DIR, ModeAgnosticDifficultyPredictor
 
-def predict_difficulty_cli(file_path, model_dir=None, use_json=False):
+# Columns of the `jsonl` and `csv` output, one row per chart; `chart` is its position in the simfile
+OUTPUT_FIELDS = ['path', 'chart', 'mode', 'difficulty', 'meter', 'predicted_difficulty']
+
+_worker_predictor = None
+
+def _init_worker(model_dir):
     """
-    Command-line interface for the difficulty predictor.
+    Loads the predictor once per worker process. Worker output goes to stderr,
+    so it never mixes with the results.
+    """
+    global _worker_predictor
+    sys.stdout = sys.stderr
+    _worker_predictor = ModeAgnosticDifficultyPredictor(model_dir=model_dir)
+
+def _predict_worker(paths):
+    return _worker_predictor.predict_batch(paths)
+
+def iter_file_predictions(paths, model_dir=DEFAULT_MODEL_DIR, workers=1, batch_size=8):
     """
-    if model_dir:
-        predictor = ModeAgnosticDifficultyPredictor(model_dir=model_dir)
-    else:
-        predictor = ModeAgnosticDifficultyPredictor()
+    Scores simfiles with `predict_batch`, `batch_size` files per call.
 
-    if not os.path.exists(file_path):
-        print(f"Error: File not found at {file_path}")
+    With more than one worker, batches are scored in worker processes that
+    each load the models once.
+
+    Yields:
+        `(path, predictions)` for every simfile, in input order, as soon as
+        its batch and every batch before it are done.
+    """
+    batches = [paths[start:start + batch_size] for start in range(0, len(paths), batch_size)]
+    if workers > 1:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model_dir,)) as executor:
+            for batch, batch_predictions in zip(batches, executor.map(_predict_worker, batches)):
+                yield from zip(batch, batch_predictions)
         return
 
-    predictions = predictor.predict(file_path)
-
-    if use_json:
-        print(json.dumps(predictions, indent=4))
-    else:
-        if not predictions:
-            print(f"No charts could be processed for '{os.path.basename(file_path)}'.")
-            print("This could be due to missing models for the chart modes or an invalid file.")
-        else:
-            print(f"Predictions for '{os.path.basename(file_path)}':")
-            for p in predictions:
-                print(
-                    f"  - Mode: {p['mode']}, Difficulty: {p['difficulty']}, "
-                    f"Meter: {p['meter']} -> Predicted Meter: {p['predicted_difficulty']:.2f}"
-                )
+    predictor = ModeAgnosticDifficultyPredictor(model_dir=model_dir)
+    for batch in batches:
+        yield from zip(batch, predictor.predict_batch(batch))
 
-if __name__ == '__main__':
+def _chart_rows(path, predictions):
+    for p in predictions:
+        yield {'path': path, 'chart': p['chart_index'], 'mode': p['mode'], 'difficulty': p['difficulty'],
+               'meter': p['meter'], 'predicted_difficulty': float(p['predicted_difficulty'])}
+
+def _print_text(path, predictions, out):
+    if not predictions:
+        print(f"No charts could be processed for '{os.path.basename(path)}'.", file=out)
+        print("This could be due to missing models for the chart modes or an invalid file.", file=out)
+        return
+    print(f"Predictions for '{os.path.basename(path)}':", file=out)
+    for p in predictions:
+        print(
+            f"  - Mode: {p['mode']}, Difficulty: {p['difficulty']}, "
+            f"Meter: {p['meter']} -> Predicted Meter: {p['predicted_difficulty']:.2f}",
+            file=out
+        )
+
+def predict_difficulty_cli(inputs, model_dir=None, output_format='text', workers=1, batch_size=8,
+                           output_path=None):
+    """
+    Command-line interface for the difficulty predictor.
+
+    `inputs` are simfile paths, directories or glob patterns. Results are
+    written as each simfile is scored, as text, as JSON lines or as CSV with
+    one row per chart. `json` prints one JSON array when a single simfile is
+    scored, and JSON lines otherwise. A throughput summary is printed to
+    stderr at the end of a run over several simfiles.
+
+    Returns:
+        The number of simfiles scored.
+    """
+    model_dir = model_dir or DEFAULT_MODEL_DIR
+    paths = expand_simfile_paths(inputs)
+    if not paths:
+        print("Error: No simfiles to score.", file=sys.stderr)
+        return 0
+    if output_format == 'json' and len(paths) > 1:
+        output_format = 'jsonl'
+
+    started = time.perf_counter()
+    files = charts = unscored = 0
+    with contextlib.ExitStack() as stack:
+        out = stack.enter_context(open(output_path, 'w', encoding='utf-8', newline='')) if output_path else sys.stdout
+        # Model loading and parse errors are reported on stdout; keep them out of the results
+        stack.enter_context(contextlib.redirect_stdout(sys.stderr))
+        writer = csv.DictWriter(out, fieldnames=OUTPUT_FIELDS) if output_format == 'csv' else None
+        if writer:
+            writer.writeheader()
+
+        for path, predictions in iter_file_predictions(paths, model_dir, workers, batch_size):
+            files += 1
+            charts += len(predictions)
+            unscored += not predictions
+            if output_format == 'json':
+                print(json.dumps(predictions, indent=4, default=float), file=out)
+            elif output_format == 'text':
+                _print_text(path, predictions, out)
+            else:
+                for row in _chart_rows(path, predictions):
+                    if writer:
+                        writer.writerow(row)
+                    else:
+                        out.write(json.dumps(row) + '\n')
+            out.flush()
+
+    if len(paths) > 1:
+        elapsed = time.perf_counter() - started
+        print(f"Scored {charts} charts from {files} simfiles ({unscored} without predictions) in {elapsed:.1f}s: "
+              f"{files / elapsed:.1f} simfiles/s, {charts / elapsed:.1f} charts/s", file=sys.stderr)
+    return files
+
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Predict the difficulty of StepMania charts.")
-    parser.add_argument("file_path", type=str, help="Path to the .sm file.")
-    parser.add_argument("--model_dir", type=str, help="Path to the directory containing trained models.")
-    parser.add_argument("--json", action="store_true", help="Output predictions in JSON format.")
+    parser.add_argument("inputs", type=str, nargs='*',
+                        help="Simfile paths, directories or glob patterns (quote them) to score.")
+    parser.add_argument("--file-list", type=str, default=None,
+                        help="File with one simfile path, directory or pattern per line ('-' for stdin).")
+    parser.add_argument("--model-dir", "--model_dir", dest="model_dir", type=str,
+                        help="Path to the directory containing trained models.")
+    parser.add_argument("--format", dest="output_format", choices=['text', 'json', 'jsonl', 'csv'], default='text',
+                        help="Output format; jsonl and csv have one row per chart.")
+    parser.add_argument("--json", dest="output_format", action="store_const", const='json',
+                        help="Output predictions in JSON format.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes.")
+    parser.add_argument("--batch-size", type=int, default=8, help="Number of simfiles per predict_batch call.")
+    parser.add_argument("--output", type=str, default=None, help="Write the results to this file instead of stdout.")
 
-    args = parser.parse_args()
-    predict_difficulty_cli(args.file_path, args.model_dir, args.json)
+    args = parser.parse_args(argv)
+    inputs = list(args.inputs)
+    if args.file_list:
+        with (contextlib.nullcontext(sys.stdin) if args.file_list == '-'
+              else open(args.file_list, 'r', encoding='utf-8')) as f:
+            inputs += [line.strip() for line in f if line.strip()]
+    if not inputs:
+        parser.error("give at least one simfile, directory or pattern, or --file-list")
+
+    scored = predict_difficulty_cli(inputs, args.model_dir, args.output_format, args.workers, args.batch_size,
+                                    args.output)
+    return 0 if scored else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
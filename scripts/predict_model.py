@@ -1,58 +1,55 @@
 import os
+import argparse
 import dotenv
-import pickle
-import pandas as pd
 import sys
 
 # Add the project root to the Python path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, project_root)
 
+from stepmania_difficulty_predictor.models.bulk_scoring import BulkScorer
+from stepmania_difficulty_predictor.models.prediction_pipeline import DEFAULT_MODEL_DIR
+
+def predict_model(dataset_path, output_path, model_dir=DEFAULT_MODEL_DIR, workers=1, chunk_size=10000):
+    """
+    Scores a feature dataset with the per-mode models and streams the
+    predictions to a CSV file.
+    """
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    scorer = BulkScorer(model_dir, workers=workers, chunk_size=chunk_size)
+    if not scorer.models:
+        print(f"Error: No models found in {model_dir}", file=sys.stderr)
+        return
+    print(f"Loaded {len(scorer.models)} models for modes: {list(scorer.models.keys())}")
+
+    rows = scorer.score(dataset_path, output_path)
+
+    print(f"Predictions for {rows} charts saved to {output_path}")
+    for mode, count in scorer.counts.items():
+        print(f"  - {mode}: {count}")
+
 if __name__ == '__main__':
     project_dir = os.path.join(os.path.dirname(__file__), os.pardir)
     dotenv_path = os.path.join(project_dir, '.env')
     dotenv.load_dotenv(dotenv_path)
 
     processed_data_folder = os.getenv("PROCESSED_DATA_FOLDER", "data/processed")
-    models_folder = "stepmania_difficulty_predictor/model"
     output_data_folder = os.getenv("OUTPUT_DATA_FOLDER", "data/output")
-    os.makedirs(output_data_folder, exist_ok=True)
-
-    # Load the dataset
-    df = pd.read_csv(os.path.join(processed_data_folder, 'dataset.csv'), index_col='id')
-
-    # Map difficulty strings to numerical values
-    difficulty_mapping = {
-        'Beginner': 1, 'Easy': 2, 'Medium': 3, 'Hard': 4, 'Challenge': 5, 'Edit': 0, 'Unknown': 0
-    }
-    df['difficulty'] = df['difficulty'].map(difficulty_mapping)
-    y_true = df['difficulty']
-
-    # Define feature columns explicitly to ensure they are all included
-    feature_cols = [
-        'meter', 'nps', 'length', 'L', 'D', 'U', 'R', 'left', 'right', 'all'
-    ]
-
-    X = df[feature_cols].copy()
-    for col in X.columns:
-        X[col] = pd.to_numeric(X[col], errors='coerce')
-
-    X = X.fillna(0)
-
-    # Load the trained model
-    with open(os.path.join(models_folder, 'random_forest_regressor.p'), "rb") as f:
-        regr = pickle.load(f)
-
-    # Generate predictions
-    predictions = regr.predict(X)
-
-    # Create a results DataFrame
-    results = pd.DataFrame({
-        'actual_difficulty': y_true,
-        'predicted_difficulty': predictions
-    }, index=df.index)
-
-    # Save the results
-    results.to_csv(os.path.join(output_data_folder, 'predictions.csv'))
 
-    print("Predictions saved to data/output/predictions.csv")
+    parser = argparse.ArgumentParser(description="Score a feature dataset with the per-mode models.")
+    parser.add_argument("dataset_path", type=str, nargs='?',
+                        default=os.path.join(processed_data_folder, 'dataset.csv'),
+                        help="Path to the feature dataset (dataset.csv).")
+    parser.add_argument("output_path", type=str, nargs='?',
+                        default=os.path.join(output_data_folder, 'predictions.csv'),
+                        help="Path to save the predictions CSV.")
+    parser.add_argument("--model-dir", type=str, default=DEFAULT_MODEL_DIR,
+                        help="Directory containing one trained model per mode.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of scoring processes.")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Number of dataset rows read at a time.")
+    args = parser.parse_args()
+
+    predict_model(args.dataset_path, args.output_path, args.model_dir, args.workers, args.chunk_size)
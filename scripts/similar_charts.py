@@ -0,0 +1,86 @@
+import os
+import sys
+import argparse
+import simfile
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stepmania_difficulty_predictor.data.SMChartPreprocessor import SMChartPreprocessor
+from stepmania_difficulty_predictor.features.FeatureExtractor import FeatureExtractor
+from stepmania_difficulty_predictor.models.similarity_index import SimilarityIndex
+
+def _print_neighbours(title, neighbours):
+    print(title)
+    for neighbour in neighbours:
+        print(f"  {neighbour['id']}  meter {neighbour['meter']:g}  distance {neighbour['distance']:.3f}")
+
+def build(dataset_path, index_dir):
+    """
+    Builds a similarity index from a feature dataset.
+    """
+    index = SimilarityIndex.build(dataset_path, index_dir)
+    for mode, mode_index in index.modes.items():
+        print(f"  - {mode}: {mode_index.rows} charts")
+    print(f"Similarity index saved to {index_dir}")
+
+def append(dataset_path, index_dir):
+    """
+    Appends the charts of a feature dataset to a similarity index.
+    """
+    appended = SimilarityIndex(index_dir).append_dataset(dataset_path)
+    for mode, count in appended.items():
+        print(f"  - {mode}: {count} charts appended")
+    print(f"Appended {sum(appended.values())} charts to {index_dir}")
+
+def query(index_dir, chart_id=None, simfile_path=None, k=10):
+    """
+    Prints the indexed charts most similar to an indexed chart, or to every
+    chart of a simfile.
+    """
+    index = SimilarityIndex(index_dir)
+    if chart_id is not None:
+        try:
+            _print_neighbours(f"Charts similar to {chart_id}:", index.query_id(chart_id, k))
+        except KeyError:
+            print(f"Error: chart {chart_id} is not in the index", file=sys.stderr)
+        return
+
+    # Compute the features the index was built with
+    pattern_buckets = max((sum(column.startswith('pattern_') for column in mode_index.columns)
+                           for mode_index in index.modes.values()), default=0)
+    extractor = FeatureExtractor(alpha=3, pattern_buckets=pattern_buckets)
+    sm = simfile.open(simfile_path, strict=False)
+    for chart_data in SMChartPreprocessor().preprocess(sm):
+        if not chart_data.get('chart'):
+            continue
+        neighbours = index.query(chart_data['mode'], extractor.compute(chart_data['chart']), k)
+        _print_neighbours(f"{chart_data['mode']} {chart_data.get('difficulty')} "
+                          f"(meter {chart_data.get('meter')}):", neighbours)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Find charts that play like a given one.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="Build an index from a feature dataset.")
+    build_parser.add_argument("dataset_path", type=str, help="Path to the feature dataset (dataset.csv).")
+    build_parser.add_argument("index_dir", type=str, help="Directory to save the index to.")
+
+    append_parser = subparsers.add_parser('append', help="Append the charts of a feature dataset.")
+    append_parser.add_argument("dataset_path", type=str, help="Path to a feature dataset of new charts.")
+    append_parser.add_argument("index_dir", type=str, help="Directory holding the index.")
+
+    query_parser = subparsers.add_parser('query', help="Find the charts most similar to a chart.")
+    query_parser.add_argument("index_dir", type=str, help="Directory holding the index.")
+    target = query_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--id", type=str, help="Id of an indexed chart.")
+    target.add_argument("--simfile", type=str, help="Path to a simfile whose charts to look up.")
+    query_parser.add_argument("-k", type=int, default=10, help="Number of similar charts to list.")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build(args.dataset_path, args.index_dir)
+    elif args.command == 'append':
+        append(args.dataset_path, args.index_dir)
+    else:
+        query(args.index_dir, args.id, args.simfile, args.k)
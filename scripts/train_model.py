@@ -1,15 +1,27 @@
 import pandas as pd
 import pickle
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split, GridSearchCV
+from sklearn.model_selection import train_test_split, GridSearchCV, GroupShuffleSplit, GroupKFold
 from sklearn.metrics import r2_score
 import os
 import argparse
+import sys
 import numpy as np
 
-def train_model(dataset_path, model_dir):
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stepmania_difficulty_predictor.data.shared_matrix import SharedFeatureMatrix
+from stepmania_difficulty_predictor.models.tiered_forest import distill_forest
+
+def train_model(dataset_path, model_dir, distill=False):
     """
     Trains a separate model for each game mode in the dataset and saves them.
+
+    With `distill`, a small forest mimicking each model is also saved under
+    `model_dir/distilled`, to serve as the first tier of tiered inference,
+    along with a bound on its error against the model measured on held-out
+    training rows.
     """
     df = pd.read_csv(dataset_path)
 
@@ -34,7 +46,7 @@ def train_model(dataset_path, model_dir):
             print(f"Skipping mode '{mode}': not enough data (found {len(group)} samples).")
             continue
 
-        X = group.drop(columns=['meter', 'mode'])
+        X = group.drop(columns=['id', 'meter', 'mode', 'group'], errors='ignore')
         y = group['meter']
 
         # Determine the maximum meter in this mode to use for normalization if needed
@@ -42,7 +54,18 @@ def train_model(dataset_path, model_dir):
         # The user specifically requested a floating point difficulty scale
         y = y.astype(float)
 
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        # Duplicate charts share a group; keep each group on one side of every
+        # split so copies of a chart cannot leak from training into evaluation
+        chart_groups = group['group'] if 'group' in group else None
+        if chart_groups is not None and chart_groups.nunique() >= 5:
+            splitter = GroupShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
+            train_idx, test_idx = next(splitter.split(X, y, chart_groups))
+            X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
+            y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
+            cv, fit_params = GroupKFold(n_splits=3), {'groups': chart_groups.iloc[train_idx]}
+        else:
+            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+            cv, fit_params = 3, {}
 
         # Hyperparameter tuning with GridSearchCV
         param_grid = {
@@ -52,11 +75,17 @@ def train_model(dataset_path, model_dir):
         }
 
         rf = RandomForestRegressor(random_state=42)
-        grid_search = GridSearchCV(estimator=rf, param_grid=param_grid, cv=3, n_jobs=-1, verbose=1)
+        grid_search = GridSearchCV(estimator=rf, param_grid=param_grid, cv=cv, n_jobs=-1, verbose=1,
+                                   refit=False)
 
-        grid_search.fit(X_train, y_train)
+        # The search workers attach to one shared copy of the training matrix
+        # instead of each unpickling their own
+        with SharedFeatureMatrix.create(X_train) as shared_X:
+            grid_search.fit(shared_X.values, y_train.to_numpy(), **fit_params)
 
-        best_model = grid_search.best_estimator_
+        # Refit on the DataFrame so the model keeps its feature names
+        best_model = RandomForestRegressor(random_state=42, **grid_search.best_params_)
+        best_model.fit(X_train, y_train)
 
         y_pred = best_model.predict(X_test)
 
@@ -71,9 +100,19 @@ def train_model(dataset_path, model_dir):
 
         print(f"Saved trained model for '{mode}' to {model_path}\n")
 
+        if distill:
+            distilled_dir = os.path.join(model_dir, 'distilled')
+            os.makedirs(distilled_dir, exist_ok=True)
+            distilled_path = os.path.join(distilled_dir, model_filename)
+            with open(distilled_path, 'wb') as f:
+                pickle.dump(distill_forest(best_model, X_train), f)
+            print(f"Saved distilled first-tier model for '{mode}' to {distilled_path}\n")
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Train a difficulty prediction model for each game mode.")
     parser.add_argument("dataset_path", type=str, help="Path to the feature dataset (dataset.csv).")
     parser.add_argument("model_dir", type=str, help="Directory to save the trained model files.")
+    parser.add_argument("--distill", action="store_true",
+                        help="Also save a small distilled forest per mode for tiered inference.")
     args = parser.parse_args()
-    train_model(args.dataset_path, args.model_dir)
+    train_model(args.dataset_path, args.model_dir, args.distill)
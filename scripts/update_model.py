@@ -0,0 +1,145 @@
+import pandas as pd
+import pickle
+import json
+import time
+import shutil
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, GroupShuffleSplit
+from sklearn.metrics import r2_score
+import os
+import argparse
+import sys
+import numpy as np
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stepmania_difficulty_predictor.models.incremental import update_forest
+
+def _clean_mode_rows(df, mode):
+    """
+    Selects one mode's rows, cleaned the way `train_model.py` does.
+    """
+    group = df[df['mode'] == mode].replace([np.inf, -np.inf], np.nan)
+    return group.dropna(axis=1, how='all').dropna()
+
+def update_model(model_dir, dataset_path, output_dir, n_trees=50, retire=0, time_budget=None,
+                 holdout=0.2, full_dataset_path=None):
+    """
+    Adds trees trained on new feature rows to each mode's model and saves the
+    result as a new model version.
+
+    A `holdout` fraction of the new rows is kept out of the update to score
+    the previous and updated models. With `full_dataset_path`, the dataset the
+    previous models were trained on, a model with the same hyperparameters is
+    also retrained from scratch on it plus the new training rows, and the
+    updated model's hold-out score is reported relative to it.
+
+    The `time_budget`, in seconds, is shared by all modes being updated; the
+    comparison retrain does not count against it. Models of modes without new rows are copied unchanged. Distilled
+    first-tier models are not carried over, since they mimic the old forests.
+    """
+    df = pd.read_csv(dataset_path)
+    full_df = pd.read_csv(full_dataset_path) if full_dataset_path else None
+    os.makedirs(output_dir, exist_ok=True)
+
+    model_files = sorted(f for f in os.listdir(model_dir) if f.endswith('.p'))
+    modes_to_update = [f[:-len('.p')] for f in model_files if (df['mode'] == f[:-len('.p')]).any()]
+    start = time.perf_counter()
+    spent = 0.0
+    report = {}
+
+    for model_file in model_files:
+        mode = model_file[:-len('.p')]
+        model_path = os.path.join(model_dir, model_file)
+        output_path = os.path.join(output_dir, model_file)
+        if mode not in modes_to_update:
+            shutil.copyfile(model_path, output_path)
+            continue
+
+        print(f"--- Updating model for mode: {mode} ---")
+        with open(model_path, 'rb') as f:
+            model = pickle.load(f)
+
+        group = _clean_mode_rows(df, mode)
+        X = group.reindex(columns=model.feature_names_in_, fill_value=0)
+        y = group['meter'].astype(float)
+
+        chart_groups = group['group'] if 'group' in group else None
+        if chart_groups is not None and chart_groups.nunique() >= 5:
+            splitter = GroupShuffleSplit(n_splits=1, test_size=holdout, random_state=42)
+            train_idx, test_idx = next(splitter.split(X, y, chart_groups))
+            X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
+            y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
+        elif len(group) >= 10:
+            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=holdout, random_state=42)
+        else:
+            print(f"Skipping mode '{mode}': not enough new data (found {len(group)} samples).")
+            shutil.copyfile(model_path, output_path)
+            continue
+
+        # Split what is left of the budget evenly between the remaining modes
+        remaining = modes_to_update[modes_to_update.index(mode):]
+        mode_budget = None
+        if time_budget is not None:
+            mode_budget = max(time_budget - spent, 0) / len(remaining)
+
+        update_start = time.perf_counter()
+        updated, added, retired = update_forest(model, X_train, y_train, n_trees=n_trees,
+                                                retire=retire, time_budget=mode_budget)
+        update_seconds = time.perf_counter() - update_start
+        spent += update_seconds
+
+        result = {
+            'new_rows': len(X_train),
+            'holdout_rows': len(X_test),
+            'trees_added': added,
+            'trees_retired': retired,
+            'trees': len(updated.estimators_),
+            'update_seconds': update_seconds,
+            'previous_r2': r2_score(y_test, model.predict(X_test)),
+            'updated_r2': r2_score(y_test, updated.predict(X_test)),
+        }
+
+        if full_df is not None:
+            full_group = _clean_mode_rows(full_df, mode)
+            full_X = pd.concat([full_group.reindex(columns=model.feature_names_in_, fill_value=0), X_train])
+            full_y = pd.concat([full_group['meter'].astype(float), y_train])
+            full_model = clone(model).set_params(warm_start=False).fit(full_X, full_y)
+            result['full_retrain_r2'] = r2_score(y_test, full_model.predict(X_test))
+            result['r2_shift_vs_full_retrain'] = result['updated_r2'] - result['full_retrain_r2']
+
+        print(f"Added {added} and retired {retired} trees: hold-out R^2 "
+              f"{result['previous_r2']:.3f} -> {result['updated_r2']:.3f}")
+        if 'full_retrain_r2' in result:
+            print(f"Full retrain hold-out R^2 {result['full_retrain_r2']:.3f} "
+                  f"(shift {result['r2_shift_vs_full_retrain']:+.3f})")
+
+        with open(output_path, 'wb') as f:
+            pickle.dump(updated, f)
+        print(f"Saved updated model for '{mode}' to {output_path}\n")
+        report[mode] = result
+
+    report_path = os.path.join(output_dir, 'update_report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump({'source': os.path.abspath(model_dir), 'dataset': os.path.abspath(dataset_path),
+                   'seconds': time.perf_counter() - start, 'modes': report}, f, indent=4)
+    print(f"Update report saved to {report_path}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Update the per-mode models with new feature rows.")
+    parser.add_argument("model_dir", type=str, help="Directory holding the current model files.")
+    parser.add_argument("dataset_path", type=str, help="Path to the feature dataset of the new charts only.")
+    parser.add_argument("output_dir", type=str, help="Directory to save the new model version to.")
+    parser.add_argument("--trees", type=int, default=50, help="Maximum number of trees to add per mode.")
+    parser.add_argument("--retire", type=int, default=0, help="Number of the oldest trees to remove per mode.")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="Seconds to spend adding trees, shared by all modes.")
+    parser.add_argument("--holdout", type=float, default=0.2,
+                        help="Fraction of the new rows held out to score the update.")
+    parser.add_argument("--full-dataset", type=str, default=None,
+                        help="Dataset the current models were trained on; also retrain from scratch "
+                             "for comparison.")
+    args = parser.parse_args()
+    update_model(args.model_dir, args.dataset_path, args.output_dir, args.trees, args.retire,
+                 args.time_budget, args.holdout, args.full_dataset)
@@ -0,0 +1,52 @@
+import os
+import sys
+import argparse
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stepmania_difficulty_predictor.data.supervisor import FileBudget
+from stepmania_difficulty_predictor.models.prediction_pipeline import DEFAULT_MODEL_DIR, ModeAgnosticDifficultyPredictor
+from stepmania_difficulty_predictor.models.songs_watcher import SongsWatcher
+
+def watch_songs(songs_dir, db_path, model_dir=DEFAULT_MODEL_DIR, interval=60.0, once=False, settle=2.0,
+                timeout=None, max_rss_mb=None):
+    """
+    Keeps the predictions of a songs directory up to date in a SQLite
+    database, re-scoring only the simfiles added or changed since the last
+    poll.
+    """
+    if not os.path.isdir(songs_dir):
+        print(f"Error: Songs directory not found at {songs_dir}", file=sys.stderr)
+        return
+
+    budget = None
+    if timeout is not None or max_rss_mb is not None:
+        budget = FileBudget(timeout, max_rss_mb, f"{os.path.splitext(db_path)[0]}.quarantine.json")
+    with ModeAgnosticDifficultyPredictor(model_dir=model_dir, file_budget=budget) as predictor, \
+            SongsWatcher(songs_dir, db_path, predictor, settle=settle) as watcher:
+        try:
+            for counts in watcher.watch(interval, polls=1 if once else None):
+                print(f"Added {counts['added']}, changed {counts['changed']}, removed {counts['removed']}, "
+                      f"touched {counts['touched']}, pending {counts['pending']}, "
+                      f"unchanged {counts['unchanged']}", flush=True)
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Keep the predictions of a songs folder up to date.")
+    parser.add_argument("songs_dir", type=str, help="The StepMania Songs directory to watch.")
+    parser.add_argument("db_path", type=str, help="SQLite database holding the file index and predictions.")
+    parser.add_argument("--model-dir", type=str, default=DEFAULT_MODEL_DIR,
+                        help="Directory containing one trained model per mode.")
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between polls.")
+    parser.add_argument("--once", action="store_true", help="Poll once and exit.")
+    parser.add_argument("--settle", type=float, default=2.0,
+                        help="Seconds a simfile must go unmodified before it is scored.")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Maximum seconds per simfile; enables supervised workers.")
+    parser.add_argument("--max-rss-mb", type=float, default=None,
+                        help="Maximum worker memory per simfile in MiB; enables supervised workers.")
+    args = parser.parse_args()
+    watch_songs(args.songs_dir, args.db_path, args.model_dir, args.interval, args.once, args.settle,
+                args.timeout, args.max_rss_mb)
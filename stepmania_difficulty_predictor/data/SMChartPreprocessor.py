@@ -1,9 +1,14 @@
 import sys
 import numpy as np
 import simfile
+from collections import OrderedDict
 from simfile.timing import TimingData
-from simfile.timing.engine import TimingEngine
-from simfile.notes import NoteData, NoteType
+from simfile.notes import NoteType
+
+from stepmania_difficulty_predictor.data.notes import note_arrays
+from stepmania_difficulty_predictor.data.timing import TimingTable, timing_key
+
+TAP = ord(NoteType.TAP.value)
 
 class SMChartPreprocessor:
     """
@@ -12,14 +17,25 @@ class SMChartPreprocessor:
         'name': name of stepfile (str),
         'difficulty': difficulty of the chart (str),
         'meter': meter of the chart (int),
+        'chart_index': position of the chart among the simfile's charts (int),
         'chart': {
             timestamps (float): binary step encodings (str)
         }
     }
+
+    Each chart is timed with its own timing data, so `.ssc` charts with their
+    own BPMs, stops, delays or warps get correct times. Timing tables are
+    cached by a hash of their timing data, so charts sharing timing (within a
+    simfile or across a pack) reuse the same precomputed table.
+
+    Note data is read with `tokenize_notes`, straight into arrays, rather
+    than through a `Note` object per note.
     """
 
-    def __init__(self, decimals=3):
+    def __init__(self, decimals=3, timing_cache_size=256):
         self.decimals = decimals
+        self.timing_cache_size = timing_cache_size
+        self._timing_tables = OrderedDict()
 
     def preprocess(self, sm_file: simfile.Simfile):
         """
@@ -29,46 +45,29 @@ class SMChartPreprocessor:
         if not hasattr(sm_file, 'charts') or not sm_file.charts:
             return preprocessed_charts
 
-        timing_data = TimingData(sm_file)
-        timing_engine = TimingEngine(timing_data)
-
-        for chart in sm_file.charts:
+        for chart_index, chart in enumerate(sm_file.charts):
             if not chart or not chart.stepstype:
                 continue
 
-            note_data = NoteData(chart)
-
-            # Group notes by timestamp
-            notes_by_time = {}
-            for note in note_data:
-                if note.note_type == NoteType.TAP:
-                    try:
-                        time = timing_engine.time_at(note.beat)
-                        time = np.round(time, self.decimals)
-                        if time not in notes_by_time:
-                            notes_by_time[time] = []
-                        notes_by_time[time].append(note.column)
-                    except (ValueError, KeyError):
-                        continue
-
-            if not notes_by_time:
+            num_panels = self.num_panels(chart)
+            if num_panels == 0:
                 continue
 
-            # Determine the number of panels
-            if hasattr(chart, 'columns') and chart.columns:
-                num_panels = len(chart.columns)
-            else:
-                # Fallback for older simfile versions or malformed charts
-                mode_panels = {'dance-single': 4, 'dance-double': 8, 'pump-single': 5, 'pump-double': 10}
-                num_panels = mode_panels.get(chart.stepstype, 0)
+            try:
+                timing_table = self.timing_table(sm_file, chart)
+            except (ValueError, KeyError, IndexError) as e:
+                print(f"Error timing {chart.stepstype} chart of "
+                      f"{getattr(sm_file, 'title', 'Unknown')}: {e}", file=sys.stderr)
+                continue
 
-            if num_panels == 0:
+            notes = note_arrays(chart)
+            taps = notes.select(notes.note_types == TAP)
+            if len(taps.columns) == 0:
                 continue
 
-            chart_dict = {
-                time: self._encode_row(columns, num_panels)
-                for time, columns in notes_by_time.items()
-            }
+            times = np.round(timing_table.times_at_fractions(taps.beat_numerators, taps.beat_denominators),
+                             self.decimals)
+            chart_dict = self._encode_rows(times, taps.columns, num_panels)
 
             difficulty = getattr(chart, 'difficulty', 'Unknown')
             if difficulty.isdigit():
@@ -88,17 +87,55 @@ class SMChartPreprocessor:
                 'mode': chart.stepstype,
                 'difficulty': difficulty,
                 'meter': meter,
+                'chart_index': chart_index,
                 'chart': chart_dict,
             })
 
         return preprocessed_charts
 
-    def _encode_row(self, columns: list[int], num_panels: int) -> str:
+    def timing_table(self, sm_file: simfile.Simfile, chart=None) -> TimingTable:
+        """
+        Returns the timing table of a chart, shared by every chart with the same timing.
+
+        Args:
+            sm_file: The simfile holding the chart.
+            chart: The chart; its own timing is used when the simfile format has
+                   per-chart timing and the chart defines any.
+        """
+        timing_data = TimingData(sm_file, chart)
+        key = timing_key(timing_data)
+        if key in self._timing_tables:
+            self._timing_tables.move_to_end(key)
+            return self._timing_tables[key]
+
+        timing_table = TimingTable(timing_data)
+        self._timing_tables[key] = timing_table
+        if len(self._timing_tables) > self.timing_cache_size:
+            self._timing_tables.popitem(last=False)
+        return timing_table
+
+    def num_panels(self, chart) -> int:
+        """
+        Determines the number of panels of a chart, 0 if it is unknown.
+        """
+        if hasattr(chart, 'columns') and chart.columns:
+            return len(chart.columns)
+
+        # Fallback for older simfile versions or malformed charts
+        mode_panels = {'dance-single': 4, 'dance-double': 8, 'pump-single': 5, 'pump-double': 10}
+        return mode_panels.get(chart.stepstype, 0)
+
+    def _encode_rows(self, times: np.ndarray, columns: np.ndarray, num_panels: int) -> dict:
         """
-        Encodes a list of active columns for a given row/timestamp into a binary string.
+        Groups notes by timestamp and encodes the active columns of each row into
+        a binary string. Rows keep the order in which their timestamps first appear.
         """
-        encoding = ['0'] * num_panels
-        for col in columns:
-            if 0 <= col < num_panels:
-                encoding[col] = '1'
-        return "".join(encoding)
+        row_times, first, rows = np.unique(times, return_index=True, return_inverse=True)
+        valid = (columns >= 0) & (columns < num_panels)
+        panels = np.zeros((len(row_times), num_panels), dtype=np.uint8)
+        panels[rows[valid], columns[valid]] = 1
+
+        order = np.argsort(first, kind='stable')
+        encoded = (panels[order] + ord('0')).tobytes().decode('ascii')
+        encodings = [encoded[i:i + num_panels] for i in range(0, len(encoded), num_panels)]
+        return dict(zip(row_times[order].tolist(), encodings))
@@ -0,0 +1,250 @@
+import os
+import sys
+import pandas as pd
+import simfile
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from stepmania_difficulty_predictor.data.SMChartPreprocessor import SMChartPreprocessor
+from stepmania_difficulty_predictor.data.dedup import ChartDeduplicator
+from stepmania_difficulty_predictor.data.sm_data_loader import open_simfile_source, simfile_source_key
+from stepmania_difficulty_predictor.data.supervisor import FileBudget, FileSupervisor
+from stepmania_difficulty_predictor.features.FeatureExtractor import FeatureExtractor
+
+def iter_preprocessed_charts(simfiles: Iterable[simfile.Simfile],
+                             preprocessor: Optional[SMChartPreprocessor] = None) -> Iterator[dict]:
+    """
+    Streams preprocessed charts out of an iterable of simfiles.
+
+    Each simfile is released as soon as its charts have been yielded, so
+    passing a lazy iterable (e.g. `iter_sm_files_from_directory`) keeps at
+    most one parsed simfile alive.
+
+    Args:
+        simfiles: Any iterable of parsed simfile objects.
+        preprocessor: The preprocessor to use. Defaults to `SMChartPreprocessor()`.
+
+    Yields:
+        Preprocessed chart dictionaries, as produced by `SMChartPreprocessor`.
+    """
+    preprocessor = preprocessor or SMChartPreprocessor()
+    for sm_file in simfiles:
+        try:
+            preprocessed_charts = preprocessor.preprocess(sm_file)
+        except Exception as e:
+            print(f"Error processing {getattr(sm_file, 'title', 'Unknown')}: {e}", file=sys.stderr)
+            continue
+        yield from preprocessed_charts
+
+_source_preprocessor = None
+
+def preprocess_source(source) -> List[dict]:
+    """
+    Parses and preprocesses one simfile source from `iter_simfile_sources`.
+
+    Runs in supervised worker processes, each keeping its own preprocessor
+    so that timing tables are cached across files.
+    """
+    global _source_preprocessor
+    if _source_preprocessor is None:
+        _source_preprocessor = SMChartPreprocessor()
+    return _source_preprocessor.preprocess(open_simfile_source(source))
+
+def iter_source_charts(sources: Iterable, budget: Optional[FileBudget] = None) -> Iterator[Tuple[object, List[dict]]]:
+    """
+    Preprocesses simfile sources, keeping track of which source each chart came from.
+
+    Without a budget, sources are preprocessed one after the other in this
+    process. With one, each simfile is preprocessed in a supervised worker
+    process under the budget's per-file limits (see `FileSupervisor`): files
+    that exceed them are killed, recorded in the budget's quarantine report
+    and skipped, here and on later runs.
+
+    Args:
+        sources: Simfile sources, e.g. from `iter_simfile_sources`.
+        budget: The per-file limits, quarantine report and number of workers.
+
+    Yields:
+        A tuple `(source, charts)` per successfully preprocessed source, in
+        source order.
+    """
+    supervisor = None if budget is None else FileSupervisor(preprocess_source, budget, key=simfile_source_key)
+    try:
+        if supervisor is None:
+            results = ((source, *_try_preprocess_source(source)) for source in sources)
+        else:
+            results = supervisor.map(sources)
+
+        for source, charts, error in results:
+            if error is not None:
+                print(f"Error processing {simfile_source_key(source)}: {error}", file=sys.stderr)
+                continue
+            yield source, charts
+    finally:
+        if supervisor is not None:
+            supervisor.close()
+
+def _try_preprocess_source(source) -> Tuple[Optional[List[dict]], Optional[str]]:
+    """
+    Preprocesses one source in this process, reporting errors as `FileSupervisor` does.
+    """
+    try:
+        return preprocess_source(source), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def iter_deduplicated_charts(charts: Iterable[dict],
+                             deduplicator: Optional[ChartDeduplicator] = None,
+                             keep_duplicates: bool = False) -> Iterator[dict]:
+    """
+    Tags every chart with its duplicate group and drops repeated charts.
+
+    Args:
+        charts: Any iterable of preprocessed chart dictionaries.
+        deduplicator: The deduplicator to use. Defaults to `ChartDeduplicator()`;
+                      its `duplicates` counter reports what was found.
+        keep_duplicates: If True, duplicates are yielded too, so that they can
+                         be kept on the same side of a train/test split by group.
+
+    Yields:
+        The chart dictionaries with an added `group` key.
+    """
+    deduplicator = deduplicator or ChartDeduplicator()
+    for chart_data in charts:
+        chart = chart_data.get('chart', {})
+        if not chart:
+            continue
+
+        group, duplicate = deduplicator.add(chart, chart_data.get('mode'))
+        if duplicate and not keep_duplicates:
+            continue
+        yield {**chart_data, 'group': group}
+
+def iter_feature_rows(charts: Iterable[dict],
+                      extractor: Optional[FeatureExtractor] = None,
+                      batch_size: int = 256) -> Iterator[dict]:
+    """
+    Streams dataset rows out of an iterable of preprocessed charts.
+
+    Features are computed `batch_size` charts at a time with
+    `FeatureExtractor.compute_batch`.
+
+    Args:
+        charts: Any iterable of preprocessed chart dictionaries.
+        extractor: The feature extractor to use. Defaults to `FeatureExtractor()`.
+        batch_size: Number of charts whose features are computed together.
+
+    Yields:
+        Dictionaries holding the chart's meter, mode and features, in the
+        same layout as the rows of `dataset.csv`, plus its duplicate `group`
+        when the chart has one.
+    """
+    extractor = extractor or FeatureExtractor()
+    charts = (chart_data for chart_data in charts if chart_data.get('chart'))
+    for batch in iter(lambda: list(islice(charts, batch_size)), []):
+        for chart_data, features in zip(batch, extractor.compute_batch([c['chart'] for c in batch])):
+            row = {
+                'meter': chart_data.get('meter', 0),
+                'mode': chart_data.get('mode', 'unknown'),
+                **features
+            }
+            if 'group' in chart_data:
+                row['group'] = chart_data['group']
+            yield row
+
+class DatasetWriter:
+    """
+    Appends dataset rows to a CSV file in fixed-size chunks.
+
+    The header is taken from the first chunk. Charts of a mode with more panels
+    than any seen so far introduce new columns; when that happens the rows
+    already on disk are rewritten chunk by chunk under the widened header, so
+    memory stays bounded by `chunk_size` either way.
+    """
+    def __init__(self, output_path: str, chunk_size: int = 1000):
+        """
+        Initializes the DatasetWriter. Any existing file at `output_path` is replaced.
+
+        Args:
+            output_path: Path of the CSV file to write.
+            chunk_size: Number of rows buffered before they are flushed to disk.
+        """
+        self.output_path = output_path
+        self.chunk_size = chunk_size
+        self.columns: List[str] = []
+        self.rows_written = 0
+        self._buffer: List[dict] = []
+
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    def write(self, row: dict):
+        """
+        Buffers a single row, flushing the buffer once it reaches `chunk_size`.
+        """
+        self._buffer.append(row)
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all buffered rows to disk.
+        """
+        if not self._buffer:
+            return
+
+        chunk = pd.DataFrame(self._buffer)
+        self._buffer = []
+
+        new_columns = [col for col in chunk.columns if col not in self.columns]
+        if new_columns and self.rows_written:
+            self._widen(self.columns + new_columns)
+        elif new_columns:
+            self.columns = self.columns + new_columns
+
+        chunk = chunk.reindex(columns=self.columns)
+        chunk.to_csv(self.output_path, mode='a', header=self.rows_written == 0,
+                     index=False, encoding='utf-8')
+        self.rows_written += len(chunk)
+
+    def close(self):
+        """
+        Flushes any remaining rows.
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _widen(self, columns: List[str]):
+        """
+        Rewrites the rows already on disk under a wider header.
+        """
+        tmp_path = f"{self.output_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            for i, chunk in enumerate(pd.read_csv(self.output_path, chunksize=self.chunk_size,
+                                                      dtype={'id': str, 'group': str},
+                                                      float_precision='round_trip', encoding='utf-8')):
+                chunk.reindex(columns=columns).to_csv(f, header=i == 0, index=False)
+        os.replace(tmp_path, self.output_path)
+        self.columns = columns
+
+def write_dataset(rows: Iterable[dict], output_path: str, chunk_size: int = 1000) -> int:
+    """
+    Streams dataset rows into a CSV file in chunks.
+
+    Args:
+        rows: Any iterable of dataset rows, e.g. from `iter_feature_rows`.
+        output_path: Path of the CSV file to write.
+        chunk_size: Number of rows held in memory before each write.
+
+    Returns:
+        The number of rows written.
+    """
+    with DatasetWriter(output_path, chunk_size=chunk_size) as writer:
+        for row in rows:
+            writer.write(row)
+    return writer.rows_written
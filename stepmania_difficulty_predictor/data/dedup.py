@@ -0,0 +1,115 @@
+import hashlib
+import numpy as np
+from collections import Counter
+from typing import Optional, Tuple
+
+from stepmania_difficulty_predictor.features.columnar import chart_to_arrays, mix64, row_bitmasks
+
+class ChartDeduplicator:
+    """
+    Groups exact and near-duplicate charts by fingerprinting their note streams.
+
+    A chart is reduced to a sequence of tokens, one per row, holding the time
+    since the previous row (in milliseconds) and the bitmask of its panels.
+    This makes the fingerprint independent of the song offset and metadata.
+
+    - Exact duplicates share a hash of the whole token sequence.
+    - Near duplicates are found with MinHash over token n-grams: each chart
+      gets a signature of `num_perm` minimum hashes, split into `bands` for
+      locality-sensitive hashing. Charts sharing a band are candidates, and a
+      candidate is a duplicate when the fraction of matching signature entries,
+      an estimate of n-gram Jaccard similarity, reaches `threshold`.
+
+    Charts are only compared within the same mode.
+    """
+    def __init__(self, threshold: float = 0.8, ngram: int = 4, num_perm: int = 64,
+                 bands: int = 16, seed: int = 0):
+        """
+        Initializes the ChartDeduplicator.
+
+        Args:
+            threshold: Minimum estimated Jaccard similarity for a near duplicate.
+            ngram: Number of consecutive rows per shingle.
+            num_perm: Number of MinHash functions in each signature.
+            bands: Number of LSH bands; must divide `num_perm`.
+            seed: Seed of the MinHash functions.
+        """
+        if num_perm % bands:
+            raise ValueError("bands must divide num_perm.")
+        self.threshold = threshold
+        self.ngram = ngram
+        self.num_perm = num_perm
+        self.bands = bands
+        self.seeds = np.random.default_rng(seed).integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+        self.duplicates = Counter()
+        self._exact = {}
+        self._buckets = {}
+        self._signatures = []
+        # Exact hash of the first chart of each group
+        self.group_hashes = []
+
+    def fingerprint(self, chart: dict) -> Tuple[str, np.ndarray]:
+        """
+        Computes the exact hash and MinHash signature of a chart.
+
+        Args:
+            chart: A dictionary representing the chart, with timestamps as keys
+                   and binary step encodings as values.
+
+        Returns:
+            A tuple `(exact_hash, signature)`.
+        """
+        times, panels = chart_to_arrays(chart)
+        ticks = np.rint(times * 1000).astype(np.int64)
+        deltas = np.diff(ticks, prepend=ticks[:1])
+        bitmasks = row_bitmasks(panels)
+
+        exact_hash = hashlib.blake2b(np.int64(panels.shape[1]).tobytes() + deltas.tobytes()
+                                     + bitmasks.tobytes(), digest_size=16).hexdigest()
+
+        tokens = mix64(((deltas << 16) | bitmasks).astype(np.uint64))
+        n = min(self.ngram, len(tokens))
+        shingles = np.zeros(len(tokens) - n + 1, dtype=np.uint64)
+        for k in range(n):
+            shingles = mix64(shingles ^ tokens[k:len(tokens) - n + 1 + k])
+
+        signature = mix64(shingles[:, None] ^ self.seeds[None, :]).min(axis=0)
+        return exact_hash, signature
+
+    def add(self, chart: dict, mode: Optional[str] = None) -> Tuple[int, Optional[str]]:
+        """
+        Assigns a chart to a duplicate group, registering it as a new group if
+        it duplicates no earlier chart.
+
+        Args:
+            chart: A dictionary representing the chart, with timestamps as keys
+                   and binary step encodings as values.
+            mode: The chart's game mode.
+
+        Returns:
+            A tuple `(group, duplicate)` where `group` is the id of the chart's
+            duplicate group and `duplicate` is `'exact'`, `'near'` or None if
+            the chart is the first of its group.
+        """
+        exact_hash, signature = self.fingerprint(chart)
+        if (mode, exact_hash) in self._exact:
+            self.duplicates['exact'] += 1
+            return self._exact[(mode, exact_hash)], 'exact'
+
+        band_keys = [(mode, i, band.tobytes())
+                     for i, band in enumerate(np.split(signature, self.bands))]
+        candidates = {group for key in band_keys for group in self._buckets.get(key, ())}
+        for group in sorted(candidates):
+            if np.mean(self._signatures[group] == signature) >= self.threshold:
+                self.duplicates['near'] += 1
+                self._exact[(mode, exact_hash)] = group
+                return group, 'near'
+
+        group = len(self._signatures)
+        self._signatures.append(signature)
+        self.group_hashes.append(exact_hash)
+        self._exact[(mode, exact_hash)] = group
+        for key in band_keys:
+            self._buckets.setdefault(key, []).append(group)
+        return group, None
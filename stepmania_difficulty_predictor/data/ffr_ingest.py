@@ -0,0 +1,188 @@
+import json
+import numpy as np
+from itertools import chain, islice
+from typing import IO, Iterator, List
+
+FFR_MODE = 'ffr'
+FFR_PANELS = ('L', 'D', 'U', 'R')
+
+# Binary step encoding of every 4-panel bitmask, bit i marking panel i
+ENCODINGS = np.array([''.join('1' if mask >> i & 1 else '0' for i in range(len(FFR_PANELS)))
+                      for mask in range(1 << len(FFR_PANELS))])
+
+def iter_json_array(fp: IO[str], read_size: int = 1 << 20) -> Iterator:
+    """
+    Incrementally parses a top-level JSON array, yielding one element at a time.
+
+    Only the element being decoded and one read buffer are held in memory, so
+    arbitrarily large dumps can be streamed. Elements larger than `read_size`
+    are handled by reading progressively larger blocks until they decode.
+
+    Args:
+        fp: A text file object positioned at the start of the array.
+        read_size: Number of characters read from `fp` at a time.
+
+    Yields:
+        The decoded elements of the array, in order.
+    """
+    decoder = json.JSONDecoder()
+    buffer = fp.read(read_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError("Expected a JSON array of charts.")
+
+    pos, eof = 1, False
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+
+        try:
+            element, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            element, end = None, None
+        # A value ending exactly at the buffer edge may continue in the next block
+        if end is None or (end == len(buffer) and not eof):
+            if eof:
+                raise ValueError(f"Truncated or malformed JSON array at position {pos}.")
+            block = fp.read(max(read_size, len(buffer) - pos))
+            eof = not block
+            buffer = buffer[pos:] + block
+            pos = 0
+            continue
+
+        yield element
+        pos = end
+
+class RaggedCharts:
+    """
+    A batch of FFR charts stored as one shared ragged array.
+
+    Row `j` of every chart in the batch lives in `ticks[j]` (its time in units
+    of `10 ** -decimals` seconds from the chart's first note) and `bitmasks[j]`
+    (bit `i` set when panel `FFR_PANELS[i]` is hit). The rows of chart `c` are
+    `offsets[c]:offsets[c + 1]`, sorted by tick.
+    """
+    def __init__(self, names: List, difficulties: List, offsets: np.ndarray,
+                 ticks: np.ndarray, bitmasks: np.ndarray, decimals: int = 3):
+        self.names = names
+        self.difficulties = difficulties
+        self.offsets = offsets
+        self.ticks = ticks
+        self.bitmasks = bitmasks
+        self.decimals = decimals
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def chart_arrays(self, index: int):
+        """
+        Returns the `(times, panels)` arrays of one chart, as `chart_to_arrays` does.
+        """
+        rows = slice(self.offsets[index], self.offsets[index + 1])
+        times = self.ticks[rows] / 10 ** self.decimals
+        panels = (self.bitmasks[rows, None] >> np.arange(len(FFR_PANELS), dtype=np.uint8)) & 1
+        return times, panels.astype(bool)
+
+    def chart(self, index: int) -> dict:
+        """
+        Returns one chart in the `{time: encoding}` format of `ChartPreprocessor`.
+        """
+        rows = slice(self.offsets[index], self.offsets[index + 1])
+        times = (self.ticks[rows] / 10 ** self.decimals).tolist()
+        return dict(zip(times, ENCODINGS[self.bitmasks[rows]].tolist()))
+
+    def __iter__(self) -> Iterator[dict]:
+        """
+        Yields every chart as a preprocessed chart dictionary. The FFR difficulty
+        doubles as the meter, so the charts can go straight to `iter_feature_rows`.
+        """
+        for index in range(len(self)):
+            yield {
+                'name': self.names[index],
+                'difficulty': self.difficulties[index],
+                'meter': self.difficulties[index],
+                'mode': FFR_MODE,
+                'chart': self.chart(index),
+            }
+
+def ragged_from_ffr(charts: List[dict], decimals: int = 3) -> RaggedCharts:
+    """
+    Converts a batch of FFR API charts into a `RaggedCharts`.
+
+    The arrow rows of every chart (`[direction, ..., time in ms]`) are
+    concatenated once and converted together: times are shifted to each
+    chart's first note and quantized, arrows are mapped to panel bits, and
+    arrows sharing a tick are merged into one row with a single reduction.
+
+    Args:
+        charts: FFR API chart dictionaries with `name`, `difficulty` and `chart` keys.
+        decimals: Number of decimals timestamps are rounded to.
+
+    Returns:
+        The batch as a `RaggedCharts`, in the order of `charts`.
+    """
+    names = [chart.get('name') for chart in charts]
+    difficulties = [chart.get('difficulty') for chart in charts]
+    arrows = [chart.get('chart') or [] for chart in charts]
+    lengths = np.array([len(rows) for rows in arrows], dtype=np.int64)
+
+    directions = np.array(list(chain.from_iterable(
+        (row[0] for row in rows) for rows in arrows)), dtype=str)
+    ms = np.array(list(chain.from_iterable(
+        (row[-1] for row in rows) for rows in arrows)), dtype=float)
+    chart_ids = np.repeat(np.arange(len(charts)), lengths)
+
+    # Panel bit of each arrow; unknown directions are dropped
+    bits = np.zeros(len(directions), dtype=np.uint8)
+    for i, panel in enumerate(FFR_PANELS):
+        bits[directions == panel] = 1 << i
+    known = bits > 0
+    ms, bits, chart_ids = ms[known], bits[known], chart_ids[known]
+
+    starts = np.full(len(charts), np.inf)
+    np.minimum.at(starts, chart_ids, ms)
+    ticks = np.rint((ms - starts[chart_ids]) / 1000. * 10 ** decimals).astype(np.int64)
+
+    order = np.lexsort((ticks, chart_ids))
+    ticks, bits, chart_ids = ticks[order], bits[order], chart_ids[order]
+
+    new_row = np.ones(len(ticks), dtype=bool)
+    new_row[1:] = (ticks[1:] != ticks[:-1]) | (chart_ids[1:] != chart_ids[:-1])
+    row_starts = np.flatnonzero(new_row)
+    bitmasks = np.bitwise_or.reduceat(bits, row_starts) if len(row_starts) else bits
+    row_counts = np.bincount(chart_ids[row_starts], minlength=len(charts))
+
+    offsets = np.concatenate(([0], np.cumsum(row_counts)))
+    return RaggedCharts(names, difficulties, offsets, ticks[row_starts], bitmasks, decimals)
+
+def iter_ffr_batches(path: str, batch_size: int = 512, decimals: int = 3) -> Iterator[RaggedCharts]:
+    """
+    Streams an FFR JSON dump (a list of API charts) as batches of ragged charts.
+
+    Args:
+        path: Path of the JSON dump.
+        batch_size: Number of charts converted together.
+        decimals: Number of decimals timestamps are rounded to.
+
+    Yields:
+        One `RaggedCharts` per batch of up to `batch_size` charts.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        charts = iter_json_array(f)
+        while True:
+            batch = list(islice(charts, batch_size))
+            if not batch:
+                return
+            yield ragged_from_ffr(batch, decimals=decimals)
+
+def iter_ffr_charts(path: str, batch_size: int = 512, decimals: int = 3) -> Iterator[dict]:
+    """
+    Streams the charts of an FFR JSON dump as preprocessed chart dictionaries.
+
+    Charts without any arrow are skipped. See `iter_ffr_batches` for the arguments.
+    """
+    for batch in iter_ffr_batches(path, batch_size=batch_size, decimals=decimals):
+        for chart_data in batch:
+            if chart_data['chart']:
+                yield chart_data
@@ -0,0 +1,134 @@
+import numpy as np
+from typing import NamedTuple, Optional, Union
+from simfile.notes import NoteData
+from simfile.types import Chart
+
+# Bytes a notes string may hold for `tokenize_notes` to handle it: '0', the
+# note types, measure and player separators, and whitespace around rows.
+_NOTE_TYPES = b'1234AFKLM'
+_ALLOWED = np.zeros(256, dtype=bool)
+_ALLOWED[np.frombuffer(b'0' + _NOTE_TYPES + b',&\n \t', dtype=np.uint8)] = True
+
+_COMMA, _NEWLINE, _ZERO = ord(','), ord('\n'), ord('0')
+
+class NoteArrays(NamedTuple):
+    """
+    The notes of a chart as parallel arrays, in note data order.
+
+    Note `i` is at beat `beat_numerators[i] / beat_denominators[i]` (not
+    necessarily in lowest terms), in column `columns[i]`, and its type is the
+    note data character `note_types[i]`, e.g. `ord('1')` for a tap.
+    """
+    beat_numerators: np.ndarray
+    beat_denominators: np.ndarray
+    columns: np.ndarray
+    note_types: np.ndarray
+
+    def select(self, mask: np.ndarray) -> 'NoteArrays':
+        """
+        Keeps the notes where `mask` is true.
+        """
+        return NoteArrays(*(values[mask] for values in self))
+
+def tokenize_notes(notes: str) -> Optional[NoteArrays]:
+    """
+    Tokenizes a chart's note data string into arrays, without `Note` objects.
+
+    Produces the notes `NoteData` would yield, in the same order: every
+    nonzero character of every row, with the beat, column and player layout
+    of `NoteData`. The whole string is handled with byte operations: measure,
+    line and row boundaries come from cumulative counts of separators.
+
+    Args:
+        notes: The note data of a chart.
+
+    Returns:
+        The notes as `NoteArrays`, or None if the note data holds anything
+        other than plain rows, such as keysound indices or unknown note types,
+        or if `NoteData` could not read it. Use `note_arrays` for those.
+    """
+    if not notes.isascii():
+        return None
+    data = notes.encode('ascii')
+    if b'\r' in data:
+        # str.splitlines treats "\r\n" and a lone "\r" as one line break
+        data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    if not _ALLOWED[np.frombuffer(data, dtype=np.uint8)].all():
+        return None
+    # NoteData takes the number of columns from the first row, and cannot
+    # count them for a blank first measure
+    first_comma = data.find(b',')
+    first_measure = (data[:first_comma] if first_comma > 0 else data).strip()
+    if not first_measure:
+        return None
+    columns = len(first_measure.split(b'\n', 1)[0].strip())
+
+    players = [_tokenize_player(player, columns) for player in data.split(b'&')]
+    if any(player is None for player in players):
+        return None
+    return NoteArrays(*(np.concatenate(values) for values in zip(*players)))
+
+def _tokenize_player(data: bytes, columns: int) -> Optional[NoteArrays]:
+    """
+    Tokenizes the note data of one player, see `tokenize_notes`.
+    """
+    chars = np.frombuffer(data, dtype=np.uint8)
+    comma = chars == _COMMA
+    newline = chars == _NEWLINE
+    content = np.flatnonzero(~comma & ~newline & (chars != ord(' ')) & (chars != ord('\t')))
+    if len(content) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return NoteArrays(empty, empty, empty, np.empty(0, dtype=np.uint8))
+
+    # Measures are split on commas and stripped; rows are the lines of a stripped
+    # measure, themselves stripped
+    measure = (np.cumsum(comma) - comma)[content]
+    newlines = np.cumsum(newline)[content]
+    row_key = measure + newlines
+    measure_start = np.flatnonzero(np.diff(measure, prepend=-1))
+    measure_end = np.append(measure_start[1:], len(content)) - 1
+    row_start = np.flatnonzero(np.diff(row_key, prepend=-1))
+    row_end = np.append(row_start[1:], len(content)) - 1
+    # NoteData reads whitespace inside a row as a note type and fails, as it
+    # does on rows wider than its first
+    if (content[row_end] - content[row_start] != row_end - row_start).any() \
+            or (row_end - row_start).max() >= columns:
+        return None
+
+    measure_of_row = np.repeat(np.arange(len(measure_start)), np.diff(np.append(measure_start, len(content))))
+    first_line = newlines[measure_start][measure_of_row]
+    subdivisions = (newlines[measure_end] - newlines[measure_start] + 1)[measure_of_row]
+    row_of_char = np.repeat(row_start, np.diff(np.append(row_start, len(content))))
+
+    notes = chars[content] != _ZERO
+    subdivisions = subdivisions[notes]
+    lines = (newlines - first_line)[notes]
+    return NoteArrays(
+        beat_numerators=4 * (measure[notes].astype(np.int64) * subdivisions + lines),
+        beat_denominators=subdivisions.astype(np.int64),
+        columns=(content - content[row_of_char])[notes].astype(np.int64),
+        note_types=chars[content][notes],
+    )
+
+def note_arrays(source: Union[str, Chart]) -> NoteArrays:
+    """
+    Reads note data into `NoteArrays`, with `NoteData` when `tokenize_notes` cannot.
+
+    Args:
+        source: A chart, or its note data string.
+
+    Raises:
+        The errors of `NoteData` for note data it cannot read.
+    """
+    notes = source if isinstance(source, str) else source.notes
+    tokens = tokenize_notes(notes) if notes is not None else None
+    if tokens is not None:
+        return tokens
+
+    parsed = list(NoteData(source))
+    return NoteArrays(
+        beat_numerators=np.array([note.beat.numerator for note in parsed], dtype=np.int64),
+        beat_denominators=np.array([note.beat.denominator for note in parsed], dtype=np.int64),
+        columns=np.array([note.column for note in parsed], dtype=np.int64),
+        note_types=np.frombuffer(''.join(note.note_type.value for note in parsed).encode('ascii'), dtype=np.uint8),
+    )
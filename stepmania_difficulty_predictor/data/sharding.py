@@ -0,0 +1,193 @@
+import os
+import json
+import heapq
+import hashlib
+import pandas as pd
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from stepmania_difficulty_predictor.data.dataset_pipeline import DatasetWriter
+from stepmania_difficulty_predictor.data.sm_data_loader import simfile_source_key
+
+MANIFEST_NAME = 'manifest.json'
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """
+    Parses a shard given as `i/K`, the i-th of K shards counting from 0.
+
+    Args:
+        spec: The shard, e.g. `'0/4'`.
+
+    Returns:
+        A tuple `(index, num_shards)`.
+
+    Raises:
+        ValueError: If `spec` is not of the form `i/K` with `0 <= i < K`.
+    """
+    index, sep, num_shards = spec.partition('/')
+    if not sep or not index.strip().isdigit() or not num_shards.strip().isdigit():
+        raise ValueError(f"Shard must be given as i/K, got '{spec}'.")
+    index, num_shards = int(index), int(num_shards)
+    if not 0 <= index < num_shards:
+        raise ValueError(f"Shard index must be in [0, {num_shards}), got {index}.")
+    return index, num_shards
+
+def shard_of(key: str, num_shards: int) -> int:
+    """
+    Assigns a key to one of `num_shards` shards by hashing it.
+
+    The hash does not depend on the Python process, platform or the order
+    keys are seen in, so every node computes the same assignment.
+    """
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % num_shards
+
+def relative_source_key(source, root: str) -> str:
+    """
+    Names a simfile source relative to the input it was found in.
+
+    Keys use `/` separators and, for zip packs, the `zip_path:member` form of
+    `simfile_source_key`, so nodes that mount the corpus at different paths
+    agree on them.
+
+    Args:
+        source: A source from `iter_simfile_sources`.
+        root: The directory or zip pack passed to `iter_simfile_sources`.
+    """
+    base = os.path.dirname(os.path.abspath(root)) if os.path.isfile(root) else root
+    if isinstance(source, str):
+        source = os.path.relpath(source, base)
+    else:
+        source = (os.path.relpath(source[0], base), source[1])
+    return simfile_source_key(source).replace(os.sep, '/')
+
+def select_shard(sources: Iterable, root: str, shard: Optional[Tuple[int, int]] = None) -> List:
+    """
+    Sorts simfile sources by their relative key and keeps those of one shard.
+
+    Args:
+        sources: Sources from `iter_simfile_sources(root)`.
+        root: The directory or zip pack the sources were found in.
+        shard: A tuple `(index, num_shards)`, or None to keep every source.
+
+    Returns:
+        A list of `(key, source)` tuples sorted by key.
+    """
+    keyed = sorted((relative_source_key(source, root), source) for source in sources)
+    if shard is None:
+        return keyed
+    index, num_shards = shard
+    return [(key, source) for key, source in keyed if shard_of(key, num_shards) == index]
+
+def chart_id(key: str, index: int) -> str:
+    """
+    A stable id for the `index`-th chart of the simfile source named `key`.
+
+    The id only depends on where the chart is found in the corpus, so it is
+    the same whichever shard, node or run produces the chart.
+    """
+    return hashlib.blake2b(f"{key}#{index}".encode('utf-8'), digest_size=8).hexdigest()
+
+def write_manifest(path: str, shard: Optional[Tuple[int, int]], **info):
+    """
+    Writes a shard manifest: the shard an output holds plus any extra `info`.
+    """
+    manifest = {'shard': list(shard) if shard else None, **info}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4)
+
+def read_manifest(path: str) -> Optional[dict]:
+    """
+    Reads a shard manifest, or returns None if there is none at `path`.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def dataset_manifest_path(dataset_path: str) -> str:
+    """
+    The path of the shard manifest written next to a feature dataset.
+    """
+    return f"{os.path.splitext(dataset_path)[0]}.{MANIFEST_NAME}"
+
+def _iter_dataset_rows(dataset_path: str, chunk_size: int) -> Iterator[dict]:
+    """
+    Streams the rows of a feature dataset, leaving out the columns they have no value for.
+    """
+    chunks = pd.read_csv(dataset_path, chunksize=chunk_size, dtype={'id': str, 'group': str},
+                         float_precision='round_trip', encoding='utf-8')
+    for chunk in chunks:
+        if 'id' not in chunk.columns:
+            raise ValueError(f"{dataset_path} has no 'id' column; rebuild it with build_features.py.")
+        for row in chunk.to_dict('records'):
+            yield {column: value for column, value in row.items() if not pd.isna(value)}
+
+def check_shards(dataset_paths: List[str]) -> Optional[int]:
+    """
+    Checks that sharded feature datasets hold every shard of one split exactly once.
+
+    Args:
+        dataset_paths: The datasets, each with the manifest `build_features.py`
+                       writes next to it.
+
+    Returns:
+        The number of shards, or None if none of the datasets is sharded.
+
+    Raises:
+        ValueError: If shards are missing, repeated, or from different splits.
+    """
+    shards = []
+    for path in dataset_paths:
+        manifest = read_manifest(dataset_manifest_path(path)) or {}
+        shards.append(tuple(manifest['shard']) if manifest.get('shard') else None)
+
+    if all(shard is None for shard in shards):
+        return None
+    if any(shard is None for shard in shards):
+        raise ValueError("Cannot merge sharded and unsharded datasets.")
+    num_shards = {shard[1] for shard in shards}
+    if len(num_shards) > 1:
+        raise ValueError(f"Datasets come from different splits: {sorted(num_shards)} shards.")
+    num_shards = num_shards.pop()
+    indices = sorted(shard[0] for shard in shards)
+    if indices != list(range(num_shards)):
+        missing = sorted(set(range(num_shards)) - set(indices))
+        repeated = sorted({i for i in indices if indices.count(i) > 1})
+        raise ValueError(f"Incomplete split of {num_shards} shards: missing {missing}, repeated {repeated}.")
+    return num_shards
+
+def merge_datasets(dataset_paths: List[str], output_path: str, keep_duplicates: bool = False,
+                   chunk_size: int = 1000) -> Tuple[int, int]:
+    """
+    Merges the feature datasets of several shards into one dataset.
+
+    Rows are merged in chart id order, streaming `chunk_size` rows of each
+    dataset at a time, so the result does not depend on how the corpus was
+    split. Duplicate groups are labeled by content, so exact duplicates found
+    in different shards share a group; unless `keep_duplicates` is set, only
+    the first row of each group is kept. Near duplicates are only detected
+    within a shard.
+
+    Args:
+        dataset_paths: The shard datasets written by `build_features.py`.
+        output_path: Path of the merged CSV. Any existing file is replaced.
+        keep_duplicates: Keep rows of groups already merged from another shard.
+        chunk_size: Number of rows read and buffered at a time.
+
+    Returns:
+        A tuple `(rows_written, duplicates_skipped)`.
+    """
+    rows = heapq.merge(*(_iter_dataset_rows(path, chunk_size) for path in dataset_paths),
+                       key=lambda row: row['id'])
+    seen = set()
+    skipped = 0
+    with DatasetWriter(output_path, chunk_size=chunk_size) as writer:
+        for row in rows:
+            if 'group' in row and not keep_duplicates:
+                group = (row.get('mode'), row['group'])
+                if group in seen:
+                    skipped += 1
+                    continue
+                seen.add(group)
+            writer.write(row)
+    return writer.rows_written, skipped
@@ -0,0 +1,146 @@
+import numpy as np
+from multiprocessing import shared_memory
+from typing import NamedTuple, Optional
+
+class SharedMatrixSpec(NamedTuple):
+    """
+    Everything a worker needs to attach to a shared feature matrix.
+
+    `path` is set for file-backed matrices and None for shared-memory ones,
+    which are found by `name`.
+    """
+    name: Optional[str]
+    shape: tuple
+    dtype: str
+    path: Optional[str] = None
+
+def _attach_values(spec: SharedMatrixSpec) -> np.ndarray:
+    """
+    Unpickles a shared matrix by attaching to it instead of copying its data.
+    """
+    return SharedFeatureMatrix.attach(spec).values
+
+class _SharedArray(np.ndarray):
+    """
+    A read-only view of a whole shared matrix that pickles as its spec.
+
+    Slices and other derived arrays drop the spec and pickle their data
+    normally, since they do not cover the shared buffer as a whole.
+    """
+    def __array_finalize__(self, obj):
+        self._spec = None
+        self._owner = None
+
+    def __reduce__(self):
+        if self._spec is None:
+            return np.asarray(self).__reduce__()
+        return _attach_values, (self._spec,)
+
+class SharedFeatureMatrix:
+    """
+    A feature matrix stored once and shared read-only between processes.
+
+    The matrix lives either in a `multiprocessing.shared_memory` block or in
+    an `np.memmap`-backed file. Its `values` pickle as a small
+    `SharedMatrixSpec`, so passing them to `multiprocessing` or joblib workers
+    (e.g. through `GridSearchCV(n_jobs=-1)`) makes every worker attach to the
+    same pages instead of receiving its own copy.
+
+    The creating process owns the matrix and must release it with `unlink`,
+    or by using the matrix as a context manager, once the workers are done.
+    """
+    def __init__(self, values: np.ndarray, spec: SharedMatrixSpec,
+                 shm: Optional[shared_memory.SharedMemory] = None, owner: bool = False):
+        """
+        Initializes the SharedFeatureMatrix. Use `create` or `attach` instead.
+        """
+        self._shm = shm
+        self.spec = spec
+        self.owner = owner
+
+        values = values.view(_SharedArray)
+        values.flags.writeable = False
+        values._spec = spec
+        values._owner = self
+        self.values = values
+
+    @classmethod
+    def create(cls, data, path: Optional[str] = None, dtype=np.float32) -> 'SharedFeatureMatrix':
+        """
+        Copies a feature matrix into shared storage.
+
+        Args:
+            data: A 2D array or DataFrame of numeric features.
+            path: A file to back the matrix with. Defaults to an anonymous
+                  shared-memory block.
+            dtype: The stored dtype. float32 is what forest models use
+                   internally, so it halves memory without changing results.
+
+        Returns:
+            The owning SharedFeatureMatrix.
+        """
+        data = np.asarray(data, dtype=dtype)
+        if path is not None:
+            spec = SharedMatrixSpec(None, data.shape, data.dtype.str, path)
+            values = np.memmap(path, dtype=data.dtype, mode='w+', shape=data.shape)
+            values[:] = data
+            values.flush()
+            del values
+            return cls(np.memmap(path, dtype=data.dtype, mode='r', shape=data.shape), spec, owner=True)
+
+        shm = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+        values = np.ndarray(data.shape, dtype=data.dtype, buffer=shm.buf)
+        values[:] = data
+        return cls(values, SharedMatrixSpec(shm.name, data.shape, data.dtype.str), shm=shm, owner=True)
+
+    @classmethod
+    def attach(cls, spec: SharedMatrixSpec) -> 'SharedFeatureMatrix':
+        """
+        Attaches read-only to a matrix created by another process.
+
+        Args:
+            spec: The `spec` of the matrix.
+
+        Returns:
+            A non-owning SharedFeatureMatrix.
+        """
+        dtype = np.dtype(spec.dtype)
+        if spec.path is not None:
+            return cls(np.memmap(spec.path, dtype=dtype, mode='r', shape=spec.shape), spec)
+
+        try:
+            # Only the creator may unlink the block (Python 3.13+)
+            shm = shared_memory.SharedMemory(name=spec.name, track=False)
+        except TypeError:
+            # Worker processes share their parent's resource tracker, which
+            # already tracks the block
+            shm = shared_memory.SharedMemory(name=spec.name)
+        return cls(np.ndarray(spec.shape, dtype=dtype, buffer=shm.buf), spec, shm=shm)
+
+    def close(self):
+        """
+        Detaches this process from the shared block, if there is one.
+        """
+        if self._shm is not None:
+            self.values = None
+            try:
+                self._shm.close()
+            except BufferError:
+                # Views of the block are still alive; it is released with them
+                pass
+
+    def unlink(self):
+        """
+        Releases the shared storage. Only the owning process should call this.
+
+        A shared-memory block is removed; a backing file is left in place.
+        """
+        self.close()
+        if self.owner and self._shm is not None:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.unlink()
@@ -1,11 +1,21 @@
 import os
+import glob
+import posixpath
 import simfile
-from typing import List
+import zipfile
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from simfile.sm import SMSimfile
+from simfile.ssc import SSCSimfile
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 import sys
 
-def load_sm_files_from_directory(directory: str) -> List[simfile.Simfile]:
+_worker_archive = None
+
+def find_simfile_paths(directory: str) -> List[str]:
     """
-    Recursively finds and parses StepMania simfiles in a directory.
+    Recursively finds StepMania simfiles in a directory without parsing them.
 
     Preference order:
     - If a song folder contains an `.ssc`, use that file.
@@ -15,11 +25,11 @@ def load_sm_files_from_directory(directory: str) -> List[simfile.Simfile]:
         directory: The path to the directory to search.
 
     Returns:
-        A list of parsed simfile objects.
+        A sorted list of simfile paths, at most one per song folder.
     """
     stepfiles_by_dir = {}
     for root, _, files in os.walk(directory):
-        for file in files:
+        for file in sorted(files):
             lower = file.lower()
             filepath = os.path.join(root, file)
             if lower.endswith('.sm'):
@@ -27,10 +37,263 @@ def load_sm_files_from_directory(directory: str) -> List[simfile.Simfile]:
             elif lower.endswith('.ssc'):
                 stepfiles_by_dir[root] = filepath
 
-    sm_files = []
-    for filepath in sorted(stepfiles_by_dir.values()):
+    return sorted(stepfiles_by_dir.values())
+
+def expand_simfile_paths(inputs: Iterable[str]) -> List[str]:
+    """
+    Expands simfile paths, directories and glob patterns into simfile paths.
+
+    Directories, including those matched by a pattern, are searched with
+    `find_simfile_paths`. Patterns support `**`. Inputs that match nothing
+    are reported on stderr and skipped.
+
+    Args:
+        inputs: Simfile paths, directories or glob patterns.
+
+    Returns:
+        The simfile paths, in input order and without repeats.
+    """
+    paths = {}
+    for item in inputs:
+        matches = sorted(glob.glob(item, recursive=True)) if glob.has_magic(item) else [item]
+        found = False
+        for match in matches:
+            if os.path.isdir(match):
+                found_paths = find_simfile_paths(match)
+            elif os.path.isfile(match) and (match == item or match.lower().endswith(('.sm', '.ssc'))):
+                found_paths = [match]
+            else:
+                continue
+            found = found or bool(found_paths)
+            paths.update(dict.fromkeys(found_paths))
+        if not found:
+            print(f"No simfiles found at {item}", file=sys.stderr)
+    return list(paths)
+
+def iter_sm_files_from_directory(directory: str) -> Iterator[simfile.Simfile]:
+    """
+    Lazily parses the simfiles found by `find_simfile_paths`.
+
+    Only one parsed simfile is alive at a time, so memory stays bounded
+    no matter how large the directory is.
+
+    Args:
+        directory: The path to the directory to search.
+
+    Yields:
+        Parsed simfile objects, in sorted path order.
+    """
+    for filepath in find_simfile_paths(directory):
         try:
-            sm_files.append(simfile.open(filepath, strict=False))
+            sm_file = simfile.open(filepath, strict=False)
         except Exception as e:
             print(f"Error parsing {filepath}: {e}", file=sys.stderr)
-    return sm_files
+            continue
+        yield sm_file
+        # Release the simfile before parsing the next one
+        del sm_file
+
+def load_sm_files_from_directory(directory: str) -> List[simfile.Simfile]:
+    """
+    Recursively finds and parses StepMania simfiles in a directory, including
+    those inside zip packs.
+
+    Preference order:
+    - If a song folder contains an `.ssc`, use that file.
+    - Otherwise, fall back to `.sm`.
+
+    Prefer `iter_sm_files` for large corpora, since this keeps every parsed
+    simfile in memory.
+
+    Args:
+        directory: The path to the directory to search.
+
+    Returns:
+        A list of parsed simfile objects, in the order of `iter_sm_files`.
+    """
+    return list(iter_sm_files(directory))
+
+def find_simfile_members(zip_path: str) -> List[str]:
+    """
+    Finds the StepMania simfiles in a zip pack without extracting or parsing them.
+
+    Uses the same preference order as `find_simfile_paths`, per song folder
+    inside the archive.
+
+    Args:
+        zip_path: The path to the zip pack.
+
+    Returns:
+        A sorted list of member names, at most one per song folder.
+    """
+    stepfiles_by_dir = {}
+    with zipfile.ZipFile(zip_path) as archive:
+        for name in archive.namelist():
+            lower = name.lower()
+            folder = posixpath.dirname(name)
+            if lower.endswith('.sm'):
+                stepfiles_by_dir.setdefault(folder, name)
+            elif lower.endswith('.ssc'):
+                stepfiles_by_dir[folder] = name
+
+    return sorted(stepfiles_by_dir.values())
+
+def _parse_member(archive: zipfile.ZipFile, name: str) -> simfile.Simfile:
+    """
+    Reads one simfile member into memory and parses it, detecting its encoding
+    the way `simfile.open` does.
+    """
+    data = archive.read(name)
+    simfile_type = SSCSimfile if name.lower().endswith('.ssc') else SMSimfile
+    error = None
+    for encoding in simfile.ENCODINGS:
+        try:
+            text = data.decode(encoding)
+        except UnicodeDecodeError as e:
+            error = e
+            continue
+        return simfile_type(string=text, strict=False)
+    raise error or UnicodeError
+
+def _init_zip_worker(zip_path: str):
+    """
+    Opens the zip pack once per worker process.
+    """
+    global _worker_archive
+    _worker_archive = zipfile.ZipFile(zip_path)
+
+def _parse_worker_member(name: str) -> Optional[simfile.Simfile]:
+    """
+    Parses one member in a worker process, reporting errors instead of raising.
+    """
+    try:
+        return _parse_member(_worker_archive, name)
+    except Exception as e:
+        print(f"Error parsing {_worker_archive.filename}:{name}: {e}", file=sys.stderr)
+        return None
+
+def iter_sm_files_from_zip(zip_path: str, workers: int = 1) -> Iterator[simfile.Simfile]:
+    """
+    Lazily parses the simfiles of a zip pack found by `find_simfile_members`.
+
+    Members are decompressed into memory one at a time, so audio and other
+    assets in the pack are never read. With several workers, members are
+    parsed in parallel processes, with at most a few per worker in flight.
+
+    Args:
+        zip_path: The path to the zip pack.
+        workers: Number of worker processes; 1 parses in this process.
+
+    Yields:
+        Parsed simfile objects, in sorted member order.
+    """
+    try:
+        names = find_simfile_members(zip_path)
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"Error reading {zip_path}: {e}", file=sys.stderr)
+        return
+
+    if workers <= 1:
+        with zipfile.ZipFile(zip_path) as archive:
+            for name in names:
+                try:
+                    sm_file = _parse_member(archive, name)
+                except Exception as e:
+                    print(f"Error parsing {zip_path}:{name}: {e}", file=sys.stderr)
+                    continue
+                yield sm_file
+                del sm_file
+        return
+
+    with ProcessPoolExecutor(workers, initializer=_init_zip_worker, initargs=(zip_path,)) as executor:
+        names = iter(names)
+        pending = deque(executor.submit(_parse_worker_member, name)
+                        for name in islice(names, 4 * workers))
+        while pending:
+            sm_file = pending.popleft().result()
+            name = next(names, None)
+            if name is not None:
+                pending.append(executor.submit(_parse_worker_member, name))
+            if sm_file is not None:
+                yield sm_file
+            del sm_file
+
+def find_zip_packs(directory: str) -> List[str]:
+    """
+    Recursively finds zip packs in a directory.
+
+    Args:
+        directory: The path to the directory to search.
+
+    Returns:
+        A sorted list of `.zip` paths.
+    """
+    return sorted(os.path.join(root, file)
+                  for root, _, files in os.walk(directory)
+                  for file in files if file.lower().endswith('.zip'))
+
+def iter_sm_files(path: str, workers: int = 1) -> Iterator[simfile.Simfile]:
+    """
+    Lazily parses the simfiles of a song directory or zip pack.
+
+    A directory yields its extracted simfiles, as `iter_sm_files_from_directory`
+    does, followed by the simfiles of every zip pack inside it.
+
+    Args:
+        path: A directory or a `.zip` pack.
+        workers: Number of worker processes used for zip packs.
+
+    Yields:
+        Parsed simfile objects.
+    """
+    if os.path.isfile(path):
+        yield from iter_sm_files_from_zip(path, workers)
+        return
+
+    yield from iter_sm_files_from_directory(path)
+    for zip_path in find_zip_packs(path):
+        yield from iter_sm_files_from_zip(zip_path, workers)
+
+def iter_simfile_sources(path: str) -> Iterator[Union[str, Tuple[str, str]]]:
+    """
+    Lists the simfiles `iter_sm_files` would parse, without parsing them.
+
+    A source is either the path of a simfile or a `(zip_path, member)` tuple
+    for a simfile inside a zip pack; see `open_simfile_source`.
+
+    Args:
+        path: A directory or a `.zip` pack.
+
+    Yields:
+        The simfile sources, in the order `iter_sm_files` parses them.
+    """
+    if os.path.isfile(path):
+        zip_paths = [path]
+    else:
+        yield from find_simfile_paths(path)
+        zip_paths = find_zip_packs(path)
+
+    for zip_path in zip_paths:
+        try:
+            names = find_simfile_members(zip_path)
+        except (OSError, zipfile.BadZipFile) as e:
+            print(f"Error reading {zip_path}: {e}", file=sys.stderr)
+            continue
+        for name in names:
+            yield zip_path, name
+
+def open_simfile_source(source: Union[str, Tuple[str, str]]) -> simfile.Simfile:
+    """
+    Parses a simfile source from `iter_simfile_sources`.
+    """
+    if isinstance(source, str):
+        return simfile.open(source, strict=False)
+    zip_path, name = source
+    with zipfile.ZipFile(zip_path) as archive:
+        return _parse_member(archive, name)
+
+def simfile_source_key(source: Union[str, Tuple[str, str]]) -> str:
+    """
+    Names a simfile source, as `path` or `zip_path:member`.
+    """
+    return source if isinstance(source, str) else f"{source[0]}:{source[1]}"
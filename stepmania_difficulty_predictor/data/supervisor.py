@@ -0,0 +1,281 @@
+import os
+import json
+import time
+import multiprocessing
+from datetime import datetime, timezone
+from multiprocessing.connection import wait
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+# Outcomes of a file that produced no result
+TIMEOUT = 'timeout'
+MEMORY = 'memory'
+CRASH = 'crash'
+QUARANTINED = 'quarantined'
+
+class FileBudget(NamedTuple):
+    """
+    Per-file limits for supervised ingestion (see `FileSupervisor`).
+
+    timeout: Maximum wall-clock seconds per file.
+    max_rss_mb: Maximum resident memory of a worker process, in MiB.
+    quarantine_path: JSON file recording offending files, which later runs skip.
+    workers: Number of worker processes.
+    """
+    timeout: Optional[float] = None
+    max_rss_mb: Optional[float] = None
+    quarantine_path: Optional[str] = None
+    workers: int = 1
+
+def _rss_mb(pid: int) -> Optional[float]:
+    """
+    Resident memory of a process in MiB, or None where /proc is unavailable.
+    """
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1 << 20)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _file_stamp(key: str) -> Optional[list]:
+    """
+    Size and modification time of the file a source key refers to.
+    """
+    path = key
+    while path and not os.path.exists(path):
+        path = path.rpartition(':')[0]
+    if not path:
+        return None
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+class Quarantine:
+    """
+    A persistent record of the files that exceeded their budget.
+
+    Entries are keyed by source and remember the size and modification time
+    of the file (or of the zip pack holding it), so a file that is replaced
+    is tried again.
+    """
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initializes the Quarantine, loading the report at `path` if it exists.
+
+        Args:
+            path: The JSON report. Without one, entries are only kept in memory.
+        """
+        self.path = path
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self.entries.get(key)
+        return entry is not None and entry.get('stamp') == _file_stamp(key)
+
+    def add(self, key: str, reason: str, seconds: float, rss_mb: Optional[float]):
+        """
+        Records an offending file and saves the report.
+
+        Args:
+            key: The file's source key.
+            reason: `'timeout'`, `'memory'` or `'crash'`.
+            seconds: Wall-clock time spent on the file.
+            rss_mb: The worker's last measured resident memory.
+        """
+        self.entries[key] = {
+            'reason': reason,
+            'seconds': round(seconds, 3),
+            'rss_mb': None if rss_mb is None else round(rss_mb, 1),
+            'stamp': _file_stamp(key),
+            'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        if self.path:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=4, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+def _worker_main(conn, func):
+    """
+    Runs tasks sent by the supervisor until it sends None.
+    """
+    while True:
+        task = conn.recv()
+        if task is None:
+            return
+        index, source = task
+        try:
+            conn.send((index, func(source), None))
+        except Exception as e:
+            conn.send((index, None, f"{type(e).__name__}: {e}"))
+
+class _Worker:
+    """
+    A supervised worker process and the task it is running.
+    """
+    def __init__(self, context, func):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, func), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task = None
+        self.started = None
+        self.rss_mb = None
+
+    def stop(self, kill: bool = False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class FileSupervisor:
+    """
+    Runs a function over files in supervised worker processes with per-file budgets.
+
+    Each worker handles one file at a time. While it runs, the supervisor
+    polls the file's elapsed time and the worker's resident memory; a worker
+    exceeding `timeout` or `max_rss_mb`, or dying, is killed and replaced, and
+    its file is recorded in the quarantine. Files already in the quarantine
+    are skipped without running. Exceptions raised by the function are
+    reported as errors but do not quarantine the file.
+
+    Workers whose memory stays above half of `max_rss_mb` after a file are
+    replaced, so that memory held over from a large file is not charged to
+    the next one.
+
+    The worker processes are started on the first `map` and kept for later
+    ones, until `close` is called. `map` calls must not overlap.
+    """
+    def __init__(self, func: Callable, budget: FileBudget = FileBudget(),
+                 key: Callable[[object], str] = str, poll_interval: float = 0.05):
+        """
+        Initializes the FileSupervisor.
+
+        Args:
+            func: A picklable function of one source, run in the workers.
+            budget: The per-file limits, quarantine report and number of workers.
+            key: Maps a source to the string it is quarantined under.
+            poll_interval: Seconds between budget checks.
+        """
+        self.func = func
+        self.budget = budget
+        self.key = key
+        self.poll_interval = poll_interval
+        self.quarantine = Quarantine(budget.quarantine_path)
+        self.workers = []
+
+    def close(self):
+        """
+        Stops the worker processes.
+        """
+        for worker in self.workers:
+            worker.stop(kill=worker.task is not None)
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def map(self, sources: Iterable) -> Iterator[Tuple[object, object, Optional[str]]]:
+        """
+        Runs the function on every source, in order.
+
+        Sources are only taken while fewer than `2 * workers` results are
+        waiting for a slower file before them, so memory stays bounded
+        however long the input is.
+
+        Args:
+            sources: The sources, e.g. file paths.
+
+        Yields:
+            A tuple `(source, result, error)` per source, in input order.
+            `error` is None on success, `'quarantined'` for skipped files,
+            `'timeout'`, `'memory'` or `'crash'` for killed ones, or the
+            message of an exception raised by the function.
+        """
+        context = multiprocessing.get_context()
+        workers = self.workers
+        workers += [_Worker(context, self.func) for _ in range(max(self.budget.workers, 1) - len(workers))]
+        max_done = 2 * len(workers)
+        sources = iter(enumerate(sources))
+        done = {}
+        next_index = 0
+        exhausted = False
+        try:
+            while True:
+                for worker in workers:
+                    while worker.task is None and not exhausted and len(done) < max_done:
+                        task = next(sources, None)
+                        if task is None:
+                            exhausted = True
+                        elif self.key(task[1]) in self.quarantine:
+                            done[task[0]] = (task[1], None, QUARANTINED)
+                        else:
+                            worker.task, worker.started, worker.rss_mb = task, time.perf_counter(), None
+                            worker.conn.send(task)
+
+                busy = [worker for worker in workers if worker.task is not None]
+                while next_index in done:
+                    yield done.pop(next_index)
+                    next_index += 1
+                if not busy:
+                    if exhausted:
+                        return
+                    continue
+
+                ready = wait([worker.conn for worker in busy], timeout=self.poll_interval)
+                for i, worker in enumerate(workers):
+                    if worker.task is None:
+                        continue
+                    index, source = worker.task
+                    if worker.conn in ready:
+                        try:
+                            _, result, error = worker.conn.recv()
+                        except (EOFError, OSError):
+                            workers[i] = self._replace(worker, CRASH)
+                            done[index] = (source, None, CRASH)
+                            continue
+                        done[index] = (source, result, error)
+                        worker.task = None
+                        rss_mb = _rss_mb(worker.process.pid)
+                        if self.budget.max_rss_mb and rss_mb and rss_mb > self.budget.max_rss_mb / 2:
+                            workers[i] = self._replace(worker)
+                        continue
+
+                    worker.rss_mb = _rss_mb(worker.process.pid) or worker.rss_mb
+                    elapsed = time.perf_counter() - worker.started
+                    if self.budget.timeout is not None and elapsed > self.budget.timeout:
+                        reason = TIMEOUT
+                    elif self.budget.max_rss_mb and worker.rss_mb and worker.rss_mb > self.budget.max_rss_mb:
+                        reason = MEMORY
+                    elif not worker.process.is_alive():
+                        reason = CRASH
+                    else:
+                        continue
+                    workers[i] = self._replace(worker, reason)
+                    done[index] = (source, None, reason)
+        finally:
+            # Workers still running a file of an abandoned run are stopped; the
+            # next run starts new ones in their place
+            for worker in workers:
+                if worker.task is not None:
+                    worker.stop(kill=True)
+            workers[:] = [worker for worker in workers if worker.task is None]
+
+    def _replace(self, worker: _Worker, reason: Optional[str] = None) -> _Worker:
+        """
+        Stops a worker, quarantining its file when it offended, and starts a new one.
+        """
+        if reason is not None:
+            index, source = worker.task
+            self.quarantine.add(self.key(source), reason, time.perf_counter() - worker.started, worker.rss_mb)
+        worker.stop(kill=reason is not None)
+        return _Worker(multiprocessing.get_context(), self.func)
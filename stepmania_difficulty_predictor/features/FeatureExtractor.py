@@ -0,0 +1,123 @@
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+
+from stepmania_difficulty_predictor.features.columnar import chart_to_arrays, charts_to_ragged
+from stepmania_difficulty_predictor.features.HorizontalDensity import HorizontalDensity
+from stepmania_difficulty_predictor.features.VerticalDensity import VerticalDensity
+from stepmania_difficulty_predictor.features.StreamDetector import StreamDetector
+from stepmania_difficulty_predictor.features.PatternDetector import PatternDetector
+from stepmania_difficulty_predictor.features.PatternHistogram import PatternHistogram
+from stepmania_difficulty_predictor.features.WindowedFeatures import WindowedFeatureExtractor
+
+class FeatureExtractor:
+    """
+    Combines the mode-agnostic feature extractors into a single feature vector.
+
+    This is the feature set shared by the training pipeline and the predictor,
+    so both sides always agree on which features a chart produces.
+
+    `compute_batch` computes the features of many charts at once: charts with
+    the same number of panels are laid end to end in ragged arrays and every
+    feature comes out of a few segment reductions over all of them (see
+    `compute_ragged`), instead of a round of NumPy calls per chart.
+    """
+    def __init__(self, alpha=3, stream_threshold=0.25, jack_threshold=0.1, backend: Optional[str] = None,
+                 pattern_buckets: int = 0):
+        """
+        Initializes the FeatureExtractor.
+
+        Args:
+            alpha: The weighting exponent used by the density extractors.
+            stream_threshold: The maximum time between notes to be considered a stream.
+            jack_threshold: The maximum time between notes to be considered a jack.
+            backend: The kernel backend of the stream and pattern detectors,
+                     `'numba'` or `'numpy'`. Defaults to Numba when it is installed.
+            pattern_buckets: Number of hashed pattern n-gram features (see
+                             `PatternHistogram`); 0 leaves them out.
+        """
+        self.horizontal_density = HorizontalDensity(alpha=alpha)
+        self.vertical_density = VerticalDensity(alpha=alpha)
+        self.stream_detector = StreamDetector(stream_threshold=stream_threshold, backend=backend)
+        self.pattern_detector = PatternDetector(jack_threshold=jack_threshold, backend=backend)
+        self.pattern_histogram = PatternHistogram(num_buckets=pattern_buckets) if pattern_buckets else None
+        self.ranges = WindowedFeatureExtractor(alpha=alpha, stream_threshold=stream_threshold,
+                                               jack_threshold=jack_threshold)
+
+    def compute(self, chart: dict) -> dict:
+        """
+        Computes every feature for a given chart.
+
+        Args:
+            chart: A dictionary representing the chart, with timestamps as keys
+                   and binary step encodings as values.
+
+        Returns:
+            A dictionary containing the combined features.
+        """
+        h_density = self.horizontal_density.compute(chart)
+        v_density = self.vertical_density.compute(chart)
+        times, panels = chart_to_arrays(chart)
+        stream = self.stream_detector.compute_arrays(times)
+        pattern = self.pattern_detector.compute_arrays(times, panels)
+        histogram = self.pattern_histogram.compute_arrays(panels) if self.pattern_histogram else {}
+
+        return {**h_density, **v_density, **stream, **pattern, **histogram}
+
+    def compute_batch(self, charts: Sequence[dict]) -> List[dict]:
+        """
+        Computes every feature for many charts at once.
+
+        Charts whose rows are not in time order in the dictionary, or that
+        have rows without any active panel, are computed with `compute`,
+        since the scalar extractors treat those specially.
+
+        Args:
+            charts: Chart dictionaries, with timestamps as keys and binary
+                    step encodings as values. They may have different numbers
+                    of panels.
+
+        Returns:
+            The features of each chart, as from `compute`, in input order.
+            Empty charts get an empty dictionary.
+        """
+        results: List[dict] = [{} for _ in charts]
+        by_width: Dict[int, List[int]] = {}
+        for i, chart in enumerate(charts):
+            if chart:
+                by_width.setdefault(len(next(iter(chart.values()))), []).append(i)
+
+        for indices in by_width.values():
+            times, panels, offsets, in_order = charts_to_ragged([charts[i] for i in indices])
+            features = {name: values.tolist() for name, values in self.compute_ragged(times, panels, offsets).items()}
+            has_empty_rows = ~np.logical_and.reduceat(panels.any(axis=1), offsets[:-1]) \
+                if panels.shape[1] else np.ones(len(indices), dtype=bool)
+
+            for row, i in enumerate(indices):
+                if in_order[row] and not has_empty_rows[row]:
+                    results[i] = {name: values[row] for name, values in features.items()}
+                else:
+                    results[i] = self.compute(charts[i])
+        return results
+
+    def compute_ragged(self, times: np.ndarray, panels: np.ndarray, offsets: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Computes every feature for non-empty charts laid end to end, as from `charts_to_ragged`.
+
+        Args:
+            times: Timestamps of the rows, sorted within each chart.
+            panels: Boolean array of shape `(len(times), num_panels)`.
+            offsets: Chart `c` owns rows `offsets[c]:offsets[c + 1]`.
+
+        Returns:
+            A dictionary of per-chart feature arrays in `compute` order.
+        """
+        lo, hi = offsets[:-1], offsets[1:]
+        ranges = self.ranges.compute_ranges(times, panels, lo, hi)
+        features = {'nps': ranges.pop('nps')}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            features['length'] = np.log(times[hi - 1])
+        features.update(ranges)
+        if self.pattern_histogram:
+            histograms = self.pattern_histogram.compute_ragged(panels, offsets)
+            features.update({f'pattern_{i}': histograms[:, i] for i in range(histograms.shape[1])})
+        return features
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+from typing import Sequence
+
+from stepmania_difficulty_predictor.features.columnar import chart_to_arrays
+from stepmania_difficulty_predictor.features.PatternHistogram import PatternHistogram
+from stepmania_difficulty_predictor.features.WindowedFeatures import WindowedFeatureExtractor
+
+class MultiRateFeatureExtractor:
+    """
+    Computes the features of `FeatureExtractor` for a chart played at several music rates.
+
+    Playing at rate `r` divides every timestamp by `r`. The chart is converted
+    to arrays once, its timestamps are scaled for every rate in a single
+    broadcast, and the scaled copies are laid end to end so that the features
+    of all rates come out of one batched pass over their row ranges.
+
+    Each rate matches running `FeatureExtractor` on the chart with its
+    timestamps divided by the rate and rounded to `decimals`. Pattern
+    histogram features do not depend on timing and are shared by all rates.
+    """
+    def __init__(self, alpha=3, stream_threshold=0.25, jack_threshold=0.1, decimals=3,
+                 pattern_buckets: int = 0):
+        """
+        Initializes the MultiRateFeatureExtractor.
+
+        Args:
+            alpha: The weighting exponent used by the density features.
+            stream_threshold: The maximum time between notes to be considered a stream.
+            jack_threshold: The maximum time between notes to be considered a jack.
+            decimals: Number of decimals the scaled timestamps are rounded to.
+            pattern_buckets: Number of hashed pattern n-gram features; 0 leaves them out.
+        """
+        self.ranges = WindowedFeatureExtractor(alpha=alpha, stream_threshold=stream_threshold,
+                                               jack_threshold=jack_threshold)
+        self.decimals = decimals
+        self.pattern_histogram = PatternHistogram(num_buckets=pattern_buckets) if pattern_buckets else None
+
+    def compute(self, chart: dict, rates: Sequence[float]) -> pd.DataFrame:
+        """
+        Computes the features of a chart at every rate.
+
+        Args:
+            chart: A dictionary representing the chart, with timestamps as keys
+                   and binary step encodings as values.
+            rates: The music rates, e.g. `[0.8, 1.0, 1.5]`.
+
+        Returns:
+            A DataFrame with one row per rate, holding the `rate` and the
+            features in `FeatureExtractor` order.
+        """
+        rates = np.asarray(rates, dtype=float)
+        if np.any(rates <= 0):
+            raise ValueError("rates must be positive.")
+
+        times, panels = chart_to_arrays(chart)
+        if len(times) == 0:
+            return pd.DataFrame(columns=['rate'])
+
+        n = len(times)
+        scaled = np.round(times[None, :] / rates[:, None], self.decimals)
+        lo = np.arange(len(rates)) * n
+        ranges = self.ranges.compute_ranges(scaled.ravel(), np.tile(panels, (len(rates), 1)), lo, lo + n)
+
+        features = {'rate': rates, 'nps': ranges.pop('nps'), 'length': np.log(scaled.max(axis=1))}
+        features.update(ranges)
+        if self.pattern_histogram:
+            features.update(self.pattern_histogram.compute_arrays(panels))
+        return pd.DataFrame(features)
@@ -1,4 +1,8 @@
 import numpy as np
+from typing import Optional
+
+from stepmania_difficulty_predictor.features.columnar import chart_to_arrays
+from stepmania_difficulty_predictor.features.kernels import get_kernels
 
 class PatternDetector:
     """
@@ -6,14 +10,17 @@ class PatternDetector:
     This implementation is mode-agnostic and will adapt to the number of panels
     detected in the chart.
     """
-    def __init__(self, jack_threshold=0.1):
+    def __init__(self, jack_threshold=0.1, backend: Optional[str] = None):
         """
         Initializes the PatternDetector.
 
         Args:
             jack_threshold: The maximum time between notes to be considered a jack.
+            backend: The kernel backend, `'numba'` or `'numpy'`. Defaults to
+                     Numba when it is installed.
         """
         self.jack_threshold = jack_threshold
+        self.kernels = get_kernels(backend)
 
     def compute(self, chart: dict) -> dict:
         """
@@ -26,50 +33,21 @@ class PatternDetector:
         Returns:
             A dictionary containing the pattern features.
         """
-        timestamps = sorted(chart.keys())
-        if len(timestamps) < 2:
-            return {'jack_percentage': 0, 'crossover_percentage': 0}
+        return self.compute_arrays(*chart_to_arrays(chart))
 
-        # Determine the number of panels from the first note's encoding
-        num_panels = len(next(iter(chart.values()), []))
-        if num_panels == 0:
+    def compute_arrays(self, times: np.ndarray, panels: np.ndarray) -> dict:
+        """
+        Computes the pattern features from the columnar arrays of a chart.
+        """
+        # The number of panels comes from the width of the encodings
+        if len(times) < 2 or panels.shape[1] == 0:
             return {'jack_percentage': 0, 'crossover_percentage': 0}
 
-        jacks = 0
-        crossovers = 0
-
-        last_note_com = 0 # Center of mass for the previous note
-
-        for i in range(1, len(timestamps)):
-            time_diff = timestamps[i] - timestamps[i-1]
-            note = chart[timestamps[i]]
-            prev_note = chart[timestamps[i-1]]
-
-            # Mode-agnostic jack detection
-            if time_diff <= self.jack_threshold:
-                for j in range(num_panels):
-                    if note[j] == '1' and prev_note[j] == '1':
-                        jacks += 1
-
-            # Mode-agnostic crossover detection
-            # A crossover happens when the center of mass of the feet crosses the midline
-            current_note_panels = [j for j, val in enumerate(note) if val == '1']
-            if not current_note_panels:
-                current_note_com = last_note_com
-            else:
-                current_note_com = np.mean(current_note_panels)
-
-            # Midline of the pad
-            midline = (num_panels - 1) / 2.0
-
-            # Check if the center of mass has crossed the midline
-            if (last_note_com > midline and current_note_com < midline) or \
-               (last_note_com < midline and current_note_com > midline):
-                crossovers += 1
-
-            last_note_com = current_note_com
+        # Jacks hit the same panel twice in quick succession; a crossover
+        # happens when the center of mass of the feet crosses the midline
+        jacks, crossovers = self.kernels.pattern_counts(times, panels, self.jack_threshold)
 
-        total_notes = len(timestamps)
+        total_notes = len(times)
         jack_percentage = (jacks / total_notes) * 100 if total_notes > 0 else 0
         crossover_percentage = (crossovers / total_notes) * 100 if total_notes > 0 else 0
 
@@ -0,0 +1,104 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from stepmania_difficulty_predictor.features.columnar import chart_to_arrays, mix64, row_bitmasks
+
+class PatternHistogram:
+    """
+    Computes a hashed histogram of the n-row note patterns of a chart.
+
+    Each row with notes is packed into a bitmask, and every run of `ngram`
+    consecutive rows is encoded into one integer code from a strided window
+    over the bitmasks. Trills, staircases, jumptrills and brackets therefore
+    each map to their own codes. The codes are hashed into `num_buckets`
+    buckets and counted with `np.bincount`, giving a fixed-size feature
+    vector in O(n) time regardless of how many distinct patterns occur.
+
+    The hash is seeded with the number of panels, so every mode gets its own
+    bucket layout. Features are the fraction of the chart's n-grams in each
+    bucket, so they do not grow with the chart's length.
+    """
+    def __init__(self, ngram: int = 4, num_buckets: int = 32):
+        """
+        Initializes the PatternHistogram.
+
+        Args:
+            ngram: Number of consecutive rows per pattern.
+            num_buckets: Number of features the patterns are hashed into.
+        """
+        self.ngram = ngram
+        self.num_buckets = num_buckets
+
+    def compute(self, chart: dict) -> dict:
+        """
+        Computes the pattern histogram for a given chart.
+
+        Args:
+            chart: A dictionary representing the chart, with timestamps as keys
+                   and binary step encodings as values.
+
+        Returns:
+            A dictionary mapping `pattern_0` ... `pattern_{num_buckets - 1}`
+            to the fraction of the chart's patterns hashed to each bucket.
+        """
+        _, panels = chart_to_arrays(chart)
+        return self.compute_arrays(panels)
+
+    def compute_arrays(self, panels: np.ndarray) -> dict:
+        """
+        Computes the pattern histogram from the columnar panels array of a chart.
+        """
+        histogram = self.compute_ragged(panels, np.array([0, len(panels)]))[0]
+        return {f'pattern_{i}': float(value) for i, value in enumerate(histogram)}
+
+    def compute_ragged(self, panels: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        """
+        Computes the pattern histograms of charts laid end to end (see `charts_to_ragged`).
+
+        Windows spanning two charts are dropped, so every chart gets the
+        histogram it would get on its own.
+
+        Args:
+            panels: Boolean array of shape `(n_rows, num_panels)`.
+            offsets: Chart `c` owns rows `offsets[c]:offsets[c + 1]`.
+
+        Returns:
+            An array of shape `(len(offsets) - 1, num_buckets)`.
+        """
+        counts = self.bucket_counts(panels, offsets)
+        totals = counts.sum(axis=1, keepdims=True)
+        return np.where(totals > 0, counts / np.maximum(totals, 1), 0.0)
+
+    def bucket_counts(self, panels: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        """
+        Counts the patterns of charts laid end to end in each bucket, as `compute_ragged`
+        before normalizing.
+
+        Returns:
+            An integer array of shape `(len(offsets) - 1, num_buckets)`.
+        """
+        n_charts = len(offsets) - 1
+        num_panels = panels.shape[1]
+        bitmasks = row_bitmasks(panels) if num_panels else np.zeros(len(panels), dtype=np.int64)
+        chart_ids = np.repeat(np.arange(n_charts), np.diff(offsets))
+        keep = bitmasks != 0
+        bitmasks, chart_ids = bitmasks[keep].astype(np.uint64), chart_ids[keep]
+        if len(bitmasks) < self.ngram:
+            return np.zeros((n_charts, self.num_buckets), dtype=np.int64)
+
+        windows = sliding_window_view(bitmasks, self.ngram)
+        within_chart = chart_ids[:len(windows)] == chart_ids[self.ngram - 1:]
+        windows, window_ids = windows[within_chart], chart_ids[:len(windows)][within_chart]
+        if self.ngram * num_panels <= 64:
+            # Pack the rows of each window side by side into one code
+            shifts = (np.arange(self.ngram, dtype=np.uint64) * np.uint64(num_panels))
+            codes = np.bitwise_or.reduce(windows << shifts, axis=1)
+        else:
+            codes = np.zeros(len(windows), dtype=np.uint64)
+            for k in range(self.ngram):
+                codes = mix64(codes ^ windows[:, k])
+
+        seed = mix64(np.array([num_panels << 8 | self.ngram], dtype=np.uint64))
+        buckets = (mix64(codes ^ seed) % np.uint64(self.num_buckets)).astype(np.int64)
+        return np.bincount(window_ids * self.num_buckets + buckets,
+                           minlength=n_charts * self.num_buckets).reshape(n_charts, self.num_buckets)
@@ -1,17 +1,23 @@
 import numpy as np
+from typing import Optional
+
+from stepmania_difficulty_predictor.features.kernels import get_kernels
 
 class StreamDetector:
     """
     Detects and quantifies streams of notes in a chart.
     """
-    def __init__(self, stream_threshold=0.25):
+    def __init__(self, stream_threshold=0.25, backend: Optional[str] = None):
         """
         Initializes the StreamDetector.
 
         Args:
             stream_threshold: The maximum time between notes to be considered a stream.
+            backend: The kernel backend, `'numba'` or `'numpy'`. Defaults to
+                     Numba when it is installed.
         """
         self.stream_threshold = stream_threshold
+        self.kernels = get_kernels(backend)
 
     def compute(self, chart: dict) -> dict:
         """
@@ -23,35 +29,23 @@ class StreamDetector:
         Returns:
             A dictionary containing the stream features.
         """
-        timestamps = sorted(chart.keys())
-        if len(timestamps) < 2:
+        times = np.sort(np.fromiter(chart.keys(), dtype=float, count=len(chart)))
+        return self.compute_arrays(times)
+
+    def compute_arrays(self, times: np.ndarray) -> dict:
+        """
+        Computes the stream features from the sorted timestamps of a chart.
+        """
+        if len(times) < 2:
             return {'stream_percentage': 0, 'max_stream_length': 0}
 
-        stream_notes = 0
-        max_stream_length = 0
-        current_stream_length = 0
-
-        for i in range(1, len(timestamps)):
-            time_diff = timestamps[i] - timestamps[i-1]
-            if time_diff <= self.stream_threshold:
-                if current_stream_length == 0:
-                    current_stream_length = 2
-                else:
-                    current_stream_length += 1
-            else:
-                if current_stream_length > 0:
-                    stream_notes += current_stream_length
-                max_stream_length = max(max_stream_length, current_stream_length)
-                current_stream_length = 0
-
-        if current_stream_length > 0:
-            stream_notes += current_stream_length
-        max_stream_length = max(max_stream_length, current_stream_length)
-
-        total_notes = len(timestamps)
+        # A stream is a run of consecutive notes closer than the threshold
+        stream_notes, max_stream_length = self.kernels.stream_runs(times, self.stream_threshold)
+
+        total_notes = len(times)
         stream_percentage = (stream_notes / total_notes) * 100 if total_notes > 0 else 0
 
         return {
             'stream_percentage': stream_percentage,
-            'max_stream_length': max_stream_length
+            'max_stream_length': int(max_stream_length)
         }
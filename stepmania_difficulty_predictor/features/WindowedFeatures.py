@@ -0,0 +1,242 @@
+import numpy as np
+import pandas as pd
+
+from stepmania_difficulty_predictor.features.columnar import chart_to_arrays, orientation_masks, centers_of_mass
+from stepmania_difficulty_predictor.features.PatternHistogram import PatternHistogram
+from stepmania_difficulty_predictor.features.segments import (
+    prefix_sum, ragged_arange, range_max,
+    segment_weighted_average, segment_weighted_harmonic_average
+)
+
+class WindowedFeatureExtractor:
+    """
+    Computes the features of `FeatureExtractor` over sliding time windows.
+
+    Every window is evaluated at once instead of re-running the extractors on
+    each slice. Additive features (stream notes, jacks, crossovers) come from
+    prefix sums over per-row events with a constant-time correction at each
+    window edge. Order-statistic features (nps, vertical densities, longest
+    stream) are computed with segmented sorts and reductions over the rows
+    gathered for each window, which costs O(n * window / step) overall.
+
+    Each window matches running `FeatureExtractor` on that slice of the chart,
+    except for `length`, which is the whole chart's so that every window shares
+    the same song-length prior. Rows without any active panel carry their
+    centre of mass across window edges.
+    """
+    def __init__(self, alpha=3, stream_threshold=0.25, jack_threshold=0.1, pattern_buckets: int = 0):
+        """
+        Initializes the WindowedFeatureExtractor.
+
+        Args:
+            alpha: The weighting exponent used by the density features.
+            stream_threshold: The maximum time between notes to be considered a stream.
+            jack_threshold: The maximum time between notes to be considered a jack.
+            pattern_buckets: Number of hashed pattern n-gram features (see
+                             `PatternHistogram`); 0 leaves them out.
+        """
+        self.alpha = alpha
+        self.stream_threshold = stream_threshold
+        self.jack_threshold = jack_threshold
+        self.pattern_histogram = PatternHistogram(num_buckets=pattern_buckets) if pattern_buckets else None
+
+    def compute(self, chart: dict, window: float = 8.0, step: float = 4.0) -> pd.DataFrame:
+        """
+        Computes the windowed features for a given chart.
+
+        Args:
+            chart: A dictionary representing the chart, with timestamps as keys
+                   and binary step encodings as values.
+            window: Length of each window in seconds.
+            step: Time between the starts of consecutive windows in seconds.
+
+        Returns:
+            A DataFrame with one row per window, holding its `start`, `end`,
+            number of `rows` and the features in `FeatureExtractor` order.
+        """
+        if window <= 0 or step <= 0:
+            raise ValueError("window and step must be positive.")
+
+        times, panels = chart_to_arrays(chart)
+        if len(times) == 0:
+            return pd.DataFrame(columns=['start', 'end', 'rows'])
+
+        starts, ends = self._window_bounds(times, window, step)
+        lo = np.searchsorted(times, starts, side='left')
+        hi = np.searchsorted(times, ends, side='left')
+
+        ranges = self.compute_ranges(times, panels, lo, hi)
+        features = {'start': starts, 'end': ends, 'rows': hi - lo, 'nps': ranges.pop('nps')}
+        features['length'] = np.full(len(starts), np.log(times.max()))
+        features.update(ranges)
+        return pd.DataFrame(features)
+
+    def compute_ranges(self, times: np.ndarray, panels: np.ndarray,
+                       lo: np.ndarray, hi: np.ndarray) -> dict:
+        """
+        Computes the features of arbitrary row ranges `[lo[w], hi[w])` at once.
+
+        Rows must be sorted by time within each range, but the ranges may
+        overlap or come from different charts laid end to end.
+
+        Args:
+            times: Timestamps of the rows.
+            panels: Boolean array of shape `(len(times), num_panels)`.
+            lo: First row of each range.
+            hi: Row at which each range ends, exclusive.
+
+        Returns:
+            A dictionary of per-range feature arrays in `FeatureExtractor`
+            order, without `length`.
+        """
+        features = {'nps': self._nps(times, panels, lo, hi)}
+        features.update(self._vertical_density(times, panels, lo, hi))
+        features.update(self._streams(times, lo, hi))
+        features.update(self._patterns(times, panels, lo, hi))
+        if self.pattern_histogram is not None:
+            features.update(self._pattern_histogram(panels, lo, hi))
+        return features
+
+    def _window_bounds(self, times, window, step):
+        """
+        Lays out windows from the first note until one reaches past the last.
+        """
+        span = times[-1] - times[0]
+        n_windows = int(max(span - window, 0) // step) + 1
+        if (n_windows - 1) * step + window <= span:
+            n_windows += 1
+        starts = times[0] + step * np.arange(n_windows)
+        return starts, starts + window
+
+    def _nps(self, times, panels, lo, hi):
+        """
+        Windowed `HorizontalDensity` nps.
+
+        Mirrors the scalar extractor exactly: each second is represented by the
+        last run of consecutive rows sharing the same note count.
+        """
+        positions, windows = ragged_arange(lo, hi - lo)
+        counts = panels.sum(axis=1)[positions]
+        buckets = np.floor_divide(times[positions], 1.0)
+
+        index = np.arange(len(positions))
+        changed = np.ones(len(positions), dtype=bool)
+        changed[1:] = ((windows[1:] != windows[:-1]) | (buckets[1:] != buckets[:-1])
+                       | (counts[1:] != counts[:-1]))
+        run_starts = np.maximum.accumulate(np.where(changed, index, 0))
+
+        last_in_bucket = np.ones(len(positions), dtype=bool)
+        last_in_bucket[:-1] = (windows[1:] != windows[:-1]) | (buckets[1:] != buckets[:-1])
+
+        notes_per_second = (counts * (index - run_starts + 1))[last_in_bucket]
+        averages = segment_weighted_average(notes_per_second.astype(float) ** 2,
+                                            windows[last_in_bucket], len(lo), self.alpha)
+        return np.sqrt(averages)
+
+    def _vertical_density(self, times, panels, lo, hi):
+        """
+        Windowed `VerticalDensity`, one weighted harmonic average per orientation.
+        """
+        vertical_density = {}
+        for orientation, mask in orientation_masks(panels).items():
+            rows = np.flatnonzero(mask)
+            timedeltas = np.diff(times[rows])
+            first = np.searchsorted(rows, lo, side='left')
+            last = np.searchsorted(rows, hi, side='left')
+
+            positions, windows = ragged_arange(first, np.maximum(last - first - 1, 0))
+            vertical_density[orientation] = segment_weighted_harmonic_average(
+                timedeltas[positions], windows, len(lo), self.alpha)
+        return vertical_density
+
+    def _streams(self, times, lo, hi):
+        """
+        Windowed `StreamDetector`. Pair `k` joins rows `k` and `k + 1`.
+        """
+        close = np.diff(times) <= self.stream_threshold
+        n_pairs = len(close)
+        index = np.arange(n_pairs)
+        first_pair = np.minimum(lo, n_pairs)
+        pair_end = np.maximum(hi - 1, first_pair)
+        has_pairs = pair_end > first_pair
+
+        # Stream notes: each run of r close pairs covers r + 1 notes
+        run_starts = close.copy()
+        run_starts[1:] &= ~close[:-1]
+        close_sum, run_sum = prefix_sum(close), prefix_sum(run_starts)
+        clipped_run = has_pairs & np.append(close & ~run_starts, False)[first_pair]
+        stream_notes = (close_sum[pair_end] - close_sum[first_pair]
+                        + run_sum[pair_end] - run_sum[first_pair] + clipped_run)
+
+        # Longest stream: the run at the window start is clipped to it, later
+        # runs are read from the running position within each run
+        last_break = np.maximum.accumulate(np.where(close, -1, index))
+        position_in_run = np.where(close, index - last_break, 0)
+        next_break = np.minimum.accumulate(np.where(close, n_pairs, index)[::-1])[::-1]
+        first_run_end = np.minimum(np.append(next_break, n_pairs)[first_pair], pair_end)
+        longest = np.maximum(first_run_end - first_pair,
+                             range_max(position_in_run, first_run_end, pair_end))
+
+        rows = hi - lo
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stream_percentage = np.where(rows >= 2, stream_notes / np.maximum(rows, 1) * 100, 0.0)
+        return {
+            'stream_percentage': stream_percentage,
+            'max_stream_length': np.where((rows >= 2) & (longest > 0), longest + 1, 0),
+        }
+
+    def _patterns(self, times, panels, lo, hi):
+        """
+        Windowed `PatternDetector`. Pair `k` joins rows `k` and `k + 1`.
+        """
+        num_panels = panels.shape[1]
+        midline = (num_panels - 1) / 2.0
+        first_pair = np.minimum(lo, len(times) - 1)
+        pair_end = np.maximum(hi - 1, first_pair)
+        has_pairs = pair_end > first_pair
+
+        # Jacks: shared panels between rows close enough together
+        shared = (panels[1:] & panels[:-1]).sum(axis=1)
+        jacks = np.where(np.diff(times) <= self.jack_threshold, shared, 0)
+        jack_sum = prefix_sum(jacks)
+        jack_counts = jack_sum[pair_end] - jack_sum[first_pair]
+
+        # Crossovers: the scalar loop starts from a centre of mass of 0 and
+        # carries it forward over empty rows
+        com = centers_of_mass(panels)
+        com[0] = np.nan
+        filled = np.where(np.isnan(com), -1, np.arange(len(com)))
+        carried = np.maximum.accumulate(filled)
+        carried = np.where(carried >= 0, com[np.maximum(carried, 0)], 0.0)
+
+        previous = np.append(0.0, carried[1:-1])[:len(carried) - 1]
+        crossed = self._crossed(previous, carried[1:], midline)
+        crossed_sum = prefix_sum(crossed)
+
+        # The first pair of each window restarts from a centre of mass of 0
+        first_com = np.nan_to_num(np.append(com, np.nan)[np.minimum(lo + 1, len(com))], nan=0.0)
+        first_crossed = has_pairs & self._crossed(np.zeros(len(lo)), first_com, midline)
+        later_start = np.minimum(first_pair + 1, pair_end)
+        crossovers = first_crossed + crossed_sum[pair_end] - crossed_sum[later_start]
+
+        rows = hi - lo
+        usable = (rows >= 2) & (num_panels > 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return {
+                'jack_percentage': np.where(usable, jack_counts / np.maximum(rows, 1) * 100, 0.0),
+                'crossover_percentage': np.where(usable, crossovers / np.maximum(rows, 1) * 100, 0.0),
+            }
+
+    def _pattern_histogram(self, panels, lo, hi):
+        """
+        Windowed `PatternHistogram`: the rows of each range are gathered end to
+        end so that no pattern spans two ranges.
+        """
+        positions, _ = ragged_arange(lo, hi - lo)
+        offsets = np.concatenate(([0], np.cumsum(hi - lo)))
+        histograms = self.pattern_histogram.compute_ragged(panels[positions], offsets)
+        return {f'pattern_{i}': histograms[:, i] for i in range(histograms.shape[1])}
+
+    @staticmethod
+    def _crossed(previous, current, midline):
+        return ((previous > midline) & (current < midline)) | ((previous < midline) & (current > midline))
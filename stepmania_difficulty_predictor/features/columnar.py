@@ -0,0 +1,115 @@
+import numpy as np
+from itertools import chain
+from typing import Sequence
+
+def chart_to_arrays(chart: dict):
+    """
+    Converts a chart dictionary into sorted columnar arrays.
+
+    Args:
+        chart: A dictionary representing the chart, with timestamps as keys
+               and binary step encodings as values.
+
+    Returns:
+        A tuple `(times, panels)` where `times` is a sorted float array of
+        timestamps and `panels` is a boolean array of shape
+        `(len(times), num_panels)` marking the active panels of each row.
+    """
+    if not chart:
+        return np.empty(0), np.empty((0, 0), dtype=bool)
+
+    times = np.fromiter(chart.keys(), dtype=float, count=len(chart))
+    order = np.argsort(times, kind='stable')
+    encodings = list(chart.values())
+
+    num_panels = len(encodings[0])
+    buffer = ''.join(encodings).encode('ascii')
+    if len(buffer) != num_panels * len(encodings):
+        raise ValueError("All rows of a chart must have the same number of panels.")
+
+    panels = np.frombuffer(buffer, dtype=np.uint8).reshape(len(encodings), num_panels) == ord('1')
+    return times[order], panels[order]
+
+def charts_to_ragged(charts: Sequence[dict]):
+    """
+    Concatenates charts with the same number of panels into ragged columnar arrays.
+
+    Every chart's rows are sorted by time, as by `chart_to_arrays`, and laid
+    end to end, so chart `c` owns rows `offsets[c]:offsets[c + 1]`. All the
+    charts are converted at once, without a NumPy call per chart.
+
+    Args:
+        charts: Non-empty chart dictionaries, with timestamps as keys and
+                binary step encodings of equal width as values.
+
+    Returns:
+        A tuple `(times, panels, offsets, in_order)` where `times` and
+        `panels` are as from `chart_to_arrays`, `offsets` has `len(charts) + 1`
+        entries, and `in_order` marks the charts whose rows were already in
+        time order in the dictionary.
+    """
+    lengths = np.fromiter((len(chart) for chart in charts), dtype=np.int64, count=len(charts))
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    if len(charts) == 0:
+        return np.empty(0), np.empty((0, 0), dtype=bool), offsets, np.ones(0, dtype=bool)
+
+    times = np.fromiter(chain.from_iterable(chart.keys() for chart in charts), dtype=float, count=offsets[-1])
+    num_panels = len(next(iter(charts[0].values())))
+    buffer = ''.join(chain.from_iterable(chart.values() for chart in charts)).encode('ascii')
+    if len(buffer) != num_panels * offsets[-1]:
+        raise ValueError("All rows of the charts must have the same number of panels.")
+    panels = np.frombuffer(buffer, dtype=np.uint8).reshape(offsets[-1], num_panels) == ord('1')
+
+    segment_ids = np.repeat(np.arange(len(charts)), lengths)
+    backwards = np.flatnonzero((np.diff(times) <= 0) & (segment_ids[1:] == segment_ids[:-1]))
+    in_order = np.ones(len(charts), dtype=bool)
+    in_order[segment_ids[backwards]] = False
+
+    if in_order.all():
+        return times, panels, offsets, in_order
+    order = np.lexsort((times, segment_ids))
+    return times[order], panels[order], offsets, in_order
+
+def row_bitmasks(panels: np.ndarray) -> np.ndarray:
+    """
+    Packs each row of a panels array into an integer, bit i marking panel i.
+    """
+    return panels.astype(np.int64) @ (1 << np.arange(panels.shape[1], dtype=np.int64))
+
+def mix64(values: np.ndarray) -> np.ndarray:
+    """
+    The splitmix64 finalizer, applied elementwise to a uint64 array.
+    """
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xbf58476d1ce4e5b9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94d049bb133111eb)
+    return values ^ (values >> np.uint64(31))
+
+def orientation_masks(panels: np.ndarray) -> dict:
+    """
+    Computes the row masks for each orientation used by `VerticalDensity`.
+
+    Args:
+        panels: A boolean array of shape `(n_rows, num_panels)`.
+
+    Returns:
+        A dictionary mapping each orientation name to a boolean row mask, in
+        the same order as the features produced by `VerticalDensity`.
+    """
+    num_panels = panels.shape[1]
+    orientations = {f'col_{i}': panels[:, i] for i in range(num_panels)}
+    if num_panels > 1:
+        orientations['left'] = panels[:, :num_panels // 2].any(axis=1)
+        orientations['right'] = panels[:, num_panels // 2:].any(axis=1)
+    orientations['all'] = panels.any(axis=1)
+    return orientations
+
+def centers_of_mass(panels: np.ndarray) -> np.ndarray:
+    """
+    Computes the mean active panel index of each row, NaN for empty rows.
+    """
+    counts = panels.sum(axis=1)
+    weighted = panels @ np.arange(panels.shape[1], dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, weighted / np.maximum(counts, 1), np.nan)
@@ -0,0 +1,119 @@
+import os
+import numpy as np
+from typing import Callable, NamedTuple, Optional
+
+from stepmania_difficulty_predictor.features.columnar import centers_of_mass
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+class Kernels(NamedTuple):
+    """
+    The per-row feature kernels of one backend.
+
+    stream_runs(times, stream_threshold) -> (stream_notes, max_stream_length)
+    pattern_counts(times, panels, jack_threshold) -> (jacks, crossovers)
+    """
+    stream_runs: Callable
+    pattern_counts: Callable
+
+def _stream_runs_numpy(times, stream_threshold):
+    """
+    Counts the notes in streams and the longest stream, as `StreamDetector` does.
+    """
+    close = np.diff(times) <= stream_threshold
+    edges = np.diff(np.concatenate(([0], close.astype(np.int8), [0])))
+    runs = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+    if len(runs) == 0:
+        return 0, 0
+    return int(np.sum(runs + 1)), int(runs.max() + 1)
+
+def _pattern_counts_numpy(times, panels, jack_threshold):
+    """
+    Counts jacks and crossovers, as `PatternDetector` does.
+
+    The centre of mass starts at 0 and is carried forward over empty rows;
+    the first row's own centre of mass is never used.
+    """
+    shared = (panels[1:] & panels[:-1]).sum(axis=1)
+    jacks = int(shared[np.diff(times) <= jack_threshold].sum())
+
+    com = centers_of_mass(panels)
+    com[0] = np.nan
+    filled = np.maximum.accumulate(np.where(np.isnan(com), -1, np.arange(len(com))))
+    carried = np.where(filled >= 0, com[np.maximum(filled, 0)], 0.0)
+
+    midline = (panels.shape[1] - 1) / 2.0
+    previous, current = carried[:-1], carried[1:]
+    crossed = ((previous > midline) & (current < midline)) | ((previous < midline) & (current > midline))
+    return jacks, int(crossed.sum())
+
+if numba is not None:
+    # cache=True stores the compiled machine code next to this module, so
+    # later processes load it instead of compiling again
+    @numba.njit(cache=True)
+    def _stream_runs_numba(times, stream_threshold):
+        stream_notes = 0
+        max_stream_length = 0
+        current = 0
+        for i in range(1, len(times)):
+            if times[i] - times[i - 1] <= stream_threshold:
+                current = 2 if current == 0 else current + 1
+            else:
+                stream_notes += current
+                max_stream_length = max(max_stream_length, current)
+                current = 0
+        stream_notes += current
+        max_stream_length = max(max_stream_length, current)
+        return stream_notes, max_stream_length
+
+    @numba.njit(cache=True)
+    def _pattern_counts_numba(times, panels, jack_threshold):
+        num_panels = panels.shape[1]
+        midline = (num_panels - 1) / 2.0
+        jacks = 0
+        crossovers = 0
+        last_com = 0.0
+        for i in range(1, len(times)):
+            if times[i] - times[i - 1] <= jack_threshold:
+                for j in range(num_panels):
+                    if panels[i, j] and panels[i - 1, j]:
+                        jacks += 1
+
+            count = 0
+            total = 0.0
+            for j in range(num_panels):
+                if panels[i, j]:
+                    count += 1
+                    total += j
+            com = last_com if count == 0 else total / count
+
+            if (last_com > midline and com < midline) or (last_com < midline and com > midline):
+                crossovers += 1
+            last_com = com
+        return jacks, crossovers
+
+BACKENDS = {'numpy': Kernels(_stream_runs_numpy, _pattern_counts_numpy)}
+if numba is not None:
+    BACKENDS['numba'] = Kernels(_stream_runs_numba, _pattern_counts_numba)
+
+# The SMDP_KERNEL_BACKEND environment variable overrides the default backend
+DEFAULT_BACKEND = os.environ.get('SMDP_KERNEL_BACKEND', 'numba' if numba is not None else 'numpy')
+
+def get_kernels(backend: Optional[str] = None) -> Kernels:
+    """
+    Returns the feature kernels of a backend.
+
+    Args:
+        backend: `'numba'` or `'numpy'`. Defaults to Numba when it is installed.
+
+    Returns:
+        The backend's `Kernels`.
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Kernel backend '{backend}' is not available; "
+                         f"choose from {sorted(BACKENDS)}.")
+    return BACKENDS[backend]
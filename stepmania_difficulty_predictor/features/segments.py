@@ -0,0 +1,94 @@
+import numpy as np
+
+def prefix_sum(values: np.ndarray) -> np.ndarray:
+    """
+    Cumulative sum with a leading zero, so `p[j] - p[i]` sums `values[i:j]`.
+    """
+    return np.concatenate(([0], np.cumsum(values)))
+
+def ragged_arange(starts: np.ndarray, lengths: np.ndarray):
+    """
+    Concatenates the index ranges `starts[s]:starts[s] + lengths[s]`.
+
+    Args:
+        starts: First index of each segment.
+        lengths: Number of indices in each segment.
+
+    Returns:
+        A tuple `(positions, segment_ids)` holding the concatenated indices and
+        the segment each of them belongs to.
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    segment_ids = np.repeat(np.arange(len(lengths)), lengths)
+    offsets = prefix_sum(lengths)[:-1]
+    positions = np.arange(len(segment_ids)) - offsets[segment_ids] + np.asarray(starts)[segment_ids]
+    return positions.astype(np.int64), segment_ids
+
+def range_max(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Computes `values[starts[s]:ends[s]].max()` for every range, 0 for empty ones.
+
+    Ranges may overlap; each is reduced in a single `np.maximum.reduceat` call.
+    """
+    if len(starts) == 0:
+        return np.zeros(0, dtype=values.dtype)
+
+    padded = np.append(values, values.dtype.type(0))
+    bounds = np.column_stack((starts, np.maximum(ends, starts))).ravel()
+    result = np.maximum.reduceat(padded, bounds)[::2]
+    return np.where(ends > starts, result, 0)
+
+def _rank_within_segments(values: np.ndarray, segment_ids: np.ndarray):
+    """
+    Sorts values within each segment and returns them with their 0-based rank.
+
+    Values are sorted once, then stably regrouped by segment with radix sorts
+    over 16 bits of the segment ids at a time, which is several times faster
+    than `np.lexsort` on large batches. Ties may be reordered, which does not
+    change any rank-weighted sum.
+    """
+    order = np.argsort(values)
+    max_segment = int(segment_ids.max()) if len(segment_ids) else 0
+    shift = 0
+    while True:
+        digits = ((segment_ids[order] >> shift) & 0xFFFF).astype(np.uint16)
+        order = order[np.argsort(digits, kind='stable')]
+        shift += 16
+        if max_segment >> shift == 0:
+            break
+    values, segment_ids = values[order], segment_ids[order]
+    counts = np.bincount(segment_ids)
+    first = np.cumsum(counts) - counts
+    return values, segment_ids, np.arange(len(values)) - first[segment_ids]
+
+def segment_weighted_average(values: np.ndarray, segment_ids: np.ndarray,
+                             n_segments: int, alpha: float) -> np.ndarray:
+    """
+    Rank-weighted average of each segment, as in `HorizontalDensity._weighted_average`.
+
+    Values are sorted within each segment and weighted by `rank ** alpha`.
+    Segments whose weights sum to zero yield NaN, like the scalar version.
+    """
+    values, segment_ids, ranks = _rank_within_segments(values, segment_ids)
+    weights = np.power(ranks, alpha).astype(float)
+    total_weight = np.bincount(segment_ids, weights, minlength=n_segments)
+    total = np.bincount(segment_ids, weights * values, minlength=n_segments)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / total_weight
+
+def segment_weighted_harmonic_average(values: np.ndarray, segment_ids: np.ndarray,
+                                      n_segments: int, alpha: float) -> np.ndarray:
+    """
+    Rank-weighted harmonic average of each segment, as in
+    `VerticalDensity._weighted_harmonic_average`.
+
+    Values at or below 1e-6 are dropped first. Segments left without
+    positive weight yield 0, like the scalar version.
+    """
+    keep = values > 1e-6
+    values, segment_ids, ranks = _rank_within_segments(values[keep], segment_ids[keep])
+    weights = np.power(ranks, alpha).astype(float)
+    total_weight = np.bincount(segment_ids, weights, minlength=n_segments)
+    weighted_reciprocals = np.bincount(segment_ids, weights / values, minlength=n_segments)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(total_weight > 0, total_weight / weighted_reciprocals, 0.0)
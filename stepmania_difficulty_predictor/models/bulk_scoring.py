@@ -0,0 +1,159 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+
+from stepmania_difficulty_predictor.models.prediction_pipeline import DEFAULT_MODEL_DIR
+
+# Dataset columns copied to the predictions when present
+PASSTHROUGH_COLUMNS = ['id', 'name', 'mode', 'difficulty', 'meter', 'group']
+
+_worker_models = None
+
+def load_models(model_dir: str) -> Dict[str, object]:
+    """
+    Loads every `<mode>.p` model of a model directory.
+
+    Args:
+        model_dir: Directory holding one model file per mode.
+
+    Returns:
+        A dictionary mapping each mode to its model.
+    """
+    models = {}
+    for filename in sorted(os.listdir(model_dir)):
+        if filename.endswith('.p'):
+            with open(os.path.join(model_dir, filename), 'rb') as f:
+                models[filename[:-len('.p')]] = pickle.load(f)
+    return models
+
+def _init_worker(model_dir: str):
+    """
+    Loads the models once per worker process.
+    """
+    global _worker_models
+    _worker_models = load_models(model_dir)
+
+def _score_block(mode: str, block: pd.DataFrame) -> np.ndarray:
+    """
+    Scores the feature rows of one mode in a worker process.
+    """
+    return _score(_worker_models[mode], block)
+
+def _score(model, block: pd.DataFrame) -> np.ndarray:
+    """
+    Scores feature rows with a model, cleaned the way `predict_timeline` cleans them.
+    """
+    X = block.reindex(columns=model.feature_names_in_, fill_value=0)
+    X = X.apply(pd.to_numeric, errors='coerce').replace([np.inf, -np.inf], np.nan).fillna(0)
+    return np.asarray(model.predict(X), dtype=float)
+
+class BulkScorer:
+    """
+    Scores a feature dataset with the per-mode models of `train_model.py`.
+
+    The dataset is read `chunk_size` rows at a time. Each chunk is split by
+    mode and every block is routed to its mode's model; rows of modes without
+    a model get no prediction. With several `workers`, blocks are scored in
+    worker processes that load the models once, with a bounded number of
+    chunks in flight, so memory stays constant regardless of the dataset's
+    size. Chunks are produced in dataset order either way.
+    """
+    def __init__(self, model_dir: str = DEFAULT_MODEL_DIR, workers: int = 1, chunk_size: int = 10000):
+        """
+        Initializes the BulkScorer.
+
+        Args:
+            model_dir: Directory holding one model file per mode.
+            workers: Number of worker processes; 1 scores in this process.
+            chunk_size: Number of dataset rows read at a time.
+        """
+        self.model_dir = model_dir
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.models = load_models(model_dir)
+        self.counts = Counter()
+
+    def iter_predictions(self, dataset_path: str) -> Iterator[pd.DataFrame]:
+        """
+        Streams the predictions of a feature dataset, one chunk at a time.
+
+        Args:
+            dataset_path: Path of the feature CSV, e.g. `dataset.csv`.
+
+        Yields:
+            DataFrames holding each chunk's passthrough columns (see
+            `PASSTHROUGH_COLUMNS`) and its `predicted_difficulty`.
+        """
+        # Ids and groups are hex strings; a chunk of all-digit ones must not be read as numbers
+        chunks = pd.read_csv(dataset_path, chunksize=self.chunk_size, dtype={'id': str, 'group': str},
+                             encoding='utf-8')
+        if self.workers <= 1:
+            for chunk in chunks:
+                blocks = [(mode, index, _score(self.models[mode], chunk.loc[index]))
+                          for mode, index in self._route(chunk)]
+                yield self._assemble(chunk, blocks)
+            return
+
+        with ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                 initargs=(self.model_dir,)) as executor:
+            pending = deque()
+            for chunk in chunks:
+                futures = [(mode, index, executor.submit(_score_block, mode, chunk.loc[index]))
+                           for mode, index in self._route(chunk)]
+                pending.append((chunk[chunk.columns.intersection(PASSTHROUGH_COLUMNS)], futures))
+                if len(pending) > 2 * self.workers:
+                    yield self._collect(*pending.popleft())
+            while pending:
+                yield self._collect(*pending.popleft())
+
+    def score(self, dataset_path: str, output_path: str) -> int:
+        """
+        Streams the predictions of a feature dataset into a CSV file.
+
+        Args:
+            dataset_path: Path of the feature CSV, e.g. `dataset.csv`.
+            output_path: Path of the predictions CSV. Any existing file is replaced.
+
+        Returns:
+            The number of rows written.
+        """
+        rows = 0
+        with open(output_path, 'w', encoding='utf-8', newline='') as f:
+            for predictions in self.iter_predictions(dataset_path):
+                predictions.to_csv(f, header=rows == 0, index=False)
+                rows += len(predictions)
+        return rows
+
+    def _route(self, chunk: pd.DataFrame) -> List[Tuple[str, pd.Index]]:
+        """
+        Splits a chunk into the row indices of each mode with a model.
+        """
+        routes = []
+        for mode, index in chunk.groupby('mode', sort=False).groups.items():
+            if mode in self.models:
+                routes.append((mode, index))
+                self.counts[mode] += len(index)
+            else:
+                self.counts['unscored'] += len(index)
+        return routes
+
+    def _collect(self, chunk: pd.DataFrame, futures) -> pd.DataFrame:
+        """
+        Waits for the scored blocks of a chunk and assembles them.
+        """
+        return self._assemble(chunk, [(mode, index, future.result()) for mode, index, future in futures])
+
+    @staticmethod
+    def _assemble(chunk: pd.DataFrame, blocks) -> pd.DataFrame:
+        """
+        Combines a chunk's passthrough columns with the predictions of its blocks.
+        """
+        predictions = chunk[chunk.columns.intersection(PASSTHROUGH_COLUMNS)].copy()
+        predictions['predicted_difficulty'] = np.nan
+        for _, index, values in blocks:
+            predictions.loc[index, 'predicted_difficulty'] = values
+        return predictions
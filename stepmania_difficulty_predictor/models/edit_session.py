@@ -0,0 +1,488 @@
+import numpy as np
+import pandas as pd
+import simfile
+from collections import Counter
+from typing import Iterable, Optional, Tuple
+from simfile.timing import Beat, TimingData
+from simfile.timing.engine import TimingEngine
+from simfile.notes import NoteData, NoteType
+
+from stepmania_difficulty_predictor.data.SMChartPreprocessor import SMChartPreprocessor
+from stepmania_difficulty_predictor.features.columnar import orientation_masks, centers_of_mass
+from stepmania_difficulty_predictor.features.PatternHistogram import PatternHistogram
+from stepmania_difficulty_predictor.models.packed_forest import PackedForest
+
+def _true_runs(mask: np.ndarray) -> np.ndarray:
+    """
+    Lengths of the runs of consecutive True values in a boolean array.
+    """
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+def _last_true(mask: np.ndarray, stop: int) -> np.ndarray:
+    """
+    Index of the last True before `stop` in each column of `mask`, -1 if none.
+
+    Scans backwards in growing blocks, so nearby hits cost O(1) and the worst
+    case stays O(n).
+    """
+    found = np.full(mask.shape[1], -1)
+    block = 32
+    while stop > 0 and (found < 0).any():
+        start = max(stop - block, 0)
+        window = mask[start:stop]
+        hit = window.any(axis=0) & (found < 0)
+        found[hit] = (stop - 1 - np.argmax(window[::-1], axis=0))[hit]
+        stop, block = start, block * 4
+    return found
+
+def _nearest_true(mask: np.ndarray, a: int, b: int, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices of the last `count` True values of a 1-d mask before `a`, and of
+    the first `count` from `b`, scanning outwards in growing blocks.
+    """
+    before = after = np.zeros(0, dtype=np.int64)
+    block = 32
+    while count:
+        start = max(a - block, 0)
+        before = start + np.flatnonzero(mask[start:a])
+        if len(before) >= count or start == 0:
+            break
+        block *= 4
+    block = 32
+    while count:
+        stop = min(b + block, len(mask))
+        after = b + np.flatnonzero(mask[b:stop])
+        if len(after) >= count or stop == len(mask):
+            break
+        block *= 4
+    return before[max(len(before) - count, 0):], after[:count]
+
+def _first_true(mask: np.ndarray, start: int) -> np.ndarray:
+    """
+    Index of the first True from `start` in each column of `mask`, `len(mask)` if none.
+    """
+    found = np.full(mask.shape[1], len(mask))
+    block = 32
+    while start < len(mask) and (found == len(mask)).any():
+        stop = min(start + block, len(mask))
+        window = mask[start:stop]
+        hit = window.any(axis=0) & (found == len(mask))
+        found[hit] = (start + np.argmax(window, axis=0))[hit]
+        start, block = stop, block * 4
+    return found
+
+class ChartEditSession:
+    """
+    Keeps the features and predicted difficulty of one chart up to date while
+    it is being edited.
+
+    The session holds the chart as columnar arrays (beats, times and active
+    panels per row) together with running accumulators for every feature:
+    per-pair stream, jack and crossover events with their totals, a histogram
+    of stream run lengths, the per-second note counts, a histogram of time
+    deltas per orientation and, for models trained with them, the bucket
+    counts of the pattern histogram. An edit replaces the notes of a beat
+    range and only touches the rows, pairs, seconds, deltas and patterns
+    around that range, so features are refreshed without re-parsing the
+    simfile or re-running the extractors.
+
+    Timestamps are rounded to `decimals`, so deltas are whole multiples of
+    that resolution and the rank-weighted densities can be evaluated per
+    histogram bin. Features match running `FeatureExtractor` on `chart()` up
+    to floating-point rounding.
+    """
+    def __init__(self, sm_file: simfile.Simfile, chart_index: int = 0, model=None,
+                 decimals: int = 3, alpha: float = 3, stream_threshold: float = 0.25,
+                 jack_threshold: float = 0.1, pattern_buckets: Optional[int] = None):
+        """
+        Initializes the ChartEditSession.
+
+        Args:
+            sm_file: The parsed simfile holding the chart.
+            chart_index: Index of the chart to edit within `sm_file.charts`.
+            model: The trained model for the chart's mode, used by `score`.
+            decimals: Number of decimals timestamps are rounded to.
+            alpha: The weighting exponent used by the density features.
+            stream_threshold: The maximum time between notes to be considered a stream.
+            jack_threshold: The maximum time between notes to be considered a jack.
+            pattern_buckets: Number of hashed pattern n-gram features (see
+                             `PatternHistogram`). Defaults to the number of
+                             `pattern_<i>` columns the model was trained with.
+        """
+        chart = sm_file.charts[chart_index]
+        self.mode = chart.stepstype
+        self.num_panels = SMChartPreprocessor().num_panels(chart)
+        if self.num_panels == 0:
+            raise ValueError(f"Unknown number of panels for mode '{self.mode}'.")
+
+        self.decimals = decimals
+        self._scale = 10.0 ** decimals
+        self.alpha = alpha
+        self.stream_threshold = stream_threshold
+        self.jack_threshold = jack_threshold
+        self.timing_engine = TimingEngine(TimingData(sm_file, chart))
+        self._times_by_beat = {}
+
+        self.model = model
+        self.packed_model = PackedForest.from_model(model) if model is not None else None
+        if pattern_buckets is None:
+            pattern_buckets = sum(str(col).startswith('pattern_') for col in getattr(model, 'feature_names_in_', []))
+        self.pattern_histogram = PatternHistogram(num_buckets=pattern_buckets) if pattern_buckets else None
+
+        notes = ((note.beat, note.column) for note in NoteData(chart) if note.note_type == NoteType.TAP)
+        self.beats, self.times, self.panels = self._rows_from_notes(notes)
+        self._weight_sums = np.zeros(1)
+        self._rebuild()
+
+    def chart(self) -> dict:
+        """
+        Returns the current chart in the preprocessed `{time: encoding}` format.
+        """
+        encodings = np.where(self.panels, '1', '0')
+        return {float(t): ''.join(row) for t, row in zip(self.times, encodings)}
+
+    def edit(self, start_beat: float, end_beat: float, notes: Iterable[Tuple[float, int]] = ()):
+        """
+        Replaces every note in `[start_beat, end_beat)` with `notes`.
+
+        Args:
+            start_beat: First beat of the edited range.
+            end_beat: Beat at which the edited range ends, exclusive.
+            notes: The new tap notes of the range, as `(beat, column)` pairs.
+        """
+        beats, times, panels = self._rows_from_notes(notes)
+        if len(beats) and (beats.min() < start_beat or beats.max() >= end_beat):
+            raise ValueError("Every note must lie within the edited beat range.")
+
+        removed = np.flatnonzero((self.beats >= start_beat) & (self.beats < end_beat))
+        if len(removed):
+            a, b = removed[0], removed[-1] + 1
+        elif len(times):
+            a = b = np.searchsorted(self.times, times[0])
+        else:
+            return
+
+        n = len(self.times)
+        fits = (b - a == len(removed)
+                and (not len(times) or ((a == 0 or self.times[a - 1] < times[0])
+                                        and (b == n or times[-1] < self.times[b]))))
+        if fits:
+            self._splice(a, b, beats, times, panels)
+        else:
+            # Warps or notes landing on an existing timestamp: rebuild from scratch
+            self.beats = np.concatenate((np.delete(self.beats, removed), beats))
+            self.times = np.concatenate((np.delete(self.times, removed), times))
+            self.panels = np.concatenate((np.delete(self.panels, removed, axis=0), panels))
+            self.beats, self.times, self.panels = self._merge_rows(self.beats, self.times, self.panels)
+            self._rebuild()
+
+    def features(self) -> dict:
+        """
+        Computes the current feature vector from the accumulators.
+
+        Returns:
+            The same dictionary `FeatureExtractor.compute` returns for `chart()`,
+            or an empty dictionary if the chart has no notes.
+        """
+        n = len(self.times)
+        if n == 0:
+            return {}
+
+        bucket_values = np.sort(np.fromiter(self._buckets.values(), dtype=float) ** 2)
+        weights = np.diff(self._rank_weight_sums(len(bucket_values)))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            nps = np.sqrt(np.dot(weights, bucket_values) / np.sum(weights))
+        features = {'nps': nps, 'length': np.log(self.times[-1])}
+
+        for name, histogram in zip(self.orientations, self._deltas):
+            features[name] = self._weighted_harmonic_average(histogram)
+
+        if n < 2:
+            features.update({'stream_percentage': 0, 'max_stream_length': 0,
+                             'jack_percentage': 0, 'crossover_percentage': 0})
+        else:
+            run_lengths = [length for length, count in self._run_lengths.items() if count > 0]
+            features['stream_percentage'] = (self._close_total + self._run_total) / n * 100
+            features['max_stream_length'] = int(max(run_lengths)) + 1 if run_lengths else 0
+            features['jack_percentage'] = self._jack_total / n * 100
+            features['crossover_percentage'] = self._crossed_total / n * 100
+
+        if self.pattern_histogram is not None:
+            total = self._pattern_counts.sum()
+            fractions = self._pattern_counts / total if total else np.zeros(len(self._pattern_counts))
+            features.update({f'pattern_{i}': float(value) for i, value in enumerate(fractions)})
+        return features
+
+    def score(self) -> Optional[float]:
+        """
+        Predicts the difficulty of the chart in its current state.
+
+        Returns:
+            The predicted difficulty, or None if the chart has no notes.
+        """
+        if self.model is None:
+            raise ValueError(f"No model loaded for mode '{self.mode}'.")
+
+        features = self.features()
+        if not features:
+            return None
+
+        training_cols = self.model.feature_names_in_
+        row = [[features.get(col, 0) for col in training_cols]]
+        if self.packed_model is not None:
+            return float(self.packed_model.predict(row)[0])
+        return float(self.model.predict(pd.DataFrame(row, columns=training_cols))[0])
+
+    def _rows_from_notes(self, notes: Iterable[Tuple[float, int]]):
+        """
+        Times notes and groups them into rows, like `SMChartPreprocessor`.
+        """
+        beats_by_time = {}
+        columns_by_time = {}
+        for beat, column in notes:
+            time = self._time_at(beat)
+            if time is None:
+                continue
+            beats_by_time.setdefault(time, float(beat))
+            columns_by_time.setdefault(time, []).append(column)
+
+        times = np.array(list(beats_by_time.keys()), dtype=float)
+        beats = np.array(list(beats_by_time.values()), dtype=float)
+        panels = np.zeros((len(times), self.num_panels), dtype=bool)
+        for i, columns in enumerate(columns_by_time.values()):
+            columns = [col for col in columns if 0 <= col < self.num_panels]
+            panels[i, columns] = True
+
+        order = np.argsort(times, kind='stable')
+        return beats[order], times[order], panels[order]
+
+    def _time_at(self, beat: float) -> Optional[float]:
+        """
+        Converts a beat to its rounded timestamp, caching conversions since
+        editors keep placing notes on the same beats.
+        """
+        if beat not in self._times_by_beat:
+            try:
+                time = np.round(self.timing_engine.time_at(Beat(beat)), self.decimals)
+            except (ValueError, KeyError):
+                time = None
+            self._times_by_beat[beat] = time
+        return self._times_by_beat[beat]
+
+    @staticmethod
+    def _merge_rows(beats, times, panels):
+        """
+        Sorts rows by time and merges rows sharing a timestamp.
+        """
+        order = np.argsort(times, kind='stable')
+        beats, times, panels = beats[order], times[order], panels[order]
+        if len(times) == 0:
+            return beats, times, panels
+        starts = np.flatnonzero(np.concatenate(([True], times[1:] != times[:-1])))
+        return beats[starts], times[starts], np.logical_or.reduceat(panels, starts, axis=0)
+
+    def _rank_weight_sums(self, n: int) -> np.ndarray:
+        """
+        Returns the prefix sums of the rank weights `arange(n) ** alpha`, with a
+        leading zero, cached across calls.
+        """
+        if len(self._weight_sums) <= n:
+            size = max(n, 2 * len(self._weight_sums))
+            weights = np.power(np.arange(size), self.alpha).astype(float)
+            self._weight_sums = np.concatenate(([0.0], np.cumsum(weights)))
+        return self._weight_sums[:n + 1]
+
+    def _weighted_harmonic_average(self, histogram: Counter) -> float:
+        """
+        `VerticalDensity._weighted_harmonic_average` over a histogram of deltas.
+
+        Equal deltas occupy consecutive ranks, so each bin contributes the sum
+        of the weights of its ranks.
+        """
+        keys = np.fromiter(histogram.keys(), dtype=float, count=len(histogram))
+        counts = np.fromiter(histogram.values(), dtype=np.int64, count=len(histogram))
+        keep = (counts > 0) & (keys / self._scale > 1e-6)
+        if not keep.any():
+            return 0
+
+        order = np.argsort(keys[keep])
+        keys, counts = keys[keep][order] / self._scale, counts[keep][order]
+        ends = np.cumsum(counts)
+        weight_sums = self._rank_weight_sums(ends[-1])
+        bin_weights = weight_sums[ends] - weight_sums[ends - counts]
+        if weight_sums[-1] <= 0:
+            return 0
+        return weight_sums[-1] / np.sum(bin_weights / keys)
+
+    def _delta_keys(self, times: np.ndarray) -> list:
+        """
+        Time deltas between consecutive timestamps, in units of the rounding resolution.
+        """
+        return np.rint(np.diff(times) * self._scale).astype(np.int64).tolist()
+
+    def _orientation_matrix(self, panels: np.ndarray) -> np.ndarray:
+        """
+        Stacks the orientation masks of `VerticalDensity` into a matrix, one column each.
+        """
+        masks = orientation_masks(panels.reshape(-1, self.num_panels))
+        self.orientations = list(masks.keys())
+        return np.column_stack(list(masks.values())).reshape(len(panels), len(masks))
+
+    def _rebuild(self):
+        """
+        Recomputes every accumulator from the columnar arrays.
+        """
+        self._orientations = self._orientation_matrix(self.panels)
+        self._close, self._jacks, self._crossed = self._pair_events(0, max(len(self.times) - 1, 0))
+        self._close_total = int(self._close.sum())
+        self._jack_total = int(self._jacks.sum())
+        self._crossed_total = int(self._crossed.sum())
+
+        runs = _true_runs(self._close)
+        self._run_lengths = Counter(runs.tolist())
+        self._run_total = len(runs)
+
+        self._buckets = {}
+        self._update_buckets(np.unique(np.floor_divide(self.times, 1.0)))
+        self._deltas = [Counter(self._delta_keys(self.times[self._orientations[:, o]]))
+                        for o in range(self._orientations.shape[1])]
+        if self.pattern_histogram is not None:
+            self._pattern_counts = self._bucket_counts(self.panels)
+
+    def _bucket_counts(self, panels: np.ndarray) -> np.ndarray:
+        """
+        Counts the patterns of consecutive rows in each bucket of the pattern histogram.
+        """
+        return self.pattern_histogram.bucket_counts(panels, np.array([0, len(panels)]))[0]
+
+    def _splice(self, a: int, b: int, beats, times, panels):
+        """
+        Replaces rows `[a, b)` with new rows that fit between their neighbours,
+        updating only the accumulators around them.
+        """
+        n = len(self.times)
+        delta = len(times) - (b - a)
+        new_orientations = self._orientation_matrix(panels)
+
+        # Pairs whose events can change: from the row before the edit up to the
+        # first non-empty row after it, which anchors the carried centre of mass.
+        # PatternDetector ignores row 0, so the anchor must not become row 0.
+        first_pair = max(a - 1, 0)
+        anchor = _first_true(self._orientations[:, -1:], max(b, 1, 1 - delta))[0]
+        old_pair_end = max(min(anchor, n - 1), first_pair)
+        start_com = self._carried_com(first_pair)
+
+        # Stream runs touching those pairs, widened to whole runs
+        breaks = ~self._close[:, None]
+        run_start = _last_true(breaks, first_pair)[0] + 1
+        run_end = _first_true(breaks, old_pair_end)[0]
+        old_runs = _true_runs(self._close[run_start:run_end])
+
+        # Orientation deltas between the neighbours of the edited rows
+        prev_rows = _last_true(self._orientations, a)
+        next_rows = _first_true(self._orientations, b)
+        old_deltas, new_deltas = [], []
+        for o in range(self._orientations.shape[1]):
+            head = self.times[prev_rows[o]:prev_rows[o] + 1] if prev_rows[o] >= 0 else times[:0]
+            tail = self.times[next_rows[o]:next_rows[o] + 1]
+            old_deltas.append(self._delta_keys(np.concatenate(
+                (head, self.times[a:b][self._orientations[a:b, o]], tail))))
+            new_deltas.append(self._delta_keys(np.concatenate((head, times[new_orientations[:, o]], tail))))
+
+        buckets = np.unique(np.floor_divide(np.concatenate((self.times[a:b], times)), 1.0))
+
+        # Patterns overlapping the edit: those within the ngram - 1 rows with
+        # notes on either side of it (empty rows do not count towards patterns)
+        if self.pattern_histogram is not None:
+            before, after = _nearest_true(self._orientations[:, -1], a, b, self.pattern_histogram.ngram - 1)
+            head, tail = self.panels[before], self.panels[after]
+            self._pattern_counts += (self._bucket_counts(np.concatenate((head, panels, tail)))
+                                     - self._bucket_counts(np.concatenate((head, self.panels[a:b], tail))))
+
+        self.beats = np.concatenate((self.beats[:a], beats, self.beats[b:]))
+        self.times = np.concatenate((self.times[:a], times, self.times[b:]))
+        self.panels = np.concatenate((self.panels[:a], panels, self.panels[b:]))
+        self._orientations = np.concatenate((self._orientations[:a], new_orientations, self._orientations[b:]))
+
+        new_pair_end = max(min(anchor + delta, len(self.times) - 1), first_pair)
+        close, jacks, crossed = self._pair_events(first_pair, new_pair_end, start_com)
+        self._close_total += int(close.sum()) - int(self._close[first_pair:old_pair_end].sum())
+        self._jack_total += int(jacks.sum()) - int(self._jacks[first_pair:old_pair_end].sum())
+        self._crossed_total += int(crossed.sum()) - int(self._crossed[first_pair:old_pair_end].sum())
+        self._close = np.concatenate((self._close[:first_pair], close, self._close[old_pair_end:]))
+        self._jacks = np.concatenate((self._jacks[:first_pair], jacks, self._jacks[old_pair_end:]))
+        self._crossed = np.concatenate((self._crossed[:first_pair], crossed, self._crossed[old_pair_end:]))
+
+        new_runs = _true_runs(self._close[run_start:run_end + delta])
+        self._update_histogram(self._run_lengths, old_runs.tolist(), new_runs.tolist())
+        self._run_total += len(new_runs) - len(old_runs)
+
+        self._update_buckets(buckets)
+        for histogram, removed, added in zip(self._deltas, old_deltas, new_deltas):
+            self._update_histogram(histogram, removed, added)
+
+    @staticmethod
+    def _update_histogram(histogram: Counter, removed: list, added: list):
+        """
+        Moves values out of and into a histogram, dropping emptied bins.
+        """
+        histogram.subtract(removed)
+        histogram.update(added)
+        for key in removed:
+            if histogram.get(key, 1) <= 0:
+                del histogram[key]
+
+    def _carried_com(self, row: int) -> float:
+        """
+        Centre of mass carried into `row` by `PatternDetector`: that of the last
+        non-empty row in `[1, row)`, or 0 if there is none.
+        """
+        earlier = _last_true(self._orientations[:row, -1:], row)[0]
+        if earlier < 1:
+            return 0.0
+        return centers_of_mass(self.panels[earlier:earlier + 1])[0]
+
+    def _pair_events(self, lo: int, hi: int, start_com: float = 0.0):
+        """
+        Computes the stream, jack and crossover events of pairs `[lo, hi)`,
+        where pair `k` joins rows `k` and `k + 1`. `start_com` is the centre of
+        mass carried into row `lo`.
+        """
+        if hi <= lo:
+            return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+
+        times, panels = self.times[lo:hi + 1], self.panels[lo:hi + 1]
+        timedeltas = np.diff(times)
+        close = timedeltas <= self.stream_threshold
+        jacks = np.where(timedeltas <= self.jack_threshold, (panels[1:] & panels[:-1]).sum(axis=1), 0)
+
+        # PatternDetector never looks at the first row and starts from a centre
+        # of mass of 0, carrying it forward over empty rows
+        com = centers_of_mass(panels)
+        if lo == 0:
+            com[0] = np.nan
+
+        filled = np.maximum.accumulate(np.where(np.isnan(com), -1, np.arange(len(com))))
+        carried = np.where(filled >= 0, com[np.maximum(filled, 0)], start_com)
+        previous, current = carried[:-1], carried[1:]
+        midline = (self.num_panels - 1) / 2.0
+        crossed = ((previous > midline) & (current < midline)) | ((previous < midline) & (current > midline))
+        return close, jacks, crossed
+
+    def _update_buckets(self, buckets: Iterable[float]):
+        """
+        Recomputes the `HorizontalDensity` note count of each given second.
+        """
+        for bucket in buckets:
+            lo = np.searchsorted(self.times, bucket, side='left')
+            hi = np.searchsorted(self.times, bucket + 1.0, side='left')
+            if hi == lo:
+                self._buckets.pop(bucket, None)
+                continue
+
+            # Each second is represented by its last run of equal note counts
+            counts = self.panels[lo:hi].sum(axis=1)
+            changes = np.flatnonzero(counts != counts[-1])
+            run = len(counts) - (changes[-1] + 1 if len(changes) else 0)
+            self._buckets[bucket] = int(counts[-1]) * run
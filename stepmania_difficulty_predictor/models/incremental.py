@@ -0,0 +1,47 @@
+import copy
+import time
+from typing import Optional, Tuple
+
+def update_forest(model, X, y, n_trees: int = 50, retire: int = 0, time_budget: Optional[float] = None,
+                  step: int = 5) -> Tuple[object, int, int]:
+    """
+    Grows a copy of a fitted forest regressor with trees trained on new data.
+
+    New trees are fitted on `X` and `y` only, with `warm_start`, `step` trees
+    at a time. With a `time_budget`, growing stops before a step that would
+    exceed it, based on the time the previous steps took; the first step is
+    always taken. Afterwards, up to `retire` of the model's original trees,
+    the oldest first, are removed, so older data gradually loses weight.
+
+    Args:
+        model: The fitted forest, e.g. a `RandomForestRegressor`. It is not modified.
+        X: The new feature rows, with the model's training columns.
+        y: The new targets.
+        n_trees: Maximum number of trees to add.
+        retire: Number of the oldest original trees to remove.
+        time_budget: Maximum time to spend adding trees, in seconds.
+        step: Number of trees added per `fit` call.
+
+    Returns:
+        A tuple `(updated_model, trees_added, trees_retired)`.
+    """
+    updated = copy.deepcopy(model)
+    original_trees = len(updated.estimators_)
+
+    start = time.perf_counter()
+    added = 0
+    updated.set_params(warm_start=True)
+    while added < n_trees:
+        k = min(step, n_trees - added)
+        elapsed = time.perf_counter() - start
+        if time_budget is not None and added and elapsed + elapsed / added * k > time_budget:
+            break
+        updated.set_params(n_estimators=len(updated.estimators_) + k)
+        updated.fit(X, y)
+        added += k
+
+    retired = min(retire, original_trees)
+    if retired:
+        updated.estimators_ = updated.estimators_[retired:]
+    updated.set_params(n_estimators=len(updated.estimators_), warm_start=False)
+    return updated, added, retired
@@ -0,0 +1,307 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+META_NAME = 'meta.json'
+
+# The prediction fields whose distribution is indexed
+FIELDS = ['predicted_difficulty', 'meter']
+
+class ModeRanks:
+    """
+    The sorted predicted difficulties and meters of one mode, stored in one directory.
+
+    Each field has a sorted float64 file, memory-mapped when the index is
+    opened, and an append-only buffer of values inserted since the last
+    merge, kept sorted in memory. A value's rank is found with one binary
+    search in each. When the buffer outgrows `merge_fraction` of the sorted
+    file, the two are merged into a new sorted file. The metadata file is
+    written last on every change, so an interrupted insert or merge leaves
+    the previous index intact.
+    """
+    def __init__(self, path: str, merge_fraction: float = 0.05):
+        """
+        Opens the ranks stored at `path`, creating empty ones if they do not exist.
+
+        Args:
+            path: The mode's directory.
+            merge_fraction: Size of the buffer, relative to the sorted
+                            values, at which the two are merged.
+        """
+        self.path = path
+        self.merge_fraction = merge_fraction
+        if not os.path.exists(os.path.join(path, META_NAME)):
+            os.makedirs(path, exist_ok=True)
+            self._write_meta({'generation': 0, 'rows': {field: 0 for field in FIELDS},
+                              'buffer_rows': {field: 0 for field in FIELDS}})
+        self._load()
+
+    def _load(self):
+        """
+        Reads the metadata, maps the sorted files and sorts the buffers.
+        """
+        with open(os.path.join(self.path, META_NAME), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.sorted: Dict[str, np.ndarray] = {}
+        self.buffers: Dict[str, np.ndarray] = {}
+        for field in FIELDS:
+            rows = self.meta['rows'][field]
+            self.sorted[field] = (np.memmap(self._sorted_path(field, self.meta['generation']), dtype=np.float64,
+                                            mode='r', shape=(rows,)) if rows else np.empty(0))
+            buffer_rows = self.meta['buffer_rows'][field]
+            buffer = np.empty(0)
+            if buffer_rows:
+                buffer = np.fromfile(self._buffer_path(field), dtype=np.float64, count=buffer_rows)
+            self.buffers[field] = np.sort(buffer)
+
+    def size(self, field: str = 'predicted_difficulty') -> int:
+        """
+        The number of values indexed for a field.
+        """
+        return len(self.sorted[field]) + len(self.buffers[field])
+
+    def insert(self, values: Dict[str, np.ndarray]) -> Counter:
+        """
+        Inserts values, merging the buffers into the sorted files when they are full.
+
+        Args:
+            values: Maps fields to arrays of values. Missing and infinite
+                    values are skipped.
+
+        Returns:
+            A Counter of the values inserted per field.
+        """
+        inserted = Counter()
+        buffer_rows = dict(self.meta['buffer_rows'])
+        buffers = dict(self.buffers)
+        for field, field_values in values.items():
+            field_values = np.asarray(field_values, dtype=np.float64).ravel()
+            field_values = field_values[np.isfinite(field_values)]
+            if not len(field_values):
+                continue
+            # The buffer file may hold the tail of an insert that never reached the metadata
+            with open(self._buffer_path(field), 'ab') as f:
+                f.truncate(buffer_rows[field] * 8)
+                f.write(field_values.tobytes())
+            buffer_rows[field] += len(field_values)
+            buffers[field] = np.sort(np.concatenate([buffers[field], np.sort(field_values)]), kind='stable')
+            inserted[field] = len(field_values)
+        if not inserted:
+            return inserted
+
+        self.meta = {**self.meta, 'buffer_rows': buffer_rows}
+        self._write_meta(self.meta)
+        self.buffers = buffers
+        if any(len(self.buffers[field]) > self.merge_fraction * len(self.sorted[field]) for field in FIELDS):
+            self.merge()
+        return inserted
+
+    def merge(self):
+        """
+        Merges the buffers into new sorted files.
+        """
+        generation = self.meta['generation'] + 1
+        rows = {}
+        for field in FIELDS:
+            # Both parts are sorted, so the stable sort only merges two runs
+            merged = np.sort(np.concatenate([self.sorted[field], self.buffers[field]]), kind='stable')
+            merged.tofile(self._sorted_path(field, generation))
+            rows[field] = len(merged)
+
+        old_generation = self.meta['generation']
+        self._write_meta({'generation': generation, 'rows': rows, 'buffer_rows': {field: 0 for field in FIELDS}})
+        self._load()
+        for field in FIELDS:
+            if os.path.exists(self._sorted_path(field, old_generation)):
+                os.remove(self._sorted_path(field, old_generation))
+
+    def count_below(self, values: np.ndarray, field: str = 'predicted_difficulty',
+                    inclusive: bool = False) -> np.ndarray:
+        """
+        Counts the indexed values below each query value.
+
+        Args:
+            values: The query values.
+            field: The field to count in.
+            inclusive: Also count the indexed values equal to the query value.
+        """
+        side = 'right' if inclusive else 'left'
+        return (np.searchsorted(self.sorted[field], values, side=side)
+                + np.searchsorted(self.buffers[field], values, side=side))
+
+    def _sorted_path(self, field: str, generation: int) -> str:
+        return os.path.join(self.path, f"{field}.{generation}.f64")
+
+    def _buffer_path(self, field: str) -> str:
+        return os.path.join(self.path, f"{field}.buffer.f64")
+
+    def _write_meta(self, meta: dict):
+        meta_path = os.path.join(self.path, META_NAME)
+        with open(f"{meta_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+class PercentileIndex:
+    """
+    Ranks predicted difficulties and meters within a whole catalogue, per mode.
+
+    The index holds one `ModeRanks` per mode. It is filled from the output
+    of `predict_batch` or `iter_predict` (`add_predictions`), or from the
+    predictions CSV of `BulkScorer` (`add_scores`), and answers percentile
+    and rank queries for one value or a batch with binary searches, without
+    reading the catalogue.
+    """
+    def __init__(self, path: str, merge_fraction: float = 0.05):
+        """
+        Opens the index stored at `path`, creating an empty one if it does not exist.
+
+        Args:
+            path: The index directory, holding one subdirectory per mode.
+            merge_fraction: Size of a mode's insert buffer, relative to its
+                            sorted values, at which the two are merged.
+        """
+        self.path = path
+        self.merge_fraction = merge_fraction
+        os.makedirs(path, exist_ok=True)
+        self.modes: Dict[str, ModeRanks] = {
+            mode: ModeRanks(os.path.join(path, mode), merge_fraction) for mode in sorted(os.listdir(path))
+            if os.path.exists(os.path.join(path, mode, META_NAME))
+        }
+
+    @classmethod
+    def build(cls, scores_path: str, path: str, chunk_size: int = 100000,
+              merge_fraction: float = 0.05) -> 'PercentileIndex':
+        """
+        Builds a new index from a predictions CSV, replacing any index at `path`.
+        """
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        # Merging once at the end sorts every value a single time
+        index = cls(path, merge_fraction=float('inf'))
+        index.add_scores(scores_path, chunk_size)
+        for mode_ranks in index.modes.values():
+            mode_ranks.merge()
+            mode_ranks.merge_fraction = merge_fraction
+        index.merge_fraction = merge_fraction
+        return index
+
+    def insert(self, mode: str, predicted_difficulties: Sequence[float],
+               meters: Optional[Sequence[float]] = None) -> Counter:
+        """
+        Inserts the predicted difficulties, and optionally meters, of charts of a mode.
+
+        Returns:
+            A Counter of the values inserted per field.
+        """
+        if mode not in self.modes:
+            self.modes[mode] = ModeRanks(os.path.join(self.path, mode), self.merge_fraction)
+        values = {'predicted_difficulty': predicted_difficulties}
+        if meters is not None:
+            values['meter'] = meters
+        return self.modes[mode].insert(values)
+
+    def add_predictions(self, batch_predictions: Iterable[list]) -> Counter:
+        """
+        Inserts the predictions of `predict_batch`, or the results of `iter_predict`.
+
+        Args:
+            batch_predictions: Lists of prediction dictionaries, or
+                               `(sm, predictions)` tuples.
+
+        Returns:
+            A Counter of the charts inserted per mode.
+        """
+        by_mode: Dict[str, List[dict]] = {}
+        for predictions in batch_predictions:
+            if isinstance(predictions, tuple):
+                predictions = predictions[1]
+            for prediction in predictions:
+                by_mode.setdefault(prediction['mode'], []).append(prediction)
+
+        inserted = Counter()
+        for mode, predictions in by_mode.items():
+            counts = self.insert(mode, [p['predicted_difficulty'] for p in predictions],
+                                 [np.nan if p.get('meter') is None else p['meter'] for p in predictions])
+            inserted[mode] = counts['predicted_difficulty']
+        return inserted
+
+    def add_scores(self, scores: Union[str, pd.DataFrame], chunk_size: int = 100000) -> Counter:
+        """
+        Inserts the predictions of `BulkScorer`, from its CSV or a DataFrame.
+
+        Args:
+            scores: Predictions with `mode`, `predicted_difficulty` and
+                    optionally `meter` columns.
+            chunk_size: Number of CSV rows read at a time.
+
+        Returns:
+            A Counter of the charts inserted per mode.
+        """
+        chunks = [scores] if isinstance(scores, pd.DataFrame) else pd.read_csv(scores, chunksize=chunk_size,
+                                                                                encoding='utf-8')
+        inserted = Counter()
+        for chunk in chunks:
+            for mode, block in chunk.groupby('mode', sort=False):
+                counts = self.insert(mode, block['predicted_difficulty'].to_numpy(),
+                                     block['meter'].to_numpy() if 'meter' in block.columns else None)
+                inserted[mode] += counts['predicted_difficulty']
+        return inserted
+
+    def percentile(self, mode: str, values: Union[float, Sequence[float]],
+                   field: str = 'predicted_difficulty') -> Union[float, np.ndarray]:
+        """
+        The percentile rank of values within a mode's catalogue.
+
+        A value's percentile is the percentage of indexed values below it,
+        counting values equal to it as half below, so that the middle of a
+        tie gets the same percentile however many charts share it.
+
+        Args:
+            mode: The game mode whose catalogue to rank in.
+            values: One value or a sequence of them.
+            field: `'predicted_difficulty'` or `'meter'`.
+
+        Returns:
+            The percentile, from 0 to 100, of each value; a float for a
+            single value. NaN if the mode has no indexed values.
+
+        Raises:
+            KeyError: If the mode is not indexed.
+        """
+        mode_ranks = self.modes[mode]
+        queries = np.asarray(values, dtype=np.float64)
+        size = mode_ranks.size(field)
+        below = mode_ranks.count_below(queries, field) + mode_ranks.count_below(queries, field, inclusive=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            percentiles = np.where(np.isnan(queries), np.nan, 50.0 * below / size)
+        return float(percentiles) if percentiles.ndim == 0 else percentiles
+
+    def rank(self, mode: str, values: Union[float, Sequence[float]],
+             field: str = 'predicted_difficulty') -> Union[int, np.ndarray]:
+        """
+        The rank of values within a mode's catalogue, 1 being the hardest.
+
+        A value ranks after every indexed value above it, and ties with the
+        indexed values equal to it.
+
+        Returns:
+            The rank of each value; an int for a single value.
+
+        Raises:
+            KeyError: If the mode is not indexed.
+        """
+        mode_ranks = self.modes[mode]
+        queries = np.asarray(values, dtype=np.float64)
+        ranks = mode_ranks.size(field) - mode_ranks.count_below(queries, field, inclusive=True) + 1
+        return int(ranks) if ranks.ndim == 0 else ranks
+
+    def merge(self):
+        """
+        Merges the insert buffers of every mode into their sorted files.
+        """
+        for mode_ranks in self.modes.values():
+            mode_ranks.merge()
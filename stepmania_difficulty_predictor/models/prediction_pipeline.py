@@ -2,21 +2,34 @@ import pickle
 import pandas as pd
 import simfile
 import os
-from typing import Union, List, Dict
+import numpy as np
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Union, List, Dict, Iterable, Iterator, Optional, Tuple
 
 # Add the project root to the Python path
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from stepmania_difficulty_predictor.data.SMChartPreprocessor import SMChartPreprocessor
-from stepmania_difficulty_predictor.features.HorizontalDensity import HorizontalDensity
-from stepmania_difficulty_predictor.features.VerticalDensity import VerticalDensity
-from stepmania_difficulty_predictor.features.StreamDetector import StreamDetector
-from stepmania_difficulty_predictor.features.PatternDetector import PatternDetector
+from stepmania_difficulty_predictor.data.dataset_pipeline import preprocess_source
+from stepmania_difficulty_predictor.data.supervisor import FileBudget, FileSupervisor
+from stepmania_difficulty_predictor.features.FeatureExtractor import FeatureExtractor
+from stepmania_difficulty_predictor.features.WindowedFeatures import WindowedFeatureExtractor
+from stepmania_difficulty_predictor.features.MultiRateFeatures import MultiRateFeatureExtractor
+from stepmania_difficulty_predictor.models.edit_session import ChartEditSession
+from stepmania_difficulty_predictor.models.tiered_forest import TieredForest, TIER_FULL
 
 # Get the path to the packaged models directory
 DEFAULT_MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model')
 
+# Subdirectory of the model directory holding the optional distilled first-tier models
+DISTILLED_DIR = 'distilled'
+
+# Marks the end of the inputs of `iter_predict`
+_EXHAUSTED = object()
+
 class ModeAgnosticDifficultyPredictor:
     """
     A class to predict the difficulty of StepMania (.sm) files for any game mode.
@@ -24,22 +37,66 @@ class ModeAgnosticDifficultyPredictor:
     This class provides a high-level interface for predicting chart difficulty.
     It automatically loads all available trained models and selects the appropriate
     one based on the chart's mode.
+
+    With a `tolerance`, forest models are evaluated in tiers (see `TieredForest`):
+    trees are scored in chunks until the prediction is known to within the
+    tolerance, after an optional distilled first tier, and each prediction
+    reports the `tier` that produced it and the number of `trees` evaluated.
     """
-    def __init__(self, model_dir: str = DEFAULT_MODEL_DIR):
+    def __init__(self, model_dir: str = DEFAULT_MODEL_DIR, tolerance: Optional[float] = None,
+                 chunk_size: int = 40, file_budget: Optional[FileBudget] = None):
         """
         Initializes the ModeAgnosticDifficultyPredictor.
 
         This method scans the specified directory for model files (e.g., 'dance-single.p')
-        and loads them into a dictionary.
+        and loads them into a dictionary. Distilled first-tier models are loaded
+        from its `distilled` subdirectory when present.
+
+        Args:
+            model_dir: Directory holding one model file per mode.
+            tolerance: Enables tiered inference, stopping once a prediction's
+                       confidence interval half-width is within this many meters.
+            chunk_size: Number of trees evaluated between early-exit checks.
+            file_budget: Per-file time and memory limits. When set, simfile
+                         paths given to `predict_batch` are parsed and
+                         preprocessed in supervised worker processes, and
+                         files exceeding the budget are skipped and quarantined.
+                         The workers are kept until `close` is called.
         """
         self.models = self._load_models(model_dir)
         print(f"Loaded {len(self.models)} models for modes: {list(self.models.keys())}")
 
+        self.tolerance = tolerance
+        self.chunk_size = chunk_size
+        distilled_dir = os.path.join(model_dir, DISTILLED_DIR)
+        self.distilled_models = self._load_models(distilled_dir) if os.path.isdir(distilled_dir) else {}
+        self._tiered_models = {}
+        self.file_budget = file_budget
+        self._supervisor = FileSupervisor(preprocess_source, file_budget) if file_budget is not None else None
+
+        # Models trained with hashed pattern features (see `PatternHistogram`) name them pattern_<i>
+        pattern_buckets = max((sum(str(col).startswith('pattern_') for col in getattr(model, 'feature_names_in_', []))
+                               for model in self.models.values()), default=0)
+
         self.preprocessor = SMChartPreprocessor()
-        self.horizontal_density = HorizontalDensity(alpha=3)
-        self.vertical_density = VerticalDensity(alpha=3)
-        self.stream_detector = StreamDetector()
-        self.pattern_detector = PatternDetector()
+        self._thread_state = threading.local()
+        self.feature_extractor = FeatureExtractor(alpha=3, pattern_buckets=pattern_buckets)
+        self.windowed_feature_extractor = WindowedFeatureExtractor(alpha=3, pattern_buckets=pattern_buckets)
+        self.multi_rate_feature_extractor = MultiRateFeatureExtractor(alpha=3, decimals=self.preprocessor.decimals,
+                                                                      pattern_buckets=pattern_buckets)
+
+    def close(self):
+        """
+        Stops the supervised worker processes started for the `file_budget`.
+        """
+        if self._supervisor is not None:
+            self._supervisor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def _load_models(self, model_dir: str) -> Dict[str, any]:
         """
@@ -60,30 +117,138 @@ class ModeAgnosticDifficultyPredictor:
                     print(f"Error loading model for mode '{mode}': {e}")
         return models
 
-    def predict(self, sm: Union[str, simfile.Simfile], include_features: bool = False) -> list:
+    def predict(self, sm: Union[str, simfile.Simfile], include_features: bool = False,
+                rates: Optional[List[float]] = None) -> list:
         """
         Predicts the difficulty of all charts in a .sm file or simfile object.
         """
-        return self.predict_batch([sm], include_features=include_features)[0]
+        return self.predict_batch([sm], include_features=include_features, rates=rates)[0]
 
-    def predict_batch(self, sms: List[Union[str, simfile.Simfile]], include_features: bool = False) -> List[list]:
+    def predict_batch(self, sms: List[Union[str, simfile.Simfile]], include_features: bool = False,
+                      rates: Optional[List[float]] = None) -> List[list]:
         """
         Predicts the difficulty for a batch of .sm files or simfile objects.
+
+        The features of every chart in the batch are computed together with
+        `FeatureExtractor.compute_batch`. Each prediction holds the chart's
+        mode, difficulty and meter, its `chart_index` among the simfile's
+        charts, and its `predicted_difficulty`.
+
+        With `rates`, every chart is also scored at each music rate (e.g.
+        `[0.8, 0.9, ..., 2.0]`), reported in a `rates` dictionary mapping each
+        rate to its predicted difficulty. See `_predict_batch_rates`.
         """
-        batch_predictions = []
-        for sm in sms:
-            try:
-                if isinstance(sm, str):
-                    sm_file = simfile.open(sm, strict=False)
+        return self._predict_preprocessed(list(self._iter_preprocessed(sms)), include_features, rates)
+
+    def iter_predict(self, sms: Iterable[Union[str, simfile.Simfile]], include_features: bool = False,
+                     rates: Optional[List[float]] = None, max_in_flight: int = 16, ordered: bool = True,
+                     workers: int = 4, cancel: Optional[threading.Event] = None
+                     ) -> Iterator[Tuple[Union[str, simfile.Simfile], list]]:
+        """
+        Predicts the difficulty of a stream of .sm files or simfile objects.
+
+        Inputs are taken from `sms` only as fewer than `max_in_flight` of them
+        are being preprocessed or waiting to be yielded, so any iterable,
+        including an unbounded one, can be scored in bounded memory. Simfiles
+        are parsed and preprocessed by `workers` threads; those that are done
+        are scored together, as by `predict_batch`, and yielded.
+
+        With a `file_budget`, inputs are instead preprocessed `max_in_flight`
+        at a time in supervised worker processes, and always yielded in order.
+
+        Closing the generator, or setting `cancel`, stops it: queued inputs
+        are dropped and no further inputs are taken. Simfiles already being
+        parsed are finished in the background and discarded.
+
+        Args:
+            sms: Any iterable of .sm file paths or simfile objects.
+            include_features: Include each chart's feature vector, as in `predict`.
+            rates: Music rates to score each chart at, as in `predict_batch`.
+            max_in_flight: Maximum number of inputs taken but not yet yielded.
+            ordered: Yield results in input order; otherwise as they finish.
+            workers: Number of preprocessing threads.
+            cancel: An event that stops the generator when set.
+
+        Yields:
+            `(sm, predictions)` for every input, with `predictions` as from `predict`.
+        """
+        sms = iter(sms)
+        if self.file_budget is not None:
+            while cancel is None or not cancel.is_set():
+                chunk = list(islice(sms, max_in_flight))
+                if not chunk:
+                    return
+                batch = list(self._iter_preprocessed(chunk))
+                for result in zip(chunk, self._predict_preprocessed(batch, include_features, rates)):
+                    if cancel is not None and cancel.is_set():
+                        return
+                    yield result
+            return
+
+        executor = ThreadPoolExecutor(max(workers, 1))
+        pending = {}
+        finished = {}
+        taken = next_index = 0
+        exhausted = False
+        try:
+            while cancel is None or not cancel.is_set():
+                while not exhausted and len(pending) + len(finished) < max_in_flight:
+                    sm = next(sms, _EXHAUSTED)
+                    if sm is _EXHAUSTED:
+                        exhausted = True
+                    else:
+                        pending[executor.submit(self._preprocess_one, sm)] = (taken, sm)
+                        taken += 1
+                if not pending and not finished:
+                    return
+
+                if pending:
+                    done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, sm = pending.pop(future)
+                        finished[index] = (sm, future.result())
+
+                if ordered:
+                    ready = []
+                    while next_index in finished:
+                        ready.append(finished.pop(next_index))
+                        next_index += 1
                 else:
-                    sm_file = sm
-            except Exception as e:
-                print(f"Error parsing simfile: {e}")
-                batch_predictions.append([])
-                continue
+                    ready = [finished.pop(index) for index in sorted(finished)]
+                if ready:
+                    batch_predictions = self._predict_preprocessed([charts for _, charts in ready],
+                                                                   include_features, rates)
+                    for result in zip([sm for sm, _ in ready], batch_predictions):
+                        if cancel is not None and cancel.is_set():
+                            return
+                        yield result
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _predict_preprocessed(self, batch: List[Optional[List[dict]]], include_features: bool,
+                              rates: Optional[List[float]]) -> List[list]:
+        """
+        Predicts the difficulty of the preprocessed charts of a batch of simfiles.
+
+        Args:
+            batch: The preprocessed charts of each simfile, or None for
+                   simfiles that could not be preprocessed.
+            include_features: Include each chart's feature vector.
+            rates: Music rates to score each chart at, see `predict_batch`.
 
-            preprocessed_charts = self.preprocessor.preprocess(sm_file)
+        Returns:
+            The predictions of each simfile, as from `predict_batch`.
+        """
+        if rates is not None:
+            return self._predict_batch_rates(batch, include_features, rates)
+
+        batch_predictions = []
+        scored = []
+        for preprocessed_charts in batch:
             chart_predictions = []
+            batch_predictions.append(chart_predictions)
+            if preprocessed_charts is None:
+                continue
 
             for chart_data in preprocessed_charts:
                 mode = chart_data.get('mode')
@@ -95,40 +260,256 @@ class ModeAgnosticDifficultyPredictor:
                 if not chart:
                     continue
 
-                features = self._extract_features(chart, chart_data)
+                result = {
+                    'mode': mode,
+                    'difficulty': chart_data.get('difficulty'),
+                    'meter': chart_data.get('meter'),
+                    'chart_index': chart_data.get('chart_index'),
+                }
+                chart_predictions.append(result)
+                scored.append((result, chart))
+
+        # The features of every chart in the batch come from one batched pass,
+        # and the charts of each mode are scored with a single model call
+        batch_features = self.feature_extractor.compute_batch([chart for _, chart in scored])
+        rows_by_mode = {}
+        for (result, _), features in zip(scored, batch_features):
+            rows_by_mode.setdefault(result['mode'], []).append((result, features))
+
+        for mode, charts in rows_by_mode.items():
+            # Ensure the order of columns matches the training order, excluding mode
+            training_cols = self.models[mode].feature_names_in_
+            df_features = pd.DataFrame([features for _, features in charts]).reindex(columns=training_cols,
+                                                                                   fill_value=0)
+
+            if self.tolerance is not None:
+                predictions, tiers, trees = self._predict_tiered(mode, df_features)
+            else:
+                predictions = np.asarray(self.models[mode].predict(df_features))
+
+            records = df_features.to_dict('records') if include_features else None
+            for i, (result, _) in enumerate(charts):
+                result['predicted_difficulty'] = predictions[i]
+                if self.tolerance is not None:
+                    result['tier'] = tiers[i]
+                    result['trees'] = int(trees[i])
+                if include_features:
+                    result['features'] = records[i]
+
+        return batch_predictions
+
+    def predict_timeline(self, sm: Union[str, simfile.Simfile], window: float = 8.0,
+                         step: float = 4.0) -> list:
+        """
+        Predicts a difficulty curve over each chart of a .sm file or simfile object.
+
+        Features are computed for every window at once and each chart's windows are
+        scored in a single batched `predict` call. Windows with fewer than two note
+        rows are not scored and get a predicted difficulty of 0.
+
+        Args:
+            sm: Path to a simfile, or a parsed simfile object.
+            window: Length of each window in seconds.
+            step: Time between the starts of consecutive windows in seconds.
 
-                df_features = pd.DataFrame([features])
+        Returns:
+            A list with one entry per chart, holding its mode, difficulty, meter,
+            `chart_index` in the simfile and a `timeline` of `{'start', 'end', 'predicted_difficulty'}` windows.
+        """
+        sm_file = self._open_simfile(sm)
+        if sm_file is None:
+            return []
+
+        timelines = []
+        for chart_data in self.preprocessor.preprocess(sm_file):
+            mode = chart_data.get('mode')
+            chart = chart_data.get('chart', {})
+            if mode not in self.models or not chart:
+                continue
+
+            windows = self.windowed_feature_extractor.compute(chart, window=window, step=step)
+            scored = (windows['rows'] >= 2).to_numpy()
 
-                # Ensure the order of columns matches the training order, excluding mode
+            predictions = np.zeros(len(windows))
+            if scored.any():
                 training_cols = self.models[mode].feature_names_in_
-                df_features = df_features.reindex(columns=training_cols, fill_value=0)
+                df_features = windows[scored].reindex(columns=training_cols, fill_value=0)
+                df_features = df_features.replace([np.inf, -np.inf], np.nan).fillna(0)
+                predictions[scored] = self.models[mode].predict(df_features)
+
+            timelines.append({
+                'mode': mode,
+                'difficulty': chart_data.get('difficulty'),
+                'meter': chart_data.get('meter'),
+                'chart_index': chart_data.get('chart_index'),
+                'timeline': [
+                    {'start': float(start), 'end': float(end), 'predicted_difficulty': float(prediction)}
+                    for start, end, prediction in zip(windows['start'], windows['end'], predictions)
+                ]
+            })
+
+        return timelines
+
+    def edit_session(self, sm: Union[str, simfile.Simfile], chart_index: int = 0) -> ChartEditSession:
+        """
+        Opens an incremental editing session on one chart of a .sm file or simfile object.
+
+        Args:
+            sm: Path to a simfile, or a parsed simfile object.
+            chart_index: Index of the chart to edit within the simfile's charts.
+
+        Returns:
+            A `ChartEditSession` scoring the chart with the model for its mode.
+        """
+        sm_file = self._open_simfile(sm)
+        if sm_file is None:
+            raise ValueError(f"Could not open simfile: {sm}")
+
+        mode = sm_file.charts[chart_index].stepstype
+        if mode not in self.models:
+            raise ValueError(f"No model loaded for mode '{mode}'.")
+
+        return ChartEditSession(sm_file, chart_index=chart_index, model=self.models[mode],
+                                decimals=self.preprocessor.decimals)
+
+    def _predict_batch_rates(self, batch: List[Optional[List[dict]]], include_features: bool,
+                             rates: List[float]) -> List[list]:
+        """
+        Predicts every preprocessed chart of a batch at several music rates.
+
+        Each chart is parsed and preprocessed once; the features of all its
+        rates come from one batched pass of `MultiRateFeatureExtractor`. The
+        feature rows of every chart and rate are then scored with a single
+        model call per mode. `predicted_difficulty` stays the prediction at the
+        chart's native rate, so it is also computed when 1.0 is not requested.
+        """
+        rates = [float(rate) for rate in rates]
+        all_rates = rates if 1.0 in rates else rates + [1.0]
+
+        batch_predictions = []
+        rows_by_mode = {}
+        for preprocessed_charts in batch:
+            chart_predictions = []
+            batch_predictions.append(chart_predictions)
+            if preprocessed_charts is None:
+                continue
+
+            for chart_data in preprocessed_charts:
+                mode = chart_data.get('mode')
+                chart = chart_data.get('chart', {})
+                if mode not in self.models or not chart:
+                    continue
 
-                prediction = self.models[mode].predict(df_features)[0]
+                training_cols = self.models[mode].feature_names_in_
+                df_features = self.multi_rate_feature_extractor.compute(chart, all_rates)
+                df_features = df_features.reindex(columns=training_cols, fill_value=0)
 
                 result = {
                     'mode': mode,
                     'difficulty': chart_data.get('difficulty'),
                     'meter': chart_data.get('meter'),
-                    'predicted_difficulty': prediction
+                    'chart_index': chart_data.get('chart_index'),
                 }
-
                 if include_features:
-                    result['features'] = df_features.to_dict('records')[0]
-
+                    result['features'] = df_features.iloc[all_rates.index(1.0)].to_dict()
                 chart_predictions.append(result)
+                rows_by_mode.setdefault(mode, []).append((result, df_features))
 
-            batch_predictions.append(chart_predictions)
+        for mode, charts in rows_by_mode.items():
+            df_features = pd.concat([rows for _, rows in charts], ignore_index=True)
+            if self.tolerance is not None:
+                predictions, tiers, trees = self._predict_tiered(mode, df_features)
+            else:
+                predictions = np.asarray(self.models[mode].predict(df_features))
+
+            for i, (result, _) in enumerate(charts):
+                chart_rows = slice(i * len(all_rates), (i + 1) * len(all_rates))
+                by_rate = dict(zip(all_rates, predictions[chart_rows].tolist()))
+                result['predicted_difficulty'] = by_rate[1.0]
+                result['rates'] = {rate: by_rate[rate] for rate in rates}
+                if self.tolerance is not None:
+                    result['tier'] = tiers[chart_rows][all_rates.index(1.0)]
+                    result['trees'] = int(trees[chart_rows][all_rates.index(1.0)])
 
         return batch_predictions
 
-    def _extract_features(self, chart: dict, chart_data: dict) -> dict:
+    def _predict_tiered(self, mode: str, df_features: pd.DataFrame):
+        """
+        Predicts feature rows with the tiered forest for a mode.
+
+        Models that are not forests are evaluated in full and reported as such.
+
+        Returns:
+            A tuple `(predictions, tiers, trees)`, as from `TieredForest.predict`.
+        """
+        model = self.models[mode]
+        cached_model, tiered = self._tiered_models.get(mode, (None, None))
+        if cached_model is not model:
+            tiered = TieredForest.from_model(model, self.distilled_models.get(mode),
+                                             chunk_size=self.chunk_size, tolerance=self.tolerance)
+            self._tiered_models[mode] = (model, tiered)
+
+        if tiered is None:
+            n_trees = len(getattr(model, 'estimators_', []))
+            return (np.asarray(model.predict(df_features)), np.full(len(df_features), TIER_FULL, dtype=object),
+                    np.full(len(df_features), n_trees))
+        return tiered.predict(df_features.to_numpy())
+
+    def _iter_preprocessed(self, sms: List[Union[str, simfile.Simfile]]):
         """
-        Extracts a feature vector from a single chart.
+        Preprocesses a batch of .sm files or simfile objects, in order.
+
+        With a `file_budget`, paths are preprocessed in supervised workers;
+        simfile objects are always preprocessed here.
+
+        Yields:
+            The list of preprocessed charts of each simfile, or None for
+            simfiles that could not be opened or exceeded the budget.
         """
-        h_density = self.horizontal_density.compute(chart)
-        v_density = self.vertical_density.compute(chart)
-        stream = self.stream_detector.compute(chart)
-        pattern = self.pattern_detector.compute(chart)
+        paths = [sm for sm in sms if isinstance(sm, str)]
+        supervised = iter(())
+        if self.file_budget is not None and paths:
+            supervised = self._supervisor.map(paths)
+
+        for sm in sms:
+            if self.file_budget is not None and isinstance(sm, str):
+                _, preprocessed_charts, error = next(supervised)
+                if error is not None:
+                    print(f"Error processing {sm}: {error}", file=sys.stderr)
+                yield preprocessed_charts
+                continue
+
+            sm_file = self._open_simfile(sm)
+            yield None if sm_file is None else self.preprocessor.preprocess(sm_file)
 
-        # We don't include meter or mode here as they are not features for the model
-        return {**h_density, **v_density, **stream, **pattern}
+    def _preprocess_one(self, sm: Union[str, simfile.Simfile]) -> Optional[List[dict]]:
+        """
+        Preprocesses one .sm file or simfile object in a preprocessing thread of `iter_predict`.
+
+        Each thread keeps its own preprocessor, and so its own timing table
+        cache. Errors are reported and the simfile is skipped.
+        """
+        preprocessor = getattr(self._thread_state, 'preprocessor', None)
+        if preprocessor is None:
+            preprocessor = self._thread_state.preprocessor = SMChartPreprocessor(decimals=self.preprocessor.decimals)
+        sm_file = self._open_simfile(sm)
+        if sm_file is None:
+            return None
+        try:
+            return preprocessor.preprocess(sm_file)
+        except Exception as e:
+            print(f"Error processing {sm if isinstance(sm, str) else getattr(sm, 'title', 'simfile')}: {e}",
+                  file=sys.stderr)
+            return None
+
+    def _open_simfile(self, sm: Union[str, simfile.Simfile]) -> Optional[simfile.Simfile]:
+        """
+        Opens a simfile from a path, passing simfile objects through unchanged.
+        """
+        try:
+            if isinstance(sm, str):
+                return simfile.open(sm, strict=False)
+            return sm
+        except Exception as e:
+            print(f"Error parsing simfile: {e}")
+            return None
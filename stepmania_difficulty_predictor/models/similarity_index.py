@@ -0,0 +1,311 @@
+import os
+import json
+import shutil
+import joblib
+import numpy as np
+import pandas as pd
+from collections import Counter
+from sklearn.neighbors import KDTree
+from typing import Dict, List, Mapping, Optional, Sequence
+
+from stepmania_difficulty_predictor.models.bulk_scoring import PASSTHROUGH_COLUMNS
+
+META_NAME = 'meta.json'
+
+def _clean(values: np.ndarray) -> np.ndarray:
+    """
+    Casts feature values to float32, with missing and infinite values set to 0 as for prediction.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    return np.where(np.isfinite(values), values, np.float32(0))
+
+class ModeIndex:
+    """
+    The nearest-neighbour index of one mode's charts, stored in one directory.
+
+    Raw feature vectors, meters and chart ids live in append-only files that
+    are memory-mapped when the index is opened. A KD-tree over the
+    standardized vectors covers the rows present at the last `rebuild` and
+    is memory-mapped too; rows appended since then are scanned directly, so
+    appending costs no more than writing the new rows. The standardization
+    is fixed at each rebuild.
+    """
+    def __init__(self, path: str):
+        """
+        Opens the index stored at `path`.
+        """
+        self.path = path
+        self._rows_by_id = None
+        self._load()
+
+    def _load(self):
+        """
+        Reads the metadata and maps the files of the index.
+        """
+        path = self.path
+        with open(os.path.join(path, META_NAME), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.columns = self.meta['columns']
+        self.rows = self.meta['rows']
+        self.tree_rows = self.meta['tree_rows']
+        self.mean = np.array(self.meta['mean'])
+        self.scale = np.array(self.meta['scale'])
+
+        self._map_rows()
+        with open(os.path.join(path, 'ids.txt'), 'rb') as f:
+            self.ids = f.read(self.meta['ids_bytes']).decode('utf-8').splitlines()
+        self.tree = None
+        if self.tree_rows:
+            self.tree = joblib.load(os.path.join(path, 'tree.joblib'), mmap_mode='r')
+
+    @classmethod
+    def create(cls, path: str, columns: Sequence[str]) -> 'ModeIndex':
+        """
+        Creates an empty index over the given feature columns.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in ['vectors.f32', 'meters.f32', 'ids.txt']:
+            open(os.path.join(path, name), 'wb').close()
+        cls._write_meta(path, {'columns': list(columns), 'rows': 0, 'tree_rows': 0, 'ids_bytes': 0,
+                               'mean': [0.0] * len(columns), 'scale': [1.0] * len(columns)})
+        return cls(path)
+
+    def row_of(self, chart_id: str) -> Optional[int]:
+        """
+        The row of a chart id, or None if it is not indexed.
+        """
+        if self._rows_by_id is None:
+            self._rows_by_id = {chart_id: row for row, chart_id in enumerate(self.ids)}
+        return self._rows_by_id.get(chart_id)
+
+    def append(self, ids: Sequence[str], vectors: np.ndarray, meters: np.ndarray) -> int:
+        """
+        Appends charts to the index, skipping ids it already holds.
+
+        Args:
+            ids: The chart ids.
+            vectors: Raw feature vectors in the order of `columns`.
+            meters: The charts' meters.
+
+        Returns:
+            The number of charts appended.
+        """
+        keep, new_ids = [], {}
+        for i, chart_id in enumerate(ids):
+            chart_id = str(chart_id)
+            if chart_id not in new_ids and self.row_of(chart_id) is None:
+                new_ids[chart_id] = self.rows + len(keep)
+                keep.append(i)
+        if not keep:
+            return 0
+        vectors = _clean(vectors)[keep]
+        meters = _clean(meters)[keep]
+        ids_bytes = ''.join(f"{chart_id}\n" for chart_id in new_ids).encode('utf-8')
+
+        # Files may hold the tail of an append that never reached the metadata
+        sizes = {'vectors.f32': self.rows * len(self.columns) * 4, 'meters.f32': self.rows * 4,
+                 'ids.txt': self.meta['ids_bytes']}
+        data = {'vectors.f32': vectors.tobytes(), 'meters.f32': meters.tobytes(), 'ids.txt': ids_bytes}
+        for name, size in sizes.items():
+            with open(os.path.join(self.path, name), 'r+b') as f:
+                f.truncate(size)
+                f.seek(size)
+                f.write(data[name])
+
+        meta = {**self.meta, 'rows': self.rows + len(keep), 'ids_bytes': self.meta['ids_bytes'] + len(ids_bytes)}
+        self._write_meta(self.path, meta)
+        # Only the new rows change, so the ids are extended rather than read back
+        self.meta = meta
+        self.rows = meta['rows']
+        self.ids.extend(new_ids)
+        self._rows_by_id.update(new_ids)
+        self._map_rows()
+        return len(keep)
+
+    def rebuild(self, leaf_size: int = 40):
+        """
+        Recomputes the standardization and rebuilds the KD-tree over every row.
+        """
+        vectors = np.asarray(self.vectors, dtype=np.float64)
+        mean = vectors.mean(axis=0) if self.rows else np.zeros(len(self.columns))
+        scale = vectors.std(axis=0) if self.rows else np.ones(len(self.columns))
+        scale[scale == 0] = 1.0
+
+        tree_path = os.path.join(self.path, 'tree.joblib')
+        if self.rows:
+            tree = KDTree((vectors - mean) / scale, leaf_size=leaf_size)
+            joblib.dump(tree, f"{tree_path}.tmp")
+            os.replace(f"{tree_path}.tmp", tree_path)
+        self._write_meta(self.path, {**self.meta, 'tree_rows': self.rows,
+                                     'mean': mean.tolist(), 'scale': scale.tolist()})
+        self._load()
+
+    def query(self, vectors: np.ndarray, k: int = 10):
+        """
+        Finds the nearest indexed charts of each query vector.
+
+        Args:
+            vectors: Raw feature vectors of shape `(queries, len(columns))`.
+            k: Number of neighbours per query.
+
+        Returns:
+            A tuple `(distances, rows)` of arrays of shape `(queries, k')`,
+            sorted by distance, where `k' = min(k, rows)`.
+        """
+        queries = (_clean(np.atleast_2d(vectors)) - self.mean) / self.scale
+        k = min(k, self.rows)
+        distances = np.empty((len(queries), 0))
+        rows = np.empty((len(queries), 0), dtype=np.int64)
+        if self.tree is not None and k:
+            distances, rows = self.tree.query(queries, k=min(k, self.tree_rows))
+
+        if self.rows > self.tree_rows:
+            recent = (np.asarray(self.vectors[self.tree_rows:]) - self.mean) / self.scale
+            recent_distances = np.sqrt(((queries[:, None, :] - recent[None, :, :]) ** 2).sum(axis=2))
+            distances = np.hstack([distances, recent_distances])
+            rows = np.hstack([rows, np.broadcast_to(np.arange(self.tree_rows, self.rows), recent_distances.shape)])
+            order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+            distances = np.take_along_axis(distances, order, axis=1)
+            rows = np.take_along_axis(rows, order, axis=1)
+        return distances, rows
+
+    def _map_rows(self):
+        """
+        Maps the vectors and meters of the current rows.
+        """
+        self.vectors = self._map('vectors.f32', (self.rows, len(self.columns)))
+        self.meters = self._map('meters.f32', (self.rows,))
+
+    def _map(self, name: str, shape: tuple) -> np.ndarray:
+        """
+        Memory-maps one of the index's raw float32 files.
+        """
+        if not np.prod(shape):
+            return np.empty(shape, dtype=np.float32)
+        return np.memmap(os.path.join(self.path, name), dtype=np.float32, mode='r', shape=shape)
+
+    @staticmethod
+    def _write_meta(path: str, meta: dict):
+        meta_path = os.path.join(path, META_NAME)
+        with open(f"{meta_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+class SimilarityIndex:
+    """
+    Finds the charts that play most like a given one, per mode.
+
+    The index holds one `ModeIndex` per mode, built from the feature datasets
+    of `build_features.py`. Charts are compared by the Euclidean distance of
+    their standardized feature vectors, so every feature weighs the same.
+    Appended charts are scanned directly until they exceed `rebuild_fraction`
+    of the tree's rows, at which point that mode's tree is rebuilt.
+    """
+    def __init__(self, path: str, rebuild_fraction: float = 0.25):
+        """
+        Opens the index stored at `path`, creating an empty one if it does not exist.
+
+        Args:
+            path: The index directory, holding one subdirectory per mode.
+            rebuild_fraction: Fraction of appended rows that triggers a rebuild.
+        """
+        self.path = path
+        self.rebuild_fraction = rebuild_fraction
+        os.makedirs(path, exist_ok=True)
+        self.modes: Dict[str, ModeIndex] = {
+            mode: ModeIndex(os.path.join(path, mode)) for mode in sorted(os.listdir(path))
+            if os.path.exists(os.path.join(path, mode, META_NAME))
+        }
+
+    @classmethod
+    def build(cls, dataset_path: str, path: str, chunk_size: int = 10000,
+              rebuild_fraction: float = 0.25) -> 'SimilarityIndex':
+        """
+        Builds a new index from a feature dataset, replacing any index at `path`.
+
+        Args:
+            dataset_path: Path of the feature CSV, e.g. `dataset.csv`.
+            path: The index directory.
+            chunk_size: Number of dataset rows read at a time.
+            rebuild_fraction: Fraction of appended rows that triggers a rebuild.
+        """
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        index = cls(path, rebuild_fraction)
+        # Every mode is new, so each tree is built once all rows are appended
+        index.append_dataset(dataset_path, chunk_size)
+        return index
+
+    def append_dataset(self, dataset_path: str, chunk_size: int = 10000) -> Counter:
+        """
+        Appends the charts of a feature dataset, skipping ids already indexed.
+
+        Args:
+            dataset_path: Path of a feature CSV with an `id` column.
+            chunk_size: Number of dataset rows read at a time.
+
+        Returns:
+            A Counter of the charts appended per mode.
+        """
+        appended = Counter()
+        for chunk in pd.read_csv(dataset_path, chunksize=chunk_size, dtype={'id': str, 'group': str},
+                                 encoding='utf-8'):
+            if 'id' not in chunk.columns:
+                raise ValueError(f"{dataset_path} has no 'id' column; rebuild it with build_features.py.")
+            for mode, block in chunk.groupby('mode', sort=False):
+                features = block.drop(columns=PASSTHROUGH_COLUMNS, errors='ignore')
+                if mode not in self.modes:
+                    columns = features.columns[features.notna().any()].tolist()
+                    self.modes[mode] = ModeIndex.create(os.path.join(self.path, mode), columns)
+                mode_index = self.modes[mode]
+                vectors = features.reindex(columns=mode_index.columns).apply(pd.to_numeric, errors='coerce')
+                appended[mode] += mode_index.append(block['id'].tolist(), vectors.to_numpy(),
+                                                    block['meter'].to_numpy())
+
+        for mode in appended:
+            mode_index = self.modes[mode]
+            if mode_index.rows - mode_index.tree_rows > self.rebuild_fraction * mode_index.tree_rows:
+                mode_index.rebuild()
+        return appended
+
+    def query(self, mode: str, features: Mapping[str, float], k: int = 10) -> List[dict]:
+        """
+        Finds the indexed charts most similar to a chart's features.
+
+        Args:
+            mode: The chart's game mode.
+            features: The chart's features, e.g. the `features` of a
+                      prediction made with `include_features=True`.
+            k: Number of charts to return.
+
+        Returns:
+            Up to `k` dictionaries with the `id`, `meter` and `distance` of
+            each similar chart, nearest first. Empty if the mode is not indexed.
+        """
+        mode_index = self.modes.get(mode)
+        if mode_index is None:
+            return []
+        vector = np.array([[features.get(column, 0) for column in mode_index.columns]], dtype=np.float64)
+        distances, rows = mode_index.query(vector, k)
+        return self._results(mode_index, distances[0], rows[0])
+
+    def query_id(self, chart_id: str, k: int = 10) -> List[dict]:
+        """
+        Finds the indexed charts most similar to an indexed chart, leaving out the chart itself.
+
+        Raises:
+            KeyError: If the chart id is not indexed.
+        """
+        for mode_index in self.modes.values():
+            row = mode_index.row_of(chart_id)
+            if row is None:
+                continue
+            distances, rows = mode_index.query(mode_index.vectors[row:row + 1], k + 1)
+            results = self._results(mode_index, distances[0], rows[0])
+            return [result for result in results if result['id'] != chart_id][:k]
+        raise KeyError(chart_id)
+
+    @staticmethod
+    def _results(mode_index: ModeIndex, distances: np.ndarray, rows: np.ndarray) -> List[dict]:
+        return [{'id': mode_index.ids[row], 'meter': float(mode_index.meters[row]), 'distance': float(distance)}
+                for distance, row in zip(distances, rows)]
@@ -0,0 +1,233 @@
+import os
+import sys
+import time
+import hashlib
+import sqlite3
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from stepmania_difficulty_predictor.models.prediction_pipeline import ModeAgnosticDifficultyPredictor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    scored_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    path TEXT NOT NULL,
+    chart INTEGER NOT NULL,
+    mode TEXT,
+    difficulty TEXT,
+    meter REAL,
+    predicted_difficulty REAL,
+    PRIMARY KEY (path, chart)
+);
+"""
+
+def scan_simfiles(songs_dir: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Finds the simfiles of a songs directory with `os.scandir`, without reading them.
+
+    Uses the preference order of `find_simfile_paths`: one simfile per song
+    folder, the `.ssc` when there is one. Symlinked folders are not followed.
+
+    Args:
+        songs_dir: The songs directory.
+
+    Returns:
+        A dictionary mapping each simfile's path, relative to `songs_dir`,
+        to its `(mtime_ns, size)`.
+    """
+    found = {}
+    pending = [songs_dir]
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        chosen = None
+        for entry in entries:
+            lower = entry.name.lower()
+            if entry.is_dir():
+                # Like os.walk, symlinked folders are not followed, so links back up the tree cannot loop
+                if not entry.is_symlink():
+                    pending.append(entry.path)
+            elif lower.endswith('.ssc') and (chosen is None or not chosen.name.lower().endswith('.ssc')):
+                chosen = entry
+            elif lower.endswith('.sm') and chosen is None:
+                chosen = entry
+
+        if chosen is not None:
+            try:
+                stat = chosen.stat()
+            except OSError:
+                continue
+            found[os.path.relpath(chosen.path, songs_dir)] = (stat.st_mtime_ns, stat.st_size)
+    return found
+
+def hash_file(path: str) -> str:
+    """
+    Hashes the contents of a file.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class SongsWatcher:
+    """
+    Keeps the predictions of a songs directory up to date by polling it.
+
+    Each poll lists the simfiles with `os.scandir` and compares their
+    modification time and size with the index kept in a SQLite database.
+    Only files whose stat changed are read: those whose content hash also
+    changed, and new files, are re-scored, while files that were merely
+    touched only have their index entry updated. Files that disappeared are
+    dropped with their predictions. Files modified less than `settle` seconds
+    ago are left for the next poll, so songs still being copied are not
+    scored half-written.
+
+    The database holds a `files` table, the index, and a `predictions` table
+    with one row per scored chart, keyed by the simfile path relative to the
+    songs directory and the chart's position in the file.
+    """
+    def __init__(self, songs_dir: str, db_path: str,
+                 predictor: Optional[ModeAgnosticDifficultyPredictor] = None,
+                 batch_size: int = 16, settle: float = 2.0):
+        """
+        Initializes the SongsWatcher, creating the database if needed.
+
+        Args:
+            songs_dir: The songs directory to watch.
+            db_path: Path of the SQLite database holding the index and predictions.
+            predictor: The predictor to score with. Defaults to
+                       `ModeAgnosticDifficultyPredictor()`.
+            batch_size: Number of simfiles scored per `predict_batch` call and
+                        per database transaction.
+            settle: Seconds a file must go unmodified before it is scored.
+        """
+        self.songs_dir = songs_dir
+        self.predictor = predictor or ModeAgnosticDifficultyPredictor()
+        self.batch_size = batch_size
+        self.settle = settle
+        self.db = sqlite3.connect(db_path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def poll(self) -> Counter:
+        """
+        Brings the index and predictions up to date with the songs directory.
+
+        Returns:
+            A Counter of the files `added`, `changed`, `removed`, `touched`
+            (stat changed but not content), `pending` (still settling) and
+            `unchanged`.
+        """
+        counts = Counter()
+        current = scan_simfiles(self.songs_dir)
+        known = {path: (mtime_ns, size, file_hash) for path, mtime_ns, size, file_hash
+                 in self.db.execute("SELECT path, mtime_ns, size, hash FROM files")}
+
+        removed = [path for path in known if path not in current]
+        with self.db:
+            for path in removed:
+                self._delete(path)
+        counts['removed'] = len(removed)
+
+        settled_before = time.time_ns() - int(self.settle * 1e9)
+        to_score = []
+        for path, (mtime_ns, size) in sorted(current.items()):
+            if path in known and known[path][:2] == (mtime_ns, size):
+                counts['unchanged'] += 1
+                continue
+            if mtime_ns > settled_before:
+                counts['pending'] += 1
+                continue
+            try:
+                file_hash = hash_file(os.path.join(self.songs_dir, path))
+            except OSError:
+                # Removed or unreadable since the scan; retried next poll
+                counts['pending'] += 1
+                continue
+            if path in known and known[path][2] == file_hash:
+                with self.db:
+                    self.db.execute("UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?",
+                                    (mtime_ns, size, path))
+                counts['touched'] += 1
+                continue
+            to_score.append((path, mtime_ns, size, file_hash))
+            counts['changed' if path in known else 'added'] += 1
+
+        for start in range(0, len(to_score), self.batch_size):
+            self._score(to_score[start:start + self.batch_size])
+        return counts
+
+    def watch(self, interval: float = 60.0, polls: Optional[int] = None) -> Iterator[Counter]:
+        """
+        Polls the songs directory every `interval` seconds.
+
+        Args:
+            interval: Seconds between the start of consecutive polls.
+            polls: Number of polls to run, or None to run until interrupted.
+
+        Yields:
+            The Counter of each poll, see `poll`.
+        """
+        count = 0
+        while polls is None or count < polls:
+            started = time.monotonic()
+            yield self.poll()
+            count += 1
+            if polls is None or count < polls:
+                time.sleep(max(interval - (time.monotonic() - started), 0))
+
+    def predictions(self) -> List[dict]:
+        """
+        Lists the stored predictions, ordered by simfile path and chart.
+        """
+        cursor = self.db.execute("SELECT path, chart, mode, difficulty, meter, predicted_difficulty "
+                                 "FROM predictions ORDER BY path, chart")
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def _score(self, batch: List[Tuple[str, int, int, str]]):
+        """
+        Scores a batch of simfiles and replaces their predictions in one transaction.
+        """
+        paths = [os.path.join(self.songs_dir, path) for path, _, _, _ in batch]
+        try:
+            batch_predictions = self.predictor.predict_batch(paths)
+        except Exception as e:
+            print(f"Error scoring {len(paths)} simfiles: {e}", file=sys.stderr)
+            return
+
+        scored_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        with self.db:
+            for (path, mtime_ns, size, file_hash), predictions in zip(batch, batch_predictions):
+                self._delete(path)
+                self.db.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?)",
+                                (path, mtime_ns, size, file_hash, scored_at))
+                self.db.executemany(
+                    "INSERT INTO predictions VALUES (?, ?, ?, ?, ?, ?)",
+                    [(path, p['chart_index'], p.get('mode'), p.get('difficulty'), p.get('meter'),
+                      float(p['predicted_difficulty'])) for p in predictions]
+                )
+
+    def _delete(self, path: str):
+        self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+        self.db.execute("DELETE FROM predictions WHERE path = ?", (path,))
@@ -0,0 +1,165 @@
+import numpy as np
+from statistics import NormalDist
+from typing import Optional
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import train_test_split
+
+from stepmania_difficulty_predictor.models.packed_forest import PackedForest
+
+TIER_DISTILLED = 'distilled'
+TIER_EARLY_EXIT = 'early_exit'
+TIER_FULL = 'full'
+
+class TieredForest:
+    """
+    Predicts with a forest regressor, stopping early once its trees agree.
+
+    Trees are evaluated in chunks of `chunk_size`. After each chunk, the
+    running mean of a row's tree predictions estimates the full forest's mean,
+    and a confidence interval for it is built from the spread of the trees seen
+    so far (with a finite-population correction, since the forest has a fixed
+    number of trees). Rows whose interval half-width is within `tolerance`
+    exit with the running mean; the others continue with the next chunk.
+
+    An optional small `first_tier` forest, e.g. from `distill_forest`, is tried
+    before the full forest. The agreement of its own trees says nothing about
+    how far it is from the full forest, so its prediction is only accepted
+    when the interval over its trees plus `first_tier_bound`, a bound on its
+    error against the full forest, is within `tolerance`; otherwise the row
+    falls back to the full forest.
+    """
+    def __init__(self, forest: PackedForest, chunk_size: int = 40, tolerance: float = 0.05,
+                 confidence: float = 0.95, first_tier: Optional[PackedForest] = None,
+                 first_tier_bound: float = np.inf):
+        """
+        Initializes the TieredForest.
+
+        Args:
+            forest: The packed full forest.
+            chunk_size: Number of trees evaluated between early-exit checks.
+            tolerance: Maximum confidence interval half-width, in meter units.
+            confidence: Confidence level of the interval.
+            first_tier: An optional small packed forest tried first.
+            first_tier_bound: Bound on the first tier's absolute error against
+                              the full forest, in meter units. The first tier
+                              is never accepted without one.
+        """
+        if chunk_size < 2:
+            raise ValueError("chunk_size must be at least 2.")
+        self.forest = forest
+        self.chunk_size = chunk_size
+        self.tolerance = tolerance
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.first_tier = first_tier
+        self.first_tier_bound = first_tier_bound
+
+    @classmethod
+    def from_model(cls, model, first_tier_model=None, **kwargs) -> Optional['TieredForest']:
+        """
+        Wraps a fitted forest regressor, or returns None if it cannot be packed.
+
+        Args:
+            model: The fitted full forest.
+            first_tier_model: An optional fitted small forest tried first. Its
+                              `residual_bound_`, set by `distill_forest`,
+                              bounds its error against the full forest.
+            **kwargs: Passed on to `TieredForest`.
+        """
+        forest = PackedForest.from_model(model)
+        if forest is None:
+            return None
+        first_tier = PackedForest.from_model(first_tier_model) if first_tier_model is not None else None
+        first_tier_bound = getattr(first_tier_model, 'residual_bound_', np.inf)
+        return cls(forest, first_tier=first_tier, first_tier_bound=first_tier_bound, **kwargs)
+
+    def predict(self, X):
+        """
+        Predicts every row, exiting early where the trees agree.
+
+        Args:
+            X: A 2D array of feature rows, in the model's training column order.
+
+        Returns:
+            A tuple `(predictions, tiers, trees)`: the predicted values, the tier
+            that produced each one (`'distilled'`, `'early_exit'` or `'full'`)
+            and the number of trees of the full forest evaluated for it.
+        """
+        X = np.asarray(X, dtype=float)
+        predictions = np.zeros(len(X))
+        tiers = np.full(len(X), TIER_FULL, dtype=object)
+        trees = np.zeros(len(X), dtype=np.int64)
+        pending = np.arange(len(X))
+
+        if self.first_tier is not None and len(X):
+            values = self.first_tier.tree_predictions(X)
+            mean, half_width = self._interval(values.sum(axis=1), (values ** 2).sum(axis=1),
+                                              values.shape[1])
+            confident = half_width + self.first_tier_bound <= self.tolerance
+            predictions[confident] = mean[confident]
+            tiers[confident] = TIER_DISTILLED
+            pending = pending[~confident]
+
+        n_trees = self.forest.n_trees
+        sums = np.zeros(len(pending))
+        squares = np.zeros(len(pending))
+        for start in range(0, n_trees, self.chunk_size):
+            if not len(pending):
+                break
+            stop = min(start + self.chunk_size, n_trees)
+            values = self.forest.tree_predictions(X[pending], slice(start, stop))
+            sums += values.sum(axis=1)
+            squares += (values ** 2).sum(axis=1)
+            trees[pending] = stop
+
+            mean, half_width = self._interval(sums, squares, stop, population=n_trees)
+            done = (half_width <= self.tolerance) | (stop == n_trees)
+            predictions[pending[done]] = mean[done]
+            if stop < n_trees:
+                tiers[pending[done]] = TIER_EARLY_EXIT
+            pending, sums, squares = pending[~done], sums[~done], squares[~done]
+
+        return predictions, tiers, trees
+
+    def _interval(self, sums, squares, k, population=None):
+        """
+        Running mean and confidence interval half-width from `k` tree predictions.
+        """
+        mean = sums / k
+        if k < 2:
+            return mean, np.full(len(mean), np.inf)
+        variance = np.maximum(squares - k * mean ** 2, 0) / (k - 1)
+        half_width = self.z * np.sqrt(variance / k)
+        if population is not None:
+            half_width *= np.sqrt(max(population - k, 0) / max(population - 1, 1))
+        return mean, half_width
+
+def distill_forest(model, X, n_estimators: int = 10, max_depth: Optional[int] = 12,
+                   random_state: int = 42, holdout_fraction: float = 0.2, quantile: float = 0.99):
+    """
+    Fits a small forest that mimics `model`, for use as a `TieredForest` first tier.
+
+    The small forest is fitted on the full model's predictions for part of
+    `X`. On the held-out rows, the `quantile` of its absolute error against
+    the full model is stored as its `residual_bound_`, which `TieredForest`
+    adds to the first tier's interval before accepting it.
+
+    Args:
+        model: The fitted full model.
+        X: The feature rows to distil on, e.g. the training set.
+        n_estimators: Number of trees of the small forest.
+        max_depth: Maximum depth of its trees.
+        random_state: Seed of the small forest and of the holdout split.
+        holdout_fraction: Fraction of `X` held out to measure the error bound.
+        quantile: Quantile of the held-out absolute errors used as the bound.
+
+    Returns:
+        The fitted small `RandomForestRegressor`, with its `residual_bound_`.
+    """
+    targets = np.asarray(model.predict(X))
+    X_fit, X_holdout, y_fit, y_holdout = train_test_split(X, targets, test_size=holdout_fraction,
+                                                          random_state=random_state)
+    student = RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth,
+                                    random_state=random_state)
+    student.fit(X_fit, y_fit)
+    student.residual_bound_ = float(np.quantile(np.abs(student.predict(X_holdout) - y_holdout), quantile))
+    return student
@@ -0,0 +1,95 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from scripts.build_features import build_features
+from stepmania_difficulty_predictor.features.columnar import charts_to_ragged
+from stepmania_difficulty_predictor.features.FeatureExtractor import FeatureExtractor
+from stepmania_difficulty_predictor.features.PatternHistogram import PatternHistogram
+
+def random_chart(rng, num_panels, rows, empty_rows=False):
+    times = np.round(np.cumsum(rng.choice([0.0625, 0.125, 0.25, 0.5], size=rows)), 4)
+    chart = {}
+    for t in times:
+        row = rng.random(num_panels) < 0.3
+        if not row.any() and not empty_rows:
+            row[rng.integers(num_panels)] = True
+        chart[float(t)] = ''.join('1' if p else '0' for p in row)
+    return chart
+
+class TestBatchFeatures(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(11)
+
+    def assertFeaturesEqual(self, batch, expected):
+        self.assertEqual(len(batch), len(expected))
+        for features, reference in zip(batch, expected):
+            self.assertEqual(list(features), list(reference))
+            np.testing.assert_allclose(list(features.values()), list(reference.values()), rtol=1e-9)
+
+    def test_matches_compute(self):
+        """
+        Tests that batched features match `compute` chart by chart, across panel counts.
+        """
+        charts = [random_chart(self.rng, num_panels, int(self.rng.integers(1, 300)))
+                  for num_panels in (4, 8, 4, 6, 4, 8) for _ in range(5)]
+        for extractor in (FeatureExtractor(), FeatureExtractor(pattern_buckets=16)):
+            self.assertFeaturesEqual(extractor.compute_batch(charts), [extractor.compute(c) for c in charts])
+
+    def test_fallback_charts(self):
+        """
+        Tests charts with empty rows, out-of-order rows or no rows at all.
+        """
+        unordered = random_chart(self.rng, 4, 50)
+        unordered = dict(reversed(list(unordered.items())))
+        charts = [random_chart(self.rng, 4, 80), random_chart(self.rng, 4, 80, empty_rows=True),
+                  unordered, {}, random_chart(self.rng, 4, 1)]
+        extractor = FeatureExtractor(pattern_buckets=8)
+        batch = extractor.compute_batch(charts)
+        self.assertEqual(batch[3], {})
+        self.assertFeaturesEqual(batch[:3] + batch[4:], [extractor.compute(c) for c in charts if c])
+
+    def test_ragged_histogram(self):
+        """
+        Tests that patterns never span two charts of a ragged batch.
+        """
+        charts = [random_chart(self.rng, 4, n) for n in (2, 40, 3, 100)]
+        _, panels, offsets, _ = charts_to_ragged(charts)
+        histogram = PatternHistogram(ngram=3, num_buckets=8)
+        ragged = histogram.compute_ragged(panels, offsets)
+        for c in range(len(charts)):
+            expected = histogram.compute_arrays(panels[offsets[c]:offsets[c + 1]])
+            np.testing.assert_allclose(ragged[c], list(expected.values()))
+
+    def test_build_features_workers(self):
+        """
+        Tests that building with worker processes writes the same rows, in the same order.
+        """
+        tmp = tempfile.mkdtemp()
+        try:
+            processed_dir = os.path.join(tmp, 'processed')
+            os.makedirs(processed_dir)
+            for i in range(40):
+                chart = random_chart(self.rng, 4, int(self.rng.integers(1, 100)))
+                with open(os.path.join(processed_dir, f'{i:016x}.chart'), 'w', encoding='utf-8') as f:
+                    json.dump({'mode': 'dance-single', 'meter': i % 12, 'chart': chart}, f)
+            with open(os.path.join(processed_dir, 'corrupt.chart'), 'w', encoding='utf-8') as f:
+                f.write('{')
+
+            outputs = []
+            for workers in (1, 2):
+                output_path = os.path.join(tmp, f'dataset-{workers}.csv')
+                build_features(processed_dir, output_path, batch_size=6, workers=workers)
+                with open(output_path, 'r', encoding='utf-8') as f:
+                    outputs.append(f.read())
+            self.assertEqual(outputs[0], outputs[1])
+            ids = [line.split(',')[0] for line in outputs[0].splitlines()[1:]]
+            self.assertEqual(ids, [f'{i:016x}' for i in range(40)])
+        finally:
+            shutil.rmtree(tmp)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from stepmania_difficulty_predictor.models.bulk_scoring import BulkScorer
+
+class TestBulkScorer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        rng = np.random.default_rng(1)
+        n = 500
+        self.dataset = pd.DataFrame({
+            'meter': rng.integers(1, 15, n),
+            'mode': rng.choice(['dance-single', 'dance-double', 'pump-single'], n),
+            'nps': rng.random(n) * 10,
+            'length': rng.random(n) * 100,
+            'col_7': rng.random(n),
+        })
+        self.dataset.loc[3, 'nps'] = np.inf
+        self.dataset_path = os.path.join(self.tmp, 'dataset.csv')
+        self.dataset.to_csv(self.dataset_path, index=False)
+
+        self.model_dir = os.path.join(self.tmp, 'models')
+        os.makedirs(self.model_dir)
+        self.models = {}
+        for mode, columns in [('dance-single', ['nps', 'length']), ('dance-double', ['nps', 'length', 'col_7'])]:
+            rows = self.dataset[self.dataset['mode'] == mode]
+            model = RandomForestRegressor(n_estimators=5, random_state=0)
+            self.models[mode] = model.fit(rows[columns].replace(np.inf, 0), rows['meter'])
+            with open(os.path.join(self.model_dir, f'{mode}.p'), 'wb') as f:
+                pickle.dump(model, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def expected_predictions(self):
+        expected = np.full(len(self.dataset), np.nan)
+        for mode, model in self.models.items():
+            rows = self.dataset['mode'] == mode
+            X = self.dataset.loc[rows, model.feature_names_in_].replace(np.inf, np.nan).fillna(0)
+            expected[rows.to_numpy()] = model.predict(X)
+        return expected
+
+    def test_chunked_scoring(self):
+        """
+        Tests that chunks are routed to their mode's model and come back in dataset order.
+        """
+        scorer = BulkScorer(self.model_dir, chunk_size=64)
+        chunks = list(scorer.iter_predictions(self.dataset_path))
+        self.assertEqual(len(chunks), 8)
+
+        predictions = pd.concat(chunks)
+        self.assertEqual(list(predictions.columns), ['meter', 'mode', 'predicted_difficulty'])
+        np.testing.assert_allclose(predictions['predicted_difficulty'], self.expected_predictions())
+        self.assertEqual(scorer.counts['unscored'], (self.dataset['mode'] == 'pump-single').sum())
+
+    def test_parallel_matches_serial(self):
+        """
+        Tests that scoring with worker processes writes the same file as scoring serially.
+        """
+        paths = [os.path.join(self.tmp, f'predictions_{workers}.csv') for workers in (1, 2)]
+        for workers, path in zip((1, 2), paths):
+            rows = BulkScorer(self.model_dir, workers=workers, chunk_size=50).score(self.dataset_path, path)
+            self.assertEqual(rows, len(self.dataset))
+        pd.testing.assert_frame_equal(pd.read_csv(paths[0]), pd.read_csv(paths[1]))
+
+    def test_ids_keep_leading_zeros(self):
+        """
+        Tests that chunks whose hex ids are all digits keep them as strings.
+        """
+        ids = [f'{i:016d}' if i < 64 else f'{i:015x}a' for i in range(len(self.dataset))]
+        self.dataset.insert(0, 'id', ids)
+        self.dataset.to_csv(self.dataset_path, index=False)
+
+        predictions = pd.concat(BulkScorer(self.model_dir, chunk_size=64).iter_predictions(self.dataset_path))
+        self.assertEqual(predictions['id'].tolist(), ids)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import numpy as np
+from stepmania_difficulty_predictor.data.dedup import ChartDeduplicator
+from stepmania_difficulty_predictor.data.dataset_pipeline import iter_deduplicated_charts
+
+def make_chart(rng, n_rows=300):
+    """Builds a random 4-panel chart."""
+    encodings = ['1000', '0100', '0010', '0001', '1001', '0110']
+    times = np.round(np.cumsum(rng.choice([0.125, 0.25, 0.5], size=n_rows)), 3)
+    return {float(t): encodings[rng.integers(len(encodings))] for t in times}
+
+class TestChartDeduplicator(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(3)
+        self.charts = [make_chart(self.rng) for _ in range(20)]
+        self.deduplicator = ChartDeduplicator()
+        for chart in self.charts:
+            self.deduplicator.add(chart, 'dance-single')
+
+    def test_exact_duplicate_with_new_offset(self):
+        """
+        Tests that a copy shifted by a different offset is an exact duplicate.
+        """
+        shifted = {round(t + 0.731, 3): v for t, v in self.charts[4].items()}
+        self.assertEqual(self.deduplicator.add(shifted, 'dance-single'), (4, 'exact'))
+
+    def test_near_duplicate(self):
+        """
+        Tests that a chart with a few edited rows is a near duplicate.
+        """
+        edited = dict(self.charts[7])
+        for t in list(edited)[150:153]:
+            edited[t] = '1111'
+        self.assertEqual(self.deduplicator.add(edited, 'dance-single'), (7, 'near'))
+
+    def test_distinct_charts(self):
+        """
+        Tests that unrelated charts and other modes start new groups.
+        """
+        self.assertEqual(self.deduplicator.add(make_chart(self.rng), 'dance-single'), (20, None))
+        self.assertEqual(self.deduplicator.add(self.charts[0], 'dance-double'), (21, None))
+        self.assertEqual(sum(self.deduplicator.duplicates.values()), 0)
+
+class TestDeduplicationStage(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        first, second = make_chart(rng), make_chart(rng)
+        self.charts = [{'mode': 'dance-single', 'meter': 5, 'chart': first},
+                       {'mode': 'dance-single', 'meter': 6, 'chart': second},
+                       {'mode': 'dance-single', 'meter': 5, 'chart': dict(first)}]
+
+    def test_skips_duplicates(self):
+        """
+        Tests that duplicates are dropped before featurization.
+        """
+        charts = list(iter_deduplicated_charts(self.charts))
+        self.assertEqual([chart['meter'] for chart in charts], [5, 6])
+        self.assertEqual([chart['group'] for chart in charts], [0, 1])
+
+    def test_keeps_tagged_duplicates(self):
+        """
+        Tests that kept duplicates share the group of their original.
+        """
+        charts = list(iter_deduplicated_charts(self.charts, keep_duplicates=True))
+        self.assertEqual([chart['group'] for chart in charts], [0, 1, 0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import unittest
+import numpy as np
+import pandas as pd
+import simfile
+from sklearn.ensemble import RandomForestRegressor
+from stepmania_difficulty_predictor.features.FeatureExtractor import FeatureExtractor
+from stepmania_difficulty_predictor.models.edit_session import ChartEditSession
+from stepmania_difficulty_predictor.models.packed_forest import PackedForest
+from stepmania_difficulty_predictor.models.prediction_pipeline import ModeAgnosticDifficultyPredictor
+
+def make_simfile(rng, n_measures=8, bpms="0=150,16=300", stops="8=0.5"):
+    """Builds a dance-single simfile with random taps, a BPM change and a stop."""
+    measures = []
+    for _ in range(n_measures):
+        rows = []
+        for _ in range(16):
+            row = ['0'] * 4
+            if rng.random() < 0.6:
+                for col in rng.choice(4, size=rng.integers(1, 3), replace=False):
+                    row[col] = '1'
+            rows.append(''.join(row))
+        measures.append('\n'.join(rows))
+    return simfile.loads(
+        f"#TITLE:Edit;\n#BPMS:{bpms};\n#STOPS:{stops};\n#OFFSET:-0.5;\n"
+        "#NOTES:\n dance-single:\n :\n Hard:\n 9:\n 0,0,0,0,0:\n"
+        + '\n,\n'.join(measures) + "\n;\n")
+
+class FirstFeatureModel:
+    """A mock model that predicts its first feature."""
+    feature_names_in_ = ['nps', 'length', 'col_0', 'col_1', 'col_2', 'col_3',
+                         'left', 'right', 'all', 'stream_percentage',
+                         'max_stream_length', 'jack_percentage', 'crossover_percentage']
+
+    def predict(self, features):
+        return features.iloc[:, 0].to_numpy()
+
+class TestChartEditSession(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(7)
+        self.feature_extractor = FeatureExtractor(alpha=3)
+
+    def assertFeaturesMatch(self, session, feature_extractor=None):
+        expected = (feature_extractor or self.feature_extractor).compute(session.chart())
+        features = session.features()
+        self.assertEqual(set(features), set(expected))
+        for name, value in expected.items():
+            self.assertTrue(np.isclose(features[name], value, equal_nan=True),
+                            f"{name}: {features[name]} != {value}")
+
+    def test_features_match_extractor_after_edits(self):
+        """
+        Tests that the incremental features match a full extraction after each edit.
+        """
+        session = ChartEditSession(make_simfile(self.rng))
+        self.assertFeaturesMatch(session)
+
+        for _ in range(30):
+            start = float(self.rng.integers(0, 32))
+            end = start + float(self.rng.integers(1, 6))
+            beats = np.arange(start, end, 0.25)
+            chosen = self.rng.choice(beats, size=self.rng.integers(0, len(beats) + 1), replace=False)
+            session.edit(start, end, [(beat, int(self.rng.integers(4))) for beat in chosen])
+            self.assertFeaturesMatch(session)
+
+    def test_pattern_features_after_edits(self):
+        """
+        Tests that the pattern histogram is kept up to date for models trained with it.
+        """
+        feature_extractor = FeatureExtractor(alpha=3, pattern_buckets=16)
+        session = ChartEditSession(make_simfile(self.rng), pattern_buckets=16)
+        self.assertFeaturesMatch(session, feature_extractor)
+
+        for _ in range(30):
+            start = float(self.rng.integers(0, 32))
+            end = start + float(self.rng.integers(1, 6))
+            beats = np.arange(start, end, 0.25)
+            chosen = self.rng.choice(beats, size=self.rng.integers(0, len(beats) + 1), replace=False)
+            session.edit(start, end, [(beat, int(self.rng.integers(4))) for beat in chosen])
+            self.assertFeaturesMatch(session, feature_extractor)
+
+        model = FirstFeatureModel()
+        model.feature_names_in_ = FirstFeatureModel.feature_names_in_ + [f'pattern_{i}' for i in range(8)]
+        self.assertEqual(ChartEditSession(make_simfile(self.rng), model=model).pattern_histogram.num_buckets, 8)
+
+    def test_features_match_extractor_after_head_edits(self):
+        """
+        Tests edits of the first rows, whose centre of mass PatternDetector ignores.
+        """
+        session = ChartEditSession(simfile.loads(
+            "#TITLE:Head;\n#BPMS:0=120;\n#OFFSET:0;\n"
+            "#NOTES:\n dance-single:\n :\n Hard:\n 9:\n 0,0,0,0,0:\n"
+            "0000\n1100\n0000\n0000\n,\n0001\n0000\n0000\n0000\n,\n0000\n,\n1000\n0000\n0000\n0000\n;\n"))
+        session.edit(0.0, 1.0, [])
+        self.assertFeaturesMatch(session)
+
+        for seed in range(20):
+            rng = np.random.default_rng(seed)
+            session = ChartEditSession(make_simfile(rng, n_measures=3))
+            for _ in range(10):
+                end = float(rng.integers(1, 6))
+                beats = np.arange(0, end, 0.25)
+                chosen = rng.choice(beats, size=rng.integers(0, len(beats) + 1), replace=False)
+                session.edit(0.0, end, [(beat, int(rng.integers(4))) for beat in chosen])
+                self.assertFeaturesMatch(session)
+
+    def test_edit_rejects_notes_outside_range(self):
+        """
+        Tests that notes outside the edited range are rejected.
+        """
+        session = ChartEditSession(make_simfile(self.rng))
+        with self.assertRaises(ValueError):
+            session.edit(0, 4, [(4.0, 0)])
+
+    def test_clearing_chart(self):
+        """
+        Tests that removing every note leaves an empty chart without features.
+        """
+        session = ChartEditSession(make_simfile(self.rng), model=FirstFeatureModel())
+        session.edit(0, 1000)
+        self.assertEqual(session.chart(), {})
+        self.assertEqual(session.features(), {})
+        self.assertIsNone(session.score())
+
+class TestPackedForest(unittest.TestCase):
+
+    def test_matches_forest_predictions(self):
+        """
+        Tests that the packed forest predicts like the scikit-learn forest.
+        """
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame(rng.normal(size=(200, 5)), columns=list('abcde'))
+        y = X['a'] * 2 + X['b'] ** 2 + rng.normal(scale=0.1, size=200)
+        model = RandomForestRegressor(n_estimators=20, max_depth=6, random_state=0).fit(X, y)
+
+        packed = PackedForest.from_model(model)
+        np.testing.assert_allclose(packed.predict(X.to_numpy()), model.predict(X))
+        self.assertEqual(packed.tree_predictions(X.to_numpy()[:3], slice(0, 5)).shape, (3, 5))
+
+    def test_from_model_rejects_non_forests(self):
+        """
+        Tests that models without fitted trees are not packed.
+        """
+        self.assertIsNone(PackedForest.from_model(FirstFeatureModel()))
+
+class TestPredictorEditSession(unittest.TestCase):
+
+    def setUp(self):
+        self.predictor = ModeAgnosticDifficultyPredictor(model_dir="stepmania_difficulty_predictor/model")
+        self.predictor.models['dance-single'] = FirstFeatureModel()
+
+    def test_edit_session_scores_edits(self):
+        """
+        Tests that a session opened from the predictor scores the edited chart.
+        """
+        session = self.predictor.edit_session("test.sm")
+        before = session.score()
+        self.assertAlmostEqual(before, session.features()['nps'])
+
+        session.edit(0, 8, [(beat, 0) for beat in np.arange(0, 8, 0.25)])
+        self.assertAlmostEqual(session.score(), session.features()['nps'])
+
+    def test_edit_session_unknown_mode(self):
+        """
+        Tests that opening a session without a model for the mode fails.
+        """
+        self.predictor.models.pop('dance-double', None)
+        with self.assertRaises(ValueError):
+            self.predictor.edit_session("tests/dance_double.sm")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import io
+import json
+import os
+import tempfile
+from stepmania_difficulty_predictor.data.ChartPreprocessor import ChartPreprocessor
+from stepmania_difficulty_predictor.data.ffr_ingest import (
+    iter_json_array, ragged_from_ffr, iter_ffr_charts, FFR_MODE
+)
+
+def make_charts():
+    """Builds a few FFR API charts with jumps, gaps and an empty chart."""
+    return [
+        {'name': 'Jumps', 'difficulty': 12, 'chart': [
+            ['L', 60, 'blue', 1500], ['R', 60, 'blue', 1500], ['D', 66, 'red', 1600],
+            ['U', 72, 'blue', 1750], ['L', 78, 'red', 1900], ['D', 78, 'red', 1900],
+        ]},
+        {'name': 'Empty', 'difficulty': 1, 'chart': []},
+        {'name': 'Stream', 'difficulty': 30, 'chart': [
+            [direction, i, 'blue', 2000 + 125 * i] for i, direction in enumerate('LDURLDURUD')
+        ]},
+    ]
+
+class TestFFRIngest(unittest.TestCase):
+
+    def test_iter_json_array(self):
+        """
+        Tests that elements are decoded across read boundaries.
+        """
+        charts = make_charts()
+        parsed = list(iter_json_array(io.StringIO(json.dumps(charts, indent=2)), read_size=16))
+        self.assertEqual(parsed, charts)
+        self.assertEqual(list(iter_json_array(io.StringIO(' [ ] '))), [])
+
+    def test_truncated_array(self):
+        """
+        Tests that a truncated dump raises an error.
+        """
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO(json.dumps(make_charts())[:-20]), read_size=16))
+
+    def test_ragged_matches_preprocessor(self):
+        """
+        Tests that the ragged conversion matches `ChartPreprocessor.preprocess`.
+        """
+        charts = make_charts()
+        ragged = ragged_from_ffr(charts)
+        preprocessor = ChartPreprocessor()
+
+        self.assertEqual(len(ragged), 3)
+        self.assertEqual(ragged.chart(1), {})
+        for index in (0, 2):
+            self.assertEqual(ragged.chart(index), preprocessor.preprocess(charts[index]))
+
+        times, panels = ragged.chart_arrays(0)
+        self.assertEqual(times.tolist(), [0.0, 0.1, 0.25, 0.4])
+        self.assertEqual(panels[0].tolist(), [True, False, False, True])
+
+    def test_iter_ffr_charts(self):
+        """
+        Tests that a dump file streams into preprocessed charts.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dump_path = os.path.join(tmp_dir, 'dump.json')
+            with open(dump_path, 'w', encoding='utf-8') as f:
+                json.dump(make_charts(), f)
+
+            charts = list(iter_ffr_charts(dump_path, batch_size=2))
+
+        self.assertEqual([chart['name'] for chart in charts], ['Jumps', 'Stream'])
+        self.assertEqual(charts[1]['meter'], 30)
+        self.assertEqual(charts[1]['mode'], FFR_MODE)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from stepmania_difficulty_predictor.models.incremental import update_forest
+
+class TestIncrementalUpdate(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.X = pd.DataFrame(rng.random((200, 3)), columns=['nps', 'length', 'jacks'])
+        self.y = self.X['nps'] * 10
+        self.model = RandomForestRegressor(n_estimators=20, max_depth=6, random_state=42).fit(self.X, self.y)
+
+    def test_adds_and_retires_trees(self):
+        """
+        Tests that new trees are appended, the oldest retired and the original model left untouched.
+        """
+        original_trees = list(self.model.estimators_)
+        updated, added, retired = update_forest(self.model, self.X[:50], self.y[:50], n_trees=10, retire=5,
+                                                step=4)
+
+        self.assertEqual((added, retired), (10, 5))
+        self.assertEqual(len(updated.estimators_), 25)
+        self.assertEqual(updated.n_estimators, 25)
+        self.assertFalse(updated.warm_start)
+        self.assertEqual(updated.max_depth, 6)
+        self.assertEqual(list(updated.feature_names_in_), list(self.X.columns))
+        self.assertEqual(len(self.model.estimators_), 20)
+        self.assertIs(self.model.estimators_[0], original_trees[0])
+
+        # The retained original trees keep their predictions
+        np.testing.assert_array_equal(updated.estimators_[0].predict(self.X.to_numpy()),
+                                      self.model.estimators_[5].predict(self.X.to_numpy()))
+
+    def test_retire_keeps_new_trees(self):
+        """
+        Tests that retiring more trees than the model had only removes the original ones.
+        """
+        updated, added, retired = update_forest(self.model, self.X, self.y, n_trees=5, retire=100)
+        self.assertEqual((added, retired), (5, 20))
+        self.assertEqual(len(updated.estimators_), 5)
+
+    def test_time_budget(self):
+        """
+        Tests that growing stops within the time budget, after at least one step.
+        """
+        updated, added, _ = update_forest(self.model, self.X, self.y, n_trees=10000, time_budget=0.0, step=3)
+        self.assertEqual(added, 3)
+        self.assertEqual(len(updated.estimators_), 23)
+
+if __name__ == '__main__':
+    unittest.main()
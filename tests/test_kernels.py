@@ -0,0 +1,77 @@
+import unittest
+import numpy as np
+from stepmania_difficulty_predictor.features.columnar import chart_to_arrays
+from stepmania_difficulty_predictor.features.kernels import BACKENDS, get_kernels
+from stepmania_difficulty_predictor.features.StreamDetector import StreamDetector
+from stepmania_difficulty_predictor.features.PatternDetector import PatternDetector
+
+def reference_stream_runs(times, stream_threshold):
+    """The original per-note run tracking of StreamDetector."""
+    stream_notes, max_stream_length, current = 0, 0, 0
+    for i in range(1, len(times)):
+        if times[i] - times[i - 1] <= stream_threshold:
+            current = 2 if current == 0 else current + 1
+        else:
+            stream_notes += current
+            max_stream_length = max(max_stream_length, current)
+            current = 0
+    return stream_notes + current, max(max_stream_length, current)
+
+def reference_pattern_counts(times, panels, jack_threshold):
+    """The original per-note jack and carried centre-of-mass logic of PatternDetector."""
+    midline = (panels.shape[1] - 1) / 2.0
+    jacks, crossovers, last_com = 0, 0, 0
+    for i in range(1, len(times)):
+        if times[i] - times[i - 1] <= jack_threshold:
+            jacks += int(np.sum(panels[i] & panels[i - 1]))
+        active = np.flatnonzero(panels[i])
+        com = np.mean(active) if len(active) else last_com
+        if (last_com > midline and com < midline) or (last_com < midline and com > midline):
+            crossovers += 1
+        last_com = com
+    return jacks, crossovers
+
+class TestKernelBackends(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(9)
+        self.charts = []
+        for num_panels in (4, 5, 8, 10):
+            for n_rows in (1, 2, 50, 300):
+                times = np.round(np.cumsum(rng.choice([0.05, 0.1, 0.125, 0.25, 0.5], size=n_rows)), 3)
+                self.charts.append({float(t): ''.join(rng.choice(['0', '1'], size=num_panels, p=[0.6, 0.4]))
+                                    for t in times})
+
+    def test_backends_match_reference(self):
+        """
+        Tests that every available backend matches the per-note reference loops.
+        """
+        for backend in BACKENDS:
+            kernels = get_kernels(backend)
+            for chart in self.charts:
+                times, panels = chart_to_arrays(chart)
+                self.assertEqual(tuple(kernels.stream_runs(times, 0.25)),
+                                 reference_stream_runs(times, 0.25), backend)
+                self.assertEqual(tuple(kernels.pattern_counts(times, panels, 0.1)),
+                                 reference_pattern_counts(times, panels, 0.1), backend)
+
+    @unittest.skipUnless('numba' in BACKENDS, "Numba is not installed")
+    def test_numba_matches_numpy(self):
+        """
+        Tests that the detectors give identical features on both backends.
+        """
+        for chart in self.charts:
+            self.assertEqual(StreamDetector(backend='numba').compute(chart),
+                             StreamDetector(backend='numpy').compute(chart))
+            self.assertEqual(PatternDetector(backend='numba').compute(chart),
+                             PatternDetector(backend='numpy').compute(chart))
+
+    def test_unknown_backend(self):
+        """
+        Tests that requesting an unavailable backend fails.
+        """
+        with self.assertRaises(ValueError):
+            get_kernels('fortran')
+
+if __name__ == '__main__':
+    unittest.main()
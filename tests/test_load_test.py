@@ -0,0 +1,61 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from scripts.load_test import run_load_test, write_synthetic_corpus
+
+FEATURES = ['nps', 'length', 'col_0', 'col_1', 'col_2', 'col_3', 'left', 'right', 'all',
+            'stream_percentage', 'max_stream_length', 'jack_percentage', 'crossover_percentage']
+
+class TestLoadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.model_dir = os.path.join(self.tmp, 'models')
+        os.makedirs(self.model_dir)
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame(rng.random((50, len(FEATURES))), columns=FEATURES)
+        with open(os.path.join(self.model_dir, 'dance-single.p'), 'wb') as f:
+            pickle.dump(LinearRegression().fit(X, X['nps'] * 10), f)
+        self.paths = write_synthetic_corpus(os.path.join(self.tmp, 'songs'), 4, measures=8)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_library_load_test(self):
+        """
+        Tests that a load test scores every chart of the corpus and reports its measurements.
+        """
+        results = run_load_test(self.paths, 'library', concurrency=2, batch_size=2, model_dir=self.model_dir)
+        self.assertEqual(results['requests'], 2)
+        self.assertEqual(results['files'], 4)
+        self.assertEqual(results['charts'], 8)
+        self.assertEqual(results['errors'], 0)
+        self.assertIsNone(results['first_error'])
+        self.assertEqual(set(results['latency_ms']), {'p50', 'p95', 'p99', 'mean', 'max'})
+        for key in ('wall_seconds', 'charts_per_sec', 'files_per_sec', 'peak_rss_mb', 'cpu_seconds'):
+            self.assertGreater(results[key], 0)
+
+    def test_unscored_files_are_errors(self):
+        """
+        Tests that requests whose files produce no predictions are counted as errors.
+        """
+        results = run_load_test(self.paths + ['tests/dance_double.sm'], 'library', model_dir=self.model_dir)
+        self.assertEqual(results['charts'], 8)
+        self.assertEqual(results['errors'], 1)
+        self.assertIn('dance_double.sm', results['first_error'])
+
+    def test_missing_models_fail(self):
+        """
+        Tests that workers without any model fail instead of reporting empty results.
+        """
+        with self.assertRaises(BrokenProcessPool):
+            run_load_test(self.paths, 'library', model_dir=os.path.join(self.tmp, 'missing'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import numpy as np
+from stepmania_difficulty_predictor.features.FeatureExtractor import FeatureExtractor
+from stepmania_difficulty_predictor.features.MultiRateFeatures import MultiRateFeatureExtractor
+from stepmania_difficulty_predictor.models.prediction_pipeline import ModeAgnosticDifficultyPredictor
+
+class CountingMockModel:
+    """A mock model that scores every row with its length feature and counts its calls."""
+    feature_names_in_ = ['nps', 'length', 'col_0', 'col_1', 'col_2', 'col_3',
+                         'left', 'right', 'all', 'stream_percentage',
+                         'max_stream_length', 'jack_percentage', 'crossover_percentage']
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, features):
+        self.calls += 1
+        return features['length'].to_numpy()
+
+class TestMultiRateFeatures(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        times = np.round(np.cumsum(rng.choice([0.05, 0.125, 0.25, 0.5, 1.5], size=150)), 3)
+        encodings = ['1000', '0100', '0010', '0001', '1001', '0110', '1100']
+        self.chart = {float(t): encodings[rng.integers(len(encodings))] for t in times}
+        self.rates = [0.8, 1.0, 1.3, 2.0]
+
+    def test_rates_match_rescaled_extraction(self):
+        """
+        Tests that every rate matches extracting features from the rescaled chart.
+        """
+        features = MultiRateFeatureExtractor(alpha=3).compute(self.chart, self.rates)
+        self.assertEqual(features['rate'].tolist(), self.rates)
+
+        feature_extractor = FeatureExtractor(alpha=3)
+        for i, rate in enumerate(self.rates):
+            rescaled = {float(np.round(t / rate, 3)): v for t, v in self.chart.items()}
+            for name, value in feature_extractor.compute(rescaled).items():
+                self.assertTrue(np.isclose(features[name].iloc[i], value, equal_nan=True),
+                                f"rate {rate}, {name}: {features[name].iloc[i]} != {value}")
+
+    def test_rejects_non_positive_rates(self):
+        """
+        Tests that rates must be positive.
+        """
+        with self.assertRaises(ValueError):
+            MultiRateFeatureExtractor().compute(self.chart, [0.0])
+
+class TestPredictRates(unittest.TestCase):
+
+    def setUp(self):
+        self.predictor = ModeAgnosticDifficultyPredictor(model_dir="stepmania_difficulty_predictor/model")
+        self.model = CountingMockModel()
+        self.predictor.models['dance-single'] = self.model
+
+    def test_predict_batch_rates(self):
+        """
+        Tests that every chart and rate of a batch is scored in one call per mode.
+        """
+        batch_predictions = self.predictor.predict_batch(["test.sm", "test.sm"], rates=[1.5, 2.0])
+        self.assertEqual(self.model.calls, 1)
+
+        prediction = batch_predictions[1][0]
+        self.assertEqual(list(prediction['rates']), [1.5, 2.0])
+        # Faster rates shorten the chart
+        self.assertGreater(prediction['predicted_difficulty'], prediction['rates'][1.5])
+        self.assertGreater(prediction['rates'][1.5], prediction['rates'][2.0])
+
+        native = self.predictor.predict("test.sm")[0]
+        self.assertAlmostEqual(prediction['predicted_difficulty'], native['predicted_difficulty'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import glob
+import random
+import unittest
+import numpy as np
+import simfile
+from fractions import Fraction
+from simfile.notes import NoteData
+from stepmania_difficulty_predictor.data.notes import note_arrays, tokenize_notes
+from stepmania_difficulty_predictor.data.timing import TimingTable
+from simfile.timing import TimingData
+
+def as_notes(arrays):
+    return [(Fraction(int(n), int(d)), int(c), chr(t)) for n, d, c, t in zip(*arrays)]
+
+def reference_notes(notes):
+    return [(Fraction(note.beat), note.column, note.note_type.value) for note in NoteData(notes)]
+
+def random_notes(rng, columns):
+    """Note data with mixed subdivisions, indentation, line endings and players."""
+    players = []
+    for _ in range(rng.choice([1, 1, 2])):
+        measures = []
+        for _ in range(rng.randint(1, 8)):
+            rows = [''.join(rng.choice('000000001234MFKLA') for _ in range(columns))
+                    for _ in range(rng.choice([1, 3, 4, 8, 12, 16, 24, 48, 192]))]
+            rows = [rng.choice(['', '  ', '\t']) + row + rng.choice(['', ' ']) for row in rows]
+            newline = rng.choice(['\n', '\r\n', '\r'])
+            measures.append(rng.choice(['', newline, '\n  ']) + newline.join(rows) + rng.choice(['', '\n', ' \n ']))
+        players.append(','.join(measures))
+    return rng.choice(['', '\n']) + '&'.join(players) + rng.choice(['', '\n'])
+
+class TestTokenizeNotes(unittest.TestCase):
+
+    def test_matches_note_data(self):
+        """
+        Tests that tokenized note data matches `NoteData` note for note.
+        """
+        rng = random.Random(3)
+        for _ in range(300):
+            notes = random_notes(rng, rng.choice([4, 5, 8, 10]))
+            tokens = tokenize_notes(notes)
+            self.assertIsNotNone(tokens)
+            self.assertEqual(as_notes(tokens), reference_notes(notes))
+
+    def test_simfiles(self):
+        """
+        Tests every chart of the simfiles shipped with the repository.
+        """
+        for path in ['test.sm'] + sorted(glob.glob('tests/*.sm')):
+            try:
+                sm = simfile.open(path, strict=False)
+            except ValueError:
+                continue
+            for chart in sm.charts:
+                if chart.notes:
+                    self.assertEqual(as_notes(note_arrays(chart)), reference_notes(chart.notes), path)
+
+    def test_falls_back(self):
+        """
+        Tests that note data the tokenizer does not handle is read with `NoteData`.
+        """
+        for notes in ['1000[2]\n0100\n', '1000\n0R00\n', '1000\n01 00\n', '1000\n01000\n']:
+            self.assertIsNone(tokenize_notes(notes))
+        self.assertEqual(as_notes(note_arrays('1000[2]\n0100\n,\n0010\n')),
+                         reference_notes('1000[2]\n0100\n,\n0010\n'))
+        with self.assertRaises(ValueError):
+            note_arrays('1000\n0R00\n')
+
+    def test_times_at_fractions(self):
+        """
+        Tests that unreduced beat fractions are timed like the equivalent beats.
+        """
+        sm = simfile.open('test.sm', strict=False)
+        table = TimingTable(TimingData(sm))
+        tokens = note_arrays(sm.charts[0])
+        np.testing.assert_array_equal(
+            table.times_at_fractions(tokens.beat_numerators, tokens.beat_denominators),
+            table.times_at([Fraction(int(n), int(d)) for n, d in zip(tokens.beat_numerators,
+                                                                   tokens.beat_denominators)])
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import numpy as np
+from collections import Counter
+from stepmania_difficulty_predictor.features.columnar import mix64, row_bitmasks
+from stepmania_difficulty_predictor.features.PatternHistogram import PatternHistogram
+from stepmania_difficulty_predictor.features.FeatureExtractor import FeatureExtractor
+from stepmania_difficulty_predictor.features.MultiRateFeatures import MultiRateFeatureExtractor
+
+def reference_histogram(panels, ngram, num_buckets):
+    """A per-pattern loop building the same hashed histogram."""
+    num_panels = panels.shape[1]
+    bitmasks = [int(b) for b in row_bitmasks(panels) if b]
+    seed = mix64(np.array([num_panels << 8 | ngram], dtype=np.uint64))[0]
+    counts = Counter()
+    for i in range(len(bitmasks) - ngram + 1):
+        code = sum(bitmasks[i + k] << (k * num_panels) for k in range(ngram))
+        counts[int(mix64(np.array([code], dtype=np.uint64) ^ seed)[0] % np.uint64(num_buckets))] += 1
+    total = max(len(bitmasks) - ngram + 1, 1)
+    return [counts[i] / total for i in range(num_buckets)]
+
+def make_chart(rows):
+    return {round(i * 0.125, 3): row for i, row in enumerate(rows)}
+
+class TestPatternHistogram(unittest.TestCase):
+
+    def test_matches_reference(self):
+        """
+        Tests the vectorized histogram against a per-pattern loop, skipping empty rows.
+        """
+        rng = np.random.default_rng(5)
+        for num_panels in (4, 5, 8):
+            panels = rng.random((400, num_panels)) < 0.3
+            histogram = PatternHistogram(ngram=4, num_buckets=16).compute_arrays(panels)
+            self.assertEqual(list(histogram), [f'pattern_{i}' for i in range(16)])
+            np.testing.assert_allclose(list(histogram.values()), reference_histogram(panels, 4, 16))
+
+    def test_patterns_separate(self):
+        """
+        Tests that a trill and a staircase land in different buckets.
+        """
+        extractor = PatternHistogram(ngram=4, num_buckets=64)
+        trill = extractor.compute(make_chart(['1000', '0100'] * 16))
+        staircase = extractor.compute(make_chart(['1000', '0100', '0010', '0001'] * 8))
+        self.assertAlmostEqual(sum(trill.values()), 1.0)
+        self.assertNotEqual(trill, staircase)
+        # A trill only has its two alternating 4-row patterns
+        self.assertLessEqual(sum(value > 0 for value in trill.values()), 2)
+
+    def test_short_and_wide_charts(self):
+        """
+        Tests charts shorter than a pattern and patterns wider than 64 bits.
+        """
+        self.assertEqual(sum(PatternHistogram().compute(make_chart(['1000', '0100'])).values()), 0)
+        self.assertEqual(sum(PatternHistogram().compute({}).values()), 0)
+        panels = np.random.default_rng(1).random((100, 10)) < 0.3
+        self.assertAlmostEqual(sum(PatternHistogram(ngram=8).compute_arrays(panels).values()), 1.0)
+
+    def test_feature_extractors(self):
+        """
+        Tests that the feature extractors add the histogram only when asked to.
+        """
+        chart = make_chart(['1000', '0100', '0010', '0001', '1001'] * 10)
+        self.assertNotIn('pattern_0', FeatureExtractor().compute(chart))
+        features = FeatureExtractor(pattern_buckets=8).compute(chart)
+        expected = PatternHistogram(num_buckets=8).compute(chart)
+        self.assertEqual({key: features[key] for key in expected}, expected)
+
+        rates = MultiRateFeatureExtractor(pattern_buckets=8).compute(chart, [1.0, 1.5])
+        for key, value in expected.items():
+            self.assertEqual(list(rates[key]), [value, value])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from stepmania_difficulty_predictor.models.percentile_index import PercentileIndex
+
+class TestPercentileIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.rng = np.random.default_rng(0)
+        self.scores = self._scores(2000)
+        self.scores_path = os.path.join(self.tmp, 'predictions.csv')
+        self.scores.to_csv(self.scores_path, index=False)
+        self.index_dir = os.path.join(self.tmp, 'index')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _scores(self, n):
+        return pd.DataFrame({
+            'id': [f'{i:016x}' for i in range(n)],
+            'mode': np.where(self.rng.random(n) < 0.7, 'dance-single', 'dance-double'),
+            'meter': self.rng.integers(1, 15, size=n).astype(float),
+            # Rounded so that queries hit ties
+            'predicted_difficulty': np.round(self.rng.normal(8, 3, size=n), 1),
+        })
+
+    def _check(self, index, scores):
+        queries = np.round(self.rng.normal(8, 4, size=200), 1)
+        for mode, block in scores.groupby('mode'):
+            for field in ['predicted_difficulty', 'meter']:
+                values = block[field].to_numpy()
+                below = (values[None, :] < queries[:, None]).sum(axis=1)
+                equal = (values[None, :] == queries[:, None]).sum(axis=1)
+                np.testing.assert_allclose(index.percentile(mode, queries, field),
+                                           100 * (below + equal / 2) / len(values))
+                np.testing.assert_array_equal(index.rank(mode, queries, field), len(values) - below - equal + 1)
+
+    def test_matches_brute_force(self):
+        """
+        Tests batch and single queries against a scan of the catalogue, before and after reopening.
+        """
+        index = PercentileIndex.build(self.scores_path, self.index_dir)
+        self._check(index, self.scores)
+        self._check(PercentileIndex(self.index_dir), self.scores)
+
+        single = self.scores[self.scores['mode'] == 'dance-single']['predicted_difficulty'].to_numpy()
+        self.assertIsInstance(index.percentile('dance-single', 8.0), float)
+        self.assertEqual(index.rank('dance-single', single.max() + 1), 1)
+        with self.assertRaises(KeyError):
+            index.percentile('pump-single', 8.0)
+
+    def test_buffered_inserts(self):
+        """
+        Tests that inserted charts are ranked from the buffer and after it is merged.
+        """
+        PercentileIndex.build(self.scores_path, self.index_dir)
+        index = PercentileIndex(self.index_dir, merge_fraction=0.1)
+        scores = self.scores
+        for _ in range(6):
+            new = self._scores(60)
+            index.add_scores(new)
+            scores = pd.concat([scores, new], ignore_index=True)
+            self._check(index, scores)
+        single = index.modes['dance-single']
+        self.assertGreater(single.meta['generation'], 1)
+        self.assertEqual(len(os.listdir(single.path)), 5)
+        self._check(PercentileIndex(self.index_dir), scores)
+
+    def test_add_predictions(self):
+        """
+        Tests that the output of `predict_batch` can be added directly.
+        """
+        index = PercentileIndex(self.index_dir)
+        predictions = [[{'mode': 'dance-single', 'meter': 9.0, 'predicted_difficulty': 8.5},
+                        {'mode': 'dance-double', 'meter': None, 'predicted_difficulty': 10.0}],
+                       [],
+                       [{'mode': 'dance-single', 'meter': 3.0, 'predicted_difficulty': 2.5}]]
+        inserted = index.add_predictions(predictions)
+        self.assertEqual(dict(inserted), {'dance-single': 2, 'dance-double': 1})
+        self.assertEqual(index.percentile('dance-single', 8.5), 75.0)
+        self.assertEqual(index.modes['dance-double'].size('meter'), 0)
+        self.assertEqual(index.rank('dance-single', [9.0, 2.5]).tolist(), [1, 2])
+
+if __name__ == '__main__':
+    unittest.main()
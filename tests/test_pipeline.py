@@ -0,0 +1,83 @@
+import unittest
+import os
+import shutil
+import tempfile
+import pandas as pd
+from stepmania_difficulty_predictor.data.sm_data_loader import (
+    expand_simfile_paths, find_simfile_paths, iter_sm_files_from_directory
+)
+from stepmania_difficulty_predictor.data.dataset_pipeline import (
+    iter_preprocessed_charts, iter_feature_rows, write_dataset, DatasetWriter
+)
+
+class TestDatasetPipeline(unittest.TestCase):
+
+    def setUp(self):
+        # Lay the test simfiles out as a small songs folder, one song per directory
+        self.songs_dir = tempfile.mkdtemp()
+        for song, sm_path in [('single', 'test.sm'), ('double', 'tests/dance_double.sm'),
+                              ('empty', 'tests/empty_chart.sm')]:
+            os.makedirs(os.path.join(self.songs_dir, song))
+            shutil.copy(sm_path, os.path.join(self.songs_dir, song, os.path.basename(sm_path)))
+        self.output_path = os.path.join(self.songs_dir, 'dataset.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.songs_dir)
+
+    def test_find_simfile_paths(self):
+        """
+        Tests that one simfile is found per song folder, in sorted order.
+        """
+        paths = find_simfile_paths(self.songs_dir)
+        self.assertEqual(len(paths), 3)
+        self.assertEqual(paths, sorted(paths))
+
+    def test_expand_simfile_paths(self):
+        """
+        Tests that files, directories and patterns expand to simfiles in input order, without repeats.
+        """
+        single = os.path.join(self.songs_dir, 'single', 'test.sm')
+        paths = expand_simfile_paths([single, os.path.join(self.songs_dir, '*', '*chart.sm'),
+                                      self.songs_dir, os.path.join(self.songs_dir, 'missing.sm')])
+        self.assertEqual(paths[:2], [single, os.path.join(self.songs_dir, 'empty', 'empty_chart.sm')])
+        self.assertEqual(sorted(paths), find_simfile_paths(self.songs_dir))
+
+    def test_iter_sm_files_is_lazy(self):
+        """
+        Tests that simfiles are only parsed as they are consumed.
+        """
+        simfiles = iter_sm_files_from_directory(self.songs_dir)
+        first = next(simfiles)
+        self.assertEqual(first.title, 'Test Double Chart')
+
+    def test_streaming_pipeline(self):
+        """
+        Tests that simfiles stream all the way into a dataset CSV.
+        """
+        charts = iter_preprocessed_charts(iter_sm_files_from_directory(self.songs_dir))
+        rows_written = write_dataset(iter_feature_rows(charts), self.output_path, chunk_size=1)
+        self.assertEqual(rows_written, 2)
+
+        df = pd.read_csv(self.output_path)
+        self.assertEqual(len(df), 2)
+        self.assertEqual(sorted(df['mode']), ['dance-double', 'dance-single'])
+        self.assertIn('col_7', df.columns)
+        self.assertIn('crossover_percentage', df.columns)
+
+    def test_writer_widens_header(self):
+        """
+        Tests that rows with new columns widen the rows already written.
+        """
+        with DatasetWriter(self.output_path, chunk_size=1) as writer:
+            writer.write({'id': '0000000000000012', 'meter': 1, 'mode': 'dance-single', 'col_0': 0.1 + 0.2})
+            writer.write({'id': '00000000000000ab', 'meter': 2, 'mode': 'dance-double', 'col_0': 0.25, 'col_4': 1.0})
+
+        df = pd.read_csv(self.output_path, dtype={'id': str}, float_precision='round_trip')
+        self.assertEqual(list(df.columns), ['id', 'meter', 'mode', 'col_0', 'col_4'])
+        self.assertEqual(df['id'].tolist(), ['0000000000000012', '00000000000000ab'])
+        self.assertEqual(df.loc[0, 'col_0'], 0.1 + 0.2)
+        self.assertTrue(pd.isna(df.loc[0, 'col_4']))
+        self.assertEqual(df.loc[1, 'col_4'], 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
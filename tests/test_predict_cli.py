@@ -0,0 +1,44 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from scripts.predict_difficulty import predict_difficulty_cli
+
+FEATURES = ['nps', 'length', 'col_0', 'col_1', 'col_2', 'col_3', 'left', 'right', 'all',
+            'stream_percentage', 'max_stream_length', 'jack_percentage', 'crossover_percentage']
+
+class TestPredictDifficultyCli(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.model_dir = os.path.join(self.tmp, 'models')
+        os.makedirs(self.model_dir)
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame(rng.random((50, len(FEATURES))), columns=FEATURES)
+        with open(os.path.join(self.model_dir, 'dance-single.p'), 'wb') as f:
+            pickle.dump(LinearRegression().fit(X, X['nps'] * 10), f)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_csv_chart_is_position_in_file(self):
+        """
+        Tests that the `chart` column is the chart's position in the simfile, past charts without a model.
+        """
+        path = os.path.join(self.tmp, 'mixed.sm')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("#TITLE:Mixed;\n#BPMS:0=120;\n"
+                    "#NOTES:\n pump-single:\n :\n Hard:\n 9:\n 0,0,0,0,0:\n10000\n01000\n00100\n;\n"
+                    "#NOTES:\n dance-single:\n :\n Hard:\n 9:\n 0,0,0,0,0:\n1000\n0100\n0010\n;\n")
+        output_path = os.path.join(self.tmp, 'predictions.csv')
+        self.assertEqual(predict_difficulty_cli([path], self.model_dir, 'csv', output_path=output_path), 1)
+        rows = pd.read_csv(output_path)
+        self.assertEqual(rows['chart'].tolist(), [1])
+        self.assertEqual(rows['mode'].tolist(), ['dance-single'])
+
+if __name__ == '__main__':
+    unittest.main()
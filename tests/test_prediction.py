@@ -2,6 +2,7 @@ import unittest
 import os
 import simfile
 import pickle
+import threading
 from stepmania_difficulty_predictor.models.prediction_pipeline import ModeAgnosticDifficultyPredictor
 
 class MockModel:
@@ -13,7 +14,15 @@ class MockModel:
                                   'max_stream_length', 'jack_percentage', 'crossover_percentage']
 
     def predict(self, features):
-        return [self.prediction_value]
+        return [self.prediction_value] * len(features)
+
+class NpsModel(MockModel):
+    """A mock model that predicts each chart's nps and counts its calls."""
+    calls = 0
+
+    def predict(self, features):
+        self.calls += 1
+        return features['nps'].to_numpy()
 
 class TestModeAgnosticDifficultyPredictor(unittest.TestCase):
 
@@ -70,6 +79,62 @@ class TestModeAgnosticDifficultyPredictor(unittest.TestCase):
         self.assertEqual(len(batch_predictions), 2)
         self.assertEqual(batch_predictions[0][0]['predicted_difficulty'], 3.0)
 
+    def test_predict_batch_scores_each_mode_once(self):
+        """
+        Tests that the charts of a batch are scored with one model call per mode, each getting its own prediction.
+        """
+        models = {'dance-single': NpsModel(), 'dance-double': NpsModel()}
+        self.predictor.models.update(models)
+
+        sms = [self.sm_path, self.dance_double_path, self.sm_path]
+        batch_predictions = self.predictor.predict_batch(sms, include_features=True)
+        self.assertEqual([model.calls for model in models.values()], [1, 1])
+        self.assertEqual(batch_predictions[0], batch_predictions[2])
+        for predictions in batch_predictions:
+            self.assertGreater(len(predictions), 0)
+            for p in predictions:
+                self.assertEqual(p['predicted_difficulty'], p['features']['nps'])
+
+    def test_iter_predict(self):
+        """
+        Tests that streamed predictions match batch predictions, in order or as they finish.
+        """
+        self.predictor.models['dance-double'] = MockModel(prediction_value=4.0)
+        with open(self.sm_path, "r") as f:
+            sm = simfile.load(f)
+        sms = [self.sm_path, self.dance_double_path, sm, self.empty_chart_path, self.dance_double_path]
+        expected = self.predictor.predict_batch(sms)
+
+        results = list(self.predictor.iter_predict(iter(sms), max_in_flight=2))
+        self.assertEqual([source for source, _ in results], sms)
+        self.assertEqual([predictions for _, predictions in results], expected)
+
+        unordered = list(self.predictor.iter_predict(sms, ordered=False, workers=3))
+        self.assertCountEqual([str(p) for _, p in unordered], [str(p) for p in expected])
+
+    def test_iter_predict_is_bounded(self):
+        """
+        Tests that inputs are only taken as results are consumed, and that closing stops the stream.
+        """
+        taken = []
+        def uploads():
+            while True:
+                taken.append(self.sm_path)
+                yield self.sm_path
+
+        stream = self.predictor.iter_predict(uploads(), max_in_flight=3)
+        for _ in range(5):
+            self.assertEqual(next(stream)[1][0]['mode'], 'dance-single')
+        self.assertLessEqual(len(taken), 5 + 3)
+        stream.close()
+        self.assertLessEqual(len(taken), 5 + 3)
+
+        cancel = threading.Event()
+        stream = self.predictor.iter_predict(uploads(), max_in_flight=3, cancel=cancel)
+        next(stream)
+        cancel.set()
+        self.assertEqual(list(stream), [])
+
     def test_include_features(self):
         """
         Tests that the feature vector is correctly included in the output.
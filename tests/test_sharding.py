@@ -0,0 +1,135 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from stepmania_difficulty_predictor.data.dataset_pipeline import write_dataset
+from stepmania_difficulty_predictor.data.sharding import (
+    chart_id, check_shards, dataset_manifest_path, merge_datasets, parse_shard, select_shard, shard_of,
+    write_manifest
+)
+from scripts.build_features import build_features
+
+class TestSharding(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _songs(self, root):
+        paths = [os.path.join(root, 'Pack', f'song{i}', 'song.sm') for i in range(40)]
+        return paths + [(os.path.join(root, 'Pack.zip'), f'Pack/zipped{i}/song.ssc') for i in range(10)]
+
+    def test_parse_shard(self):
+        """
+        Tests that shards parse as i/K and that invalid ones are rejected.
+        """
+        self.assertEqual(parse_shard('2/4'), (2, 4))
+        for spec in ['4/4', '-1/4', '2', 'a/b', '1/0']:
+            with self.assertRaises(ValueError):
+                parse_shard(spec)
+
+    def test_shards_partition_corpus(self):
+        """
+        Tests that the shards are disjoint, cover the corpus and do not depend on where it is mounted.
+        """
+        root = os.path.join(self.tmp, 'Songs')
+        full = select_shard(self._songs(root), root)
+        shards = [select_shard(reversed(self._songs(root)), root, (i, 3)) for i in range(3)]
+
+        self.assertEqual(sorted(key for shard in shards for key, _ in shard), [key for key, _ in full])
+        self.assertTrue(all(shards))
+        self.assertIn('Pack.zip:Pack/zipped0/song.ssc', [key for key, _ in full])
+
+        elsewhere = os.path.join(self.tmp, 'mnt', 'Songs')
+        moved = select_shard(self._songs(elsewhere), elsewhere, (1, 3))
+        self.assertEqual([key for key, _ in moved], [key for key, _ in shards[1]])
+
+    def test_chart_id(self):
+        """
+        Tests that chart ids depend only on the source key and chart index.
+        """
+        self.assertEqual(chart_id('Pack/song0/song.sm', 0), chart_id('Pack/song0/song.sm', 0))
+        self.assertNotEqual(chart_id('Pack/song0/song.sm', 0), chart_id('Pack/song0/song.sm', 1))
+        self.assertEqual(len(chart_id('Pack/song0/song.sm', 0)), 16)
+
+    def test_build_features_shards_by_source(self):
+        """
+        Tests that build_features.py splits charts by simfile source, as make_dataset_from_sm.py does.
+        """
+        processed_dir = os.path.join(self.tmp, 'processed')
+        os.makedirs(processed_dir)
+        sources = {}
+        for song in range(20):
+            key = f'Pack/song{song}/song.sm'
+            for index in range(2):
+                sources[chart_id(key, index)] = key
+                with open(os.path.join(processed_dir, f'{chart_id(key, index)}.chart'), 'w', encoding='utf-8') as f:
+                    json.dump({'id': chart_id(key, index), 'source': key, 'mode': 'dance-single', 'meter': 5,
+                               'chart': {'0.0': '1000', '0.5': '0100', '1.0': '0010'}}, f)
+
+        built = []
+        for i in range(3):
+            path = os.path.join(self.tmp, f'shard-{i}.csv')
+            build_features(processed_dir, path, shard=(i, 3))
+            ids = pd.read_csv(path, dtype={'id': str})['id'].tolist()
+            self.assertTrue(all(shard_of(sources[chart], 3) == i for chart in ids))
+            built += ids
+        self.assertEqual(sorted(built), sorted(sources))
+
+    def _write_shards(self, rows, num_shards):
+        paths = []
+        for i in range(num_shards):
+            path = os.path.join(self.tmp, f'shard-{i}.csv')
+            write_dataset(sorted(rows[i::num_shards], key=lambda row: row['id']), path)
+            write_manifest(dataset_manifest_path(path), (i, num_shards), rows=len(rows[i::num_shards]))
+            paths.append(path)
+        return paths
+
+    def test_merge_is_independent_of_split(self):
+        """
+        Tests that merging any split gives the same dataset, with cross-shard duplicates dropped.
+        """
+        rows = []
+        for i in range(30):
+            row = {'id': chart_id(f'song{i}', 0), 'meter': i % 12, 'mode': 'dance-single',
+                   'feature': i / 7, 'group': f'{i % 25:032x}'}
+            if i % 4 == 0:
+                row = {**row, 'mode': 'dance-double', 'extra': 1e-9 * i}
+            rows.append(row)
+
+        merged = []
+        for num_shards in (1, 3):
+            output = os.path.join(self.tmp, f'merged-{num_shards}.csv')
+            paths = self._write_shards(rows, num_shards)
+            self.assertEqual(check_shards(paths), num_shards)
+            written, skipped = merge_datasets(paths, output, chunk_size=4)
+            self.assertEqual((written, skipped), (28, 2))
+            merged.append(pd.read_csv(output, dtype={'id': str, 'group': str}))
+
+        pd.testing.assert_frame_equal(merged[0], merged[1])
+        self.assertEqual(list(merged[0]['id']), sorted(merged[0]['id']))
+        self.assertFalse(merged[0].duplicated(['mode', 'group']).any())
+
+    def test_check_shards_rejects_incomplete_split(self):
+        """
+        Tests that missing shards, repeated shards and mixed splits are reported.
+        """
+        rows = [{'id': chart_id(f'song{i}', 0), 'meter': 1, 'mode': 'dance-single'} for i in range(6)]
+        paths = self._write_shards(rows, 3)
+        with self.assertRaises(ValueError):
+            check_shards(paths[:2])
+        with self.assertRaises(ValueError):
+            check_shards(paths + paths[:1])
+
+        unsharded = os.path.join(self.tmp, 'unsharded.csv')
+        write_dataset(rows, unsharded)
+        self.assertIsNone(check_shards([unsharded]))
+        with self.assertRaises(ValueError):
+            check_shards(paths + [unsharded])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import pickle
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from stepmania_difficulty_predictor.data.shared_matrix import SharedFeatureMatrix
+
+def _column_sums(values):
+    return values.sum(axis=0)
+
+class TestSharedFeatureMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame(np.random.default_rng(3).random((500, 6)), columns=list('abcdef'))
+
+    def test_pickles_as_reference(self):
+        """
+        Tests that the shared values pickle as a small spec, while slices keep their data.
+        """
+        with SharedFeatureMatrix.create(self.df) as matrix:
+            self.assertLess(len(pickle.dumps(matrix.values)), 500)
+            np.testing.assert_array_equal(pickle.loads(pickle.dumps(matrix.values)), matrix.values)
+            np.testing.assert_array_equal(pickle.loads(pickle.dumps(matrix.values[10:20])),
+                                          matrix.values[10:20])
+            self.assertFalse(matrix.values.flags.writeable)
+
+    def test_workers_attach(self):
+        """
+        Tests that worker processes read the same matrix, from shared memory and from a file.
+        """
+        expected = self.df.to_numpy(dtype=np.float32).sum(axis=0)
+        with tempfile.TemporaryDirectory() as tmp:
+            for path in (None, os.path.join(tmp, 'features.dat')):
+                with SharedFeatureMatrix.create(self.df, path=path) as matrix:
+                    with ProcessPoolExecutor(2) as executor:
+                        for sums in executor.map(_column_sums, [matrix.values] * 2):
+                            np.testing.assert_allclose(sums, expected, rtol=1e-5)
+
+    def test_attach_by_spec(self):
+        """
+        Tests that attaching by spec gives a read-only view of the same data.
+        """
+        with SharedFeatureMatrix.create(self.df) as matrix:
+            attached = SharedFeatureMatrix.attach(matrix.spec)
+            np.testing.assert_array_equal(attached.values, matrix.values)
+            self.assertFalse(attached.owner)
+            attached.close()
+
+if __name__ == '__main__':
+    unittest.main()
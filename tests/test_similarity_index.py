@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from stepmania_difficulty_predictor.models.similarity_index import SimilarityIndex
+
+class TestSimilarityIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.rng = np.random.default_rng(0)
+        self.dataset_path = os.path.join(self.tmp, 'dataset.csv')
+        self._dataset(0, 400).to_csv(self.dataset_path, index=False)
+        self.index_dir = os.path.join(self.tmp, 'index')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _dataset(self, start, stop):
+        n = stop - start
+        df = pd.DataFrame({
+            'id': [f'{i:016x}' for i in range(start, stop)],
+            'meter': self.rng.integers(1, 15, size=n),
+            'mode': np.where(np.arange(start, stop) % 3, 'dance-single', 'dance-double'),
+            'stream': self.rng.normal(0, 1, size=n),
+            'nps': self.rng.normal(5, 100, size=n),
+            'jumps': self.rng.normal(0, 0.01, size=n),
+        })
+        # Only doubles have the wider column
+        df['panel_7'] = np.where(df['mode'] == 'dance-double', self.rng.random(n), np.nan)
+        return df
+
+    def _brute_force(self, mode_index, vector, k):
+        vectors = np.asarray(mode_index.vectors, dtype=np.float64)
+        distances = np.sqrt((((vectors - vector) / mode_index.scale) ** 2).sum(axis=1))
+        order = np.argsort(distances, kind='stable')[:k]
+        return [mode_index.ids[i] for i in order], distances[order]
+
+    def _check_queries(self, index):
+        for mode, mode_index in index.modes.items():
+            for row in self.rng.integers(0, mode_index.rows, size=10):
+                vector = np.asarray(mode_index.vectors[row], dtype=np.float64) + 0.05
+                features = dict(zip(mode_index.columns, vector))
+                results = index.query(mode, features, k=5)
+                expected_ids, expected_distances = self._brute_force(mode_index, vector, 5)
+                self.assertEqual([result['id'] for result in results], expected_ids)
+                np.testing.assert_allclose([result['distance'] for result in results],
+                                           expected_distances, rtol=1e-5)
+
+    def test_matches_brute_force(self):
+        """
+        Tests that queries return the same neighbours as a scan of the standardized features.
+        """
+        index = SimilarityIndex.build(self.dataset_path, self.index_dir)
+        self.assertEqual({mode: m.rows for mode, m in index.modes.items()},
+                         {'dance-single': 266, 'dance-double': 134})
+        self.assertNotIn('panel_7', index.modes['dance-single'].columns)
+        self._check_queries(index)
+        self._check_queries(SimilarityIndex(self.index_dir))
+
+    def test_query_id(self):
+        """
+        Tests that an indexed chart is not its own neighbour, and that unknown ids are rejected.
+        """
+        index = SimilarityIndex.build(self.dataset_path, self.index_dir)
+        results = index.query_id('0000000000000001', k=3)
+        self.assertEqual(len(results), 3)
+        self.assertNotIn('0000000000000001', [result['id'] for result in results])
+        with self.assertRaises(KeyError):
+            index.query_id('missing')
+
+    def test_append(self):
+        """
+        Tests that appended charts are found before and after the tree is rebuilt, and that
+        charts already indexed are skipped.
+        """
+        SimilarityIndex.build(self.dataset_path, self.index_dir)
+        new_path = os.path.join(self.tmp, 'new.csv')
+        self._dataset(350, 420).to_csv(new_path, index=False)
+
+        index = SimilarityIndex(self.index_dir)
+        appended = index.append_dataset(new_path)
+        self.assertEqual(sum(appended.values()), 20)
+        single = index.modes['dance-single']
+        self.assertLess(single.tree_rows, single.rows)
+        self._check_queries(SimilarityIndex(self.index_dir))
+
+        self._dataset(420, 600).to_csv(new_path, index=False)
+        index.append_dataset(new_path)
+        self.assertEqual(index.modes['dance-single'].tree_rows, index.modes['dance-single'].rows)
+        self._check_queries(SimilarityIndex(self.index_dir))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import unittest
+from stepmania_difficulty_predictor.data.sm_data_loader import find_simfile_paths
+from stepmania_difficulty_predictor.models.prediction_pipeline import ModeAgnosticDifficultyPredictor
+from stepmania_difficulty_predictor.models.songs_watcher import SongsWatcher, scan_simfiles
+
+class MockModel:
+    """A mock model for testing purposes."""
+    feature_names_in_ = ['nps', 'length']
+
+    def predict(self, features):
+        return [2.0] * len(features)
+
+class CountingPredictor(ModeAgnosticDifficultyPredictor):
+    """Records the simfiles it is asked to score."""
+    def __init__(self, model_dir):
+        super().__init__(model_dir=model_dir)
+        self.models = {'dance-single': MockModel(), 'dance-double': MockModel()}
+        self.scored = []
+
+    def predict_batch(self, sms, include_features=False, rates=None):
+        self.scored.extend(os.path.basename(os.path.dirname(sm)) for sm in sms)
+        return super().predict_batch(sms, include_features, rates)
+
+class TestSongsWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.songs = os.path.join(self.tmp, 'Songs')
+        for song, source in [('single', 'test.sm'), ('double', 'tests/dance_double.sm')]:
+            os.makedirs(os.path.join(self.songs, 'Pack', song))
+            shutil.copy(source, os.path.join(self.songs, 'Pack', song, 'song.sm'))
+        self.predictor = CountingPredictor(os.path.join(self.tmp, 'models'))
+        self.watcher = SongsWatcher(self.songs, os.path.join(self.tmp, 'songs.db'), self.predictor, settle=0)
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.tmp)
+
+    def _path(self, song, name='song.sm'):
+        return os.path.join(self.songs, 'Pack', song, name)
+
+    def test_scan_prefers_ssc(self):
+        """
+        Tests that one simfile is found per song folder, preferring the .ssc.
+        """
+        shutil.copy('test.sm', self._path('single', 'song.ssc'))
+        self.assertEqual(sorted(scan_simfiles(self.songs)),
+                         [os.path.join('Pack', 'double', 'song.sm'), os.path.join('Pack', 'single', 'song.ssc')])
+
+    def test_scan_skips_symlinked_folders(self):
+        """
+        Tests that a symlinked folder pointing back up the tree is not followed, as with `find_simfile_paths`.
+        """
+        os.symlink(self.songs, os.path.join(self.songs, 'Pack', 'loop'))
+        expected = [os.path.join('Pack', 'double', 'song.sm'), os.path.join('Pack', 'single', 'song.sm')]
+        self.assertEqual(sorted(scan_simfiles(self.songs)), expected)
+        self.assertEqual([os.path.relpath(path, self.songs) for path in find_simfile_paths(self.songs)], expected)
+
+    def test_rescores_only_changes(self):
+        """
+        Tests that added, changed and removed simfiles are detected and that nothing else is re-scored.
+        """
+        self.assertEqual(self.watcher.poll()['added'], 2)
+        self.assertEqual(sorted(self.predictor.scored), ['double', 'single'])
+        predictions = self.watcher.predictions()
+        self.assertTrue(predictions)
+        self.assertEqual({p['predicted_difficulty'] for p in predictions}, {2.0})
+
+        # Nothing changed
+        self.predictor.scored.clear()
+        self.assertEqual(self.watcher.poll()['unchanged'], 2)
+        self.assertEqual(self.predictor.scored, [])
+
+        # Touched but identical content is not re-scored
+        stat = os.stat(self._path('single'))
+        os.utime(self._path('single'), ns=(stat.st_atime_ns, stat.st_mtime_ns - 10 ** 9))
+        self.assertEqual(self.watcher.poll()['touched'], 1)
+        self.assertEqual(self.predictor.scored, [])
+
+        # A changed file is re-scored, a removed one dropped, a new one added
+        with open(self._path('single'), 'a', encoding='utf-8') as f:
+            f.write('\n')
+        shutil.rmtree(os.path.join(self.songs, 'Pack', 'double'))
+        os.makedirs(os.path.join(self.songs, 'Pack', 'new'))
+        shutil.copy('test.sm', self._path('new'))
+        counts = self.watcher.poll()
+        self.assertEqual((counts['changed'], counts['removed'], counts['added']), (1, 1, 1))
+        self.assertEqual(sorted(self.predictor.scored), ['new', 'single'])
+        self.assertEqual({p['path'].split(os.sep)[1] for p in self.watcher.predictions()}, {'new', 'single'})
+
+    def test_persists_across_runs(self):
+        """
+        Tests that a new watcher over the same database does not re-score anything.
+        """
+        self.watcher.poll()
+        self.predictor.scored.clear()
+        with SongsWatcher(self.songs, os.path.join(self.tmp, 'songs.db'), self.predictor, settle=0) as watcher:
+            self.assertEqual(watcher.poll()['unchanged'], 2)
+            self.assertEqual(len(watcher.predictions()), len(self.watcher.predictions()))
+        self.assertEqual(self.predictor.scored, [])
+
+    def test_stores_chart_position_in_file(self):
+        """
+        Tests that each prediction is stored under its chart's position in the simfile, past unscored charts.
+        """
+        os.makedirs(os.path.join(self.songs, 'Pack', 'mixed'))
+        with open(self._path('mixed'), 'w', encoding='utf-8') as f:
+            f.write("#TITLE:Mixed;\n#BPMS:0=120;\n"
+                    "#NOTES:\n pump-single:\n :\n Hard:\n 9:\n 0,0,0,0,0:\n10000\n01000\n00100\n;\n"
+                    "#NOTES:\n dance-single:\n :\n Hard:\n 9:\n 0,0,0,0,0:\n1000\n0100\n0010\n;\n")
+        self.watcher.poll()
+        charts = [p['chart'] for p in self.watcher.predictions() if p['path'].split(os.sep)[1] == 'mixed']
+        self.assertEqual(charts, [1])
+
+    def test_waits_for_files_to_settle(self):
+        """
+        Tests that recently modified files are left for a later poll.
+        """
+        self.watcher.settle = 3600
+        self.assertEqual(self.watcher.poll()['pending'], 2)
+        self.assertEqual(self.watcher.predictions(), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import unittest
+from stepmania_difficulty_predictor.data.supervisor import FileBudget, FileSupervisor, Quarantine
+
+def _process(path):
+    """Behaves according to the name of the file."""
+    name = os.path.basename(path)
+    if name.startswith('slow'):
+        time.sleep(30)
+    elif name.startswith('pause'):
+        time.sleep(1)
+    elif name.startswith('big'):
+        hog = bytearray(600 << 20)
+        time.sleep(30)
+    elif name.startswith('crash'):
+        os._exit(1)
+    elif name.startswith('raise'):
+        raise ValueError("bad chart")
+    return name.upper()
+
+@unittest.skipUnless(os.path.exists('/proc/self/statm'), "Memory limits need /proc")
+class TestFileSupervisor(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.paths = []
+        for name in ['a.sm', 'slow.sm', 'b.sm', 'big.sm', 'crash.sm', 'raise.sm', 'c.sm']:
+            path = os.path.join(self.tmp, name)
+            with open(path, 'w') as f:
+                f.write(name)
+            self.paths.append(path)
+        self.budget = FileBudget(timeout=2.0, max_rss_mb=400, workers=2,
+                                 quarantine_path=os.path.join(self.tmp, 'quarantine.json'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_budgets_and_quarantine(self):
+        """
+        Tests that offenders are killed and quarantined while other files finish in order.
+        """
+        start = time.perf_counter()
+        results = list(FileSupervisor(_process, self.budget).map(self.paths))
+        self.assertLess(time.perf_counter() - start, 15)
+
+        self.assertEqual([source for source, _, _ in results], self.paths)
+        self.assertEqual([result for _, result, _ in results], ['A.SM', None, 'B.SM', None, None, None, 'C.SM'])
+        self.assertEqual([error for _, _, error in results],
+                         [None, 'timeout', None, 'memory', 'crash', 'ValueError: bad chart', None])
+
+        with open(self.budget.quarantine_path) as f:
+            report = json.load(f)
+        self.assertEqual({os.path.basename(key): entry['reason'] for key, entry in report.items()},
+                         {'slow.sm': 'timeout', 'big.sm': 'memory', 'crash.sm': 'crash'})
+
+        # Later runs skip quarantined files, unless they have changed
+        with open(self.paths[4], 'w') as f:
+            f.write('fixed')
+        errors = [error for _, _, error in FileSupervisor(_process, self.budget).map(self.paths[1:5])]
+        self.assertEqual(errors, ['quarantined', None, 'quarantined', 'crash'])
+
+    def test_bounded_and_reused(self):
+        """
+        Tests that finished results waiting behind a slow file stop the intake,
+        and that workers are kept across runs.
+        """
+        paths = [os.path.join(self.tmp, 'pause.sm')] + [os.path.join(self.tmp, f'{i}.sm') for i in range(20)]
+        taken = []
+
+        def sources():
+            for path in paths:
+                taken.append(path)
+                yield path
+
+        with FileSupervisor(_process, FileBudget(workers=2)) as supervisor:
+            results = supervisor.map(sources())
+            self.assertEqual(next(results)[1], 'PAUSE.SM')
+            self.assertLessEqual(len(taken), 2 + 2 * 2)
+            self.assertEqual([result for _, result, _ in results], [f'{i}.SM' for i in range(20)])
+
+            pids = [worker.process.pid for worker in supervisor.workers]
+            self.assertEqual(len(list(supervisor.map(paths[1:5]))), 4)
+            self.assertEqual([worker.process.pid for worker in supervisor.workers], pids)
+        self.assertEqual(supervisor.workers, [])
+
+    def test_quarantine_in_memory(self):
+        """
+        Tests that a quarantine without a report path only keeps entries in memory.
+        """
+        quarantine = Quarantine()
+        quarantine.add(self.paths[0], 'timeout', 3.0, 120.0)
+        self.assertIn(self.paths[0], quarantine)
+        self.assertNotIn(self.paths[1], quarantine)
+
+if __name__ == '__main__':
+    unittest.main()
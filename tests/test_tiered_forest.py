@@ -0,0 +1,104 @@
+import unittest
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from stepmania_difficulty_predictor.models.tiered_forest import TieredForest, distill_forest
+from stepmania_difficulty_predictor.models.prediction_pipeline import ModeAgnosticDifficultyPredictor
+
+FEATURES = ['nps', 'length', 'col_0', 'col_1', 'col_2', 'col_3', 'left', 'right', 'all',
+            'stream_percentage', 'max_stream_length', 'jack_percentage', 'crossover_percentage']
+
+def make_forest(n_estimators=100):
+    """Fits a forest on synthetic feature rows."""
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.random((300, len(FEATURES))) * 10, columns=FEATURES)
+    y = X['nps'] + 0.5 * X['stream_percentage'] + rng.normal(scale=0.5, size=len(X))
+    return RandomForestRegressor(n_estimators=n_estimators, random_state=0).fit(X, y), X
+
+class TestTieredForest(unittest.TestCase):
+
+    def setUp(self):
+        self.model, self.X = make_forest()
+        self.full = self.model.predict(self.X)
+
+    def test_zero_tolerance_matches_forest(self):
+        """
+        Tests that without any tolerance every tree is evaluated.
+        """
+        tiered = TieredForest.from_model(self.model, chunk_size=30, tolerance=0)
+        predictions, tiers, trees = tiered.predict(self.X.to_numpy())
+        np.testing.assert_allclose(predictions, self.full)
+        self.assertTrue((tiers == 'full').all())
+        self.assertTrue((trees == 100).all())
+
+    def test_early_exit_within_tolerance(self):
+        """
+        Tests that confident rows exit early and stay close to the full forest.
+        """
+        tiered = TieredForest.from_model(self.model, chunk_size=20, tolerance=0.5)
+        predictions, tiers, trees = tiered.predict(self.X.to_numpy())
+        self.assertIn('early_exit', set(tiers))
+        self.assertLess(trees.mean(), 100)
+        self.assertLess(np.mean(np.abs(predictions - self.full)), 0.5)
+
+    def test_distilled_first_tier(self):
+        """
+        Tests that a distilled first tier answers the rows it is confident about.
+        """
+        student = distill_forest(self.model, self.X, n_estimators=10)
+        tiered = TieredForest.from_model(self.model, student, tolerance=100)
+        predictions, tiers, trees = tiered.predict(self.X.to_numpy()[:5])
+        self.assertTrue((tiers == 'distilled').all())
+        self.assertTrue((trees == 0).all())
+
+    def test_distilled_error_bounded(self):
+        """
+        Tests that accepted distilled predictions stay within tolerance of the full forest on unseen rows.
+        """
+        student = distill_forest(self.model, self.X, n_estimators=10)
+        self.assertGreater(student.residual_bound_, 0)
+        rng = np.random.default_rng(1)
+        X = pd.DataFrame(rng.random((300, len(FEATURES))) * 10, columns=FEATURES)
+        full = self.model.predict(X)
+
+        tolerance = student.residual_bound_ + 0.75
+        predictions, tiers, _ = TieredForest.from_model(self.model, student, tolerance=tolerance).predict(X.to_numpy())
+        distilled = tiers == 'distilled'
+        self.assertTrue(distilled.any())
+        self.assertLessEqual(np.abs(predictions[distilled] - full[distilled]).max(), tolerance)
+
+        tiered = TieredForest.from_model(self.model, student, tolerance=student.residual_bound_)
+        self.assertNotIn('distilled', set(tiered.predict(X.to_numpy())[1]))
+
+        del student.residual_bound_
+        tiered = TieredForest.from_model(self.model, student, tolerance=100)
+        self.assertNotIn('distilled', set(tiered.predict(X.to_numpy())[1]))
+
+    def test_non_forest_model(self):
+        """
+        Tests that models without trees are not wrapped.
+        """
+        self.assertIsNone(TieredForest.from_model(object()))
+
+class TestTieredPredictor(unittest.TestCase):
+
+    def test_predictions_report_tier(self):
+        """
+        Tests that tiered predictions report their tier and stay close to the full forest.
+        """
+        model, _ = make_forest()
+        predictor = ModeAgnosticDifficultyPredictor(model_dir="stepmania_difficulty_predictor/model")
+        tiered_predictor = ModeAgnosticDifficultyPredictor(model_dir="stepmania_difficulty_predictor/model",
+                                                           tolerance=0.05, chunk_size=25)
+        predictor.models['dance-single'] = model
+        tiered_predictor.models['dance-single'] = model
+
+        expected = predictor.predict("test.sm")[0]
+        prediction = tiered_predictor.predict("test.sm")[0]
+        self.assertNotIn('tier', expected)
+        self.assertIn(prediction['tier'], ('early_exit', 'full'))
+        self.assertGreaterEqual(prediction['trees'], 25)
+        self.assertLess(abs(prediction['predicted_difficulty'] - expected['predicted_difficulty']), 0.1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import simfile
+from sklearn.linear_model import LinearRegression
+from stepmania_difficulty_predictor.data.SMChartPreprocessor import SMChartPreprocessor
+from stepmania_difficulty_predictor.features.FeatureExtractor import FeatureExtractor
+from stepmania_difficulty_predictor.features.PatternHistogram import PatternHistogram
+from stepmania_difficulty_predictor.features.WindowedFeatures import WindowedFeatureExtractor
+from stepmania_difficulty_predictor.models.prediction_pipeline import ModeAgnosticDifficultyPredictor
+
+class RowwiseMockModel:
+    """A mock model that scores every row with its nps feature."""
+    feature_names_in_ = ['nps', 'length', 'col_0', 'col_1', 'col_2', 'col_3',
+                         'left', 'right', 'all', 'stream_percentage',
+                         'max_stream_length', 'jack_percentage', 'crossover_percentage']
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, features):
+        self.calls += 1
+        return features['nps'].to_numpy()
+
+class TestWindowedFeatures(unittest.TestCase):
+
+    def setUp(self):
+        # A chart mixing streams, jumps, jacks and gaps across several seconds
+        rng = np.random.default_rng(42)
+        times = np.round(np.cumsum(rng.choice([0.05, 0.125, 0.25, 0.5, 1.5], size=200)), 3)
+        encodings = ['1000', '0100', '0010', '0001', '1001', '0110', '1100']
+        self.chart = {float(t): encodings[rng.integers(len(encodings))] for t in times}
+        self.feature_extractor = FeatureExtractor(alpha=3, pattern_buckets=16)
+        self.windowed_extractor = WindowedFeatureExtractor(alpha=3, pattern_buckets=16)
+
+    def test_windows_match_sliced_extraction(self):
+        """
+        Tests that every window matches running the extractors on that slice.
+        """
+        windows = self.windowed_extractor.compute(self.chart, window=8.0, step=4.0)
+        self.assertGreater(len(windows), 1)
+
+        for _, window in windows.iterrows():
+            sliced = {k: v for k, v in self.chart.items() if window['start'] <= k < window['end']}
+            if not sliced:
+                continue
+            expected = self.feature_extractor.compute(sliced)
+            for name, value in expected.items():
+                if name == 'length':
+                    continue
+                self.assertTrue(np.isclose(window[name], value, equal_nan=True),
+                                f"{name}: {window[name]} != {value}")
+
+    def test_windows_cover_chart(self):
+        """
+        Tests that the windows span every note of the chart.
+        """
+        windows = self.windowed_extractor.compute(self.chart, window=8.0, step=4.0)
+        self.assertEqual(windows['start'].iloc[0], min(self.chart))
+        self.assertGreater(windows['end'].iloc[-1], max(self.chart))
+
+class TestPredictTimeline(unittest.TestCase):
+
+    def setUp(self):
+        self.predictor = ModeAgnosticDifficultyPredictor(model_dir="stepmania_difficulty_predictor/model")
+        self.model = RowwiseMockModel()
+        self.predictor.models['dance-single'] = self.model
+
+    def test_predict_timeline(self):
+        """
+        Tests that each chart gets a timeline scored in one batched call.
+        """
+        timelines = self.predictor.predict_timeline("test.sm", window=1.0, step=0.5)
+        self.assertEqual(len(timelines), 1)
+        self.assertEqual(timelines[0]['mode'], 'dance-single')
+        self.assertGreater(len(timelines[0]['timeline']), 0)
+        self.assertLessEqual(self.model.calls, 1)
+
+        for point in timelines[0]['timeline']:
+            self.assertLess(point['start'], point['end'])
+            self.assertIn('predicted_difficulty', point)
+
+    def test_predict_timeline_with_pattern_features(self):
+        """
+        Tests that models trained with pattern features get each window's histogram.
+        """
+        tmp = tempfile.mkdtemp()
+        try:
+            # A linear model weighting each pattern bucket, so predictions expose the histogram
+            patterns = [f'pattern_{i}' for i in range(8)]
+            X = pd.DataFrame(np.random.default_rng(0).random((50, 13 + 8)),
+                             columns=RowwiseMockModel.feature_names_in_ + patterns)
+            with open(os.path.join(tmp, 'dance-single.p'), 'wb') as f:
+                pickle.dump(LinearRegression().fit(X, X[patterns] @ np.arange(1, 9)), f)
+            predictor = ModeAgnosticDifficultyPredictor(model_dir=tmp)
+        finally:
+            shutil.rmtree(tmp)
+
+        timeline = predictor.predict_timeline("test.sm", window=4.0, step=2.0)[0]['timeline']
+        with open("test.sm", "r") as f:
+            chart = SMChartPreprocessor().preprocess(simfile.load(f))[0]['chart']
+        histogram = PatternHistogram(num_buckets=8)
+        self.assertTrue(any(point['predicted_difficulty'] > 0 for point in timeline))
+        for point in timeline:
+            sliced = {k: v for k, v in chart.items() if point['start'] <= k < point['end']}
+            if len(sliced) >= 2:
+                expected = np.dot(list(histogram.compute(sliced).values()), np.arange(1, 9))
+                self.assertAlmostEqual(point['predicted_difficulty'], expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+from unittest import mock
+import numpy as np
+import simfile
+from simfile.notes import NoteData
+from simfile.timing import TimingData
+from simfile.timing.engine import TimingEngine
+from stepmania_difficulty_predictor.data.SMChartPreprocessor import SMChartPreprocessor
+from stepmania_difficulty_predictor.data.timing import TimingTable, timing_key
+
+SM_TIMING = """#TITLE:Timing;
+#BPMS:0.000=150.000,16.000=300.000,32.500=90.000;
+#STOPS:8.000=0.500,20.250=0.125;
+#DELAYS:12.000=0.250;
+#WARPS:40.000=2.000;
+#OFFSET:-0.042;
+#NOTES:
+ dance-single:
+ :
+ Hard:
+ 9:
+ 0,0,0,0,0:
+{notes}
+;
+"""
+
+SSC_CHART_TIMING = """#VERSION:0.83;
+#TITLE:Split Timing;
+#BPMS:0.000=120.000;
+#OFFSET:0;
+#NOTEDATA:;
+#STEPSTYPE:dance-single;
+#DIFFICULTY:Hard;
+#METER:9;
+#BPMS:0.000=240.000;
+#NOTES:
+1000
+0100
+0010
+0001
+;
+#NOTEDATA:;
+#STEPSTYPE:dance-single;
+#DIFFICULTY:Easy;
+#METER:3;
+#NOTES:
+1000
+0100
+0010
+0001
+;
+#NOTEDATA:;
+#STEPSTYPE:dance-single;
+#DIFFICULTY:Medium;
+#METER:5;
+#NOTES:
+1100
+0000
+0011
+0000
+;
+"""
+
+def make_notes(rng, n_measures=14):
+    """Builds measures of random taps at mixed subdivisions."""
+    measures = []
+    for _ in range(n_measures):
+        rows = int(rng.choice([4, 8, 12, 16, 24, 48, 192]))
+        measures.append('\n'.join(
+            ''.join(rng.choice(['0', '0', '0', '1'], size=4)) for _ in range(rows)))
+    return '\n,\n'.join(measures)
+
+class TestTimingTable(unittest.TestCase):
+
+    def test_matches_timing_engine(self):
+        """
+        Tests that the table times every note exactly like `TimingEngine`.
+        """
+        sm_file = simfile.loads(SM_TIMING.format(notes=make_notes(np.random.default_rng(1))))
+        timing_data = TimingData(sm_file)
+        engine = TimingEngine(timing_data)
+        beats = [note.beat for note in NoteData(sm_file.charts[0])]
+
+        expected = [float(engine.time_at(beat)) for beat in beats]
+        self.assertEqual(TimingTable(timing_data).times_at(beats).tolist(), expected)
+
+    def test_without_engine_internals(self):
+        """
+        Tests that beats are still timed when `TimingEngine` has no state machine to read.
+        """
+        class PublicTimingEngine(TimingEngine):
+            def __init__(self, timing_data):
+                self.engine = TimingEngine(timing_data)
+
+            def time_at(self, beat):
+                return self.engine.time_at(beat)
+
+        sm_file = simfile.loads(SM_TIMING.format(notes=make_notes(np.random.default_rng(2), n_measures=4)))
+        timing_data = TimingData(sm_file)
+        beats = [note.beat for note in NoteData(sm_file.charts[0])]
+        expected = TimingTable(timing_data).times_at(beats).tolist()
+
+        with mock.patch('stepmania_difficulty_predictor.data.timing.TimingEngine', PublicTimingEngine):
+            self.assertEqual(TimingTable(timing_data).times_at(beats).tolist(), expected)
+
+    def test_timing_key(self):
+        """
+        Tests that the key only depends on timing fields.
+        """
+        first = simfile.loads(SM_TIMING.format(notes='1000'))
+        second = simfile.loads(SM_TIMING.format(notes='0100').replace('#TITLE:Timing', '#TITLE:Other'))
+        self.assertEqual(timing_key(TimingData(first)), timing_key(TimingData(second)))
+
+class TestPreprocessorTiming(unittest.TestCase):
+
+    def test_ssc_chart_timing(self):
+        """
+        Tests that SSC charts with their own BPMs are timed with them.
+        """
+        charts = SMChartPreprocessor().preprocess(simfile.loads(SSC_CHART_TIMING))
+        self.assertEqual(list(charts[0]['chart']), [0.0, 0.25, 0.5, 0.75])
+        self.assertEqual(list(charts[1]['chart']), [0.0, 0.5, 1.0, 1.5])
+        self.assertEqual(charts[2]['chart'], {0.0: '1100', 1.0: '0011'})
+
+    def test_shared_timing_tables(self):
+        """
+        Tests that charts sharing timing share one cached table.
+        """
+        preprocessor = SMChartPreprocessor()
+        sm_file = simfile.loads(SSC_CHART_TIMING)
+        preprocessor.preprocess(sm_file)
+        self.assertEqual(len(preprocessor._timing_tables), 2)
+        self.assertIs(preprocessor.timing_table(sm_file, sm_file.charts[1]),
+                      preprocessor.timing_table(sm_file, sm_file.charts[2]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+import pandas as pd
+from stepmania_difficulty_predictor.data.sm_data_loader import (
+    find_simfile_members, iter_sm_files, iter_sm_files_from_directory, iter_sm_files_from_zip,
+    load_sm_files_from_directory
+)
+from scripts.build_dataset import main as build_dataset
+
+class TestZipPacks(unittest.TestCase):
+
+    def setUp(self):
+        # A pack with one song per folder; 'single' also has an .ssc and some audio
+        self.tmp = tempfile.mkdtemp()
+        self.zip_path = os.path.join(self.tmp, 'Pack.zip')
+        with open('test.sm', encoding='utf-8') as f:
+            ssc_text = '#VERSION:0.83;\n' + f.read().replace('Test Song', 'Test Song SSC')
+        with zipfile.ZipFile(self.zip_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.write('test.sm', 'Pack/single/test.sm')
+            archive.writestr('Pack/single/test.ssc', ssc_text)
+            archive.writestr('Pack/single/song.ogg', os.urandom(4096))
+            archive.write('tests/dance_double.sm', 'Pack/double/dance_double.sm')
+            archive.writestr('Pack/broken/broken.sm', b'\xff\xfe\x00')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_find_simfile_members(self):
+        """
+        Tests that the .ssc is preferred and one member is found per song folder.
+        """
+        self.assertEqual(find_simfile_members(self.zip_path),
+                         ['Pack/broken/broken.sm', 'Pack/double/dance_double.sm', 'Pack/single/test.ssc'])
+
+    def test_matches_extracted_pack(self):
+        """
+        Tests that reading the zip gives the same simfiles as reading it extracted, serially and in parallel.
+        """
+        extracted = os.path.join(self.tmp, 'extracted')
+        with zipfile.ZipFile(self.zip_path) as archive:
+            archive.extractall(extracted)
+        expected = [(sm.title, len(sm.charts)) for sm in iter_sm_files_from_directory(extracted)]
+
+        for workers in (1, 2):
+            simfiles = [(sm.title, len(sm.charts)) for sm in iter_sm_files_from_zip(self.zip_path, workers)]
+            self.assertEqual(simfiles, expected)
+        self.assertIn('Test Song SSC', [title for title, _ in expected])
+
+    def test_directory_of_packs(self):
+        """
+        Tests that zip packs inside a songs directory are read too.
+        """
+        self.assertEqual(len(list(iter_sm_files(self.tmp))), 3)
+        self.assertEqual(len(list(iter_sm_files(self.zip_path))), 3)
+        self.assertEqual(len(load_sm_files_from_directory(self.tmp)), 3)
+
+    def test_build_dataset_from_pack(self):
+        """
+        Tests that the dataset is built from the charts of zip packs.
+        """
+        output_path = os.path.join(self.tmp, 'out', 'dataset.csv')
+        build_dataset(self.tmp, output_path, keep_duplicates=True, workers=2)
+        expected = sum(len(sm.charts) for sm in iter_sm_files(self.zip_path))
+        self.assertEqual(len(pd.read_csv(output_path)), expected)
+
+if __name__ == '__main__':
+    unittest.main()